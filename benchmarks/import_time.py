@@ -0,0 +1,134 @@
+"""
+Import time of the processing modules.
+
+Run from the repository root:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --modules processing.heating_processing --max-ms 500
+
+Each module is imported in a fresh interpreter with `python -X importtime` and the output is parsed into
+the module's cumulative import time and the slowest packages it pulls in. Heavy backends (CoolProp, plotting,
+PDF and spreadsheet libraries) are imported inside the functions that use them, so the run fails
+(exit code 1) if importing a processing module loads one of LAZY_PACKAGES, or takes longer than --max-ms.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(REPOSITORY_DIRECTORY, 'benchmarks', 'import_time.json')
+
+# Packages that must only be imported on first use of the function that needs them. Streamlit must never be
+# imported by the processing modules, they also run headless (see processing/batch.py)
+LAZY_PACKAGES = ['CoolProp', 'pyfluids', 'fpdf', 'matplotlib', 'bokeh', 'psychrolib', 'scipy', 'fluids',
+                 'openpyxl', 'xlsxwriter', 'streamlit']
+
+
+def processing_modules():
+    """Every module in the processing package"""
+    directory = os.path.join(REPOSITORY_DIRECTORY, 'processing')
+    return sorted(f'processing.{filename[:-3]}' for filename in os.listdir(directory)
+                  if filename.endswith('.py') and not filename.startswith('_'))
+
+
+def parse_importtime(output):
+    """
+    Parse the stderr of `python -X importtime` into a list of (module, self (s), cumulative (s), depth),
+    in the order they're printed (a module's imports come before it, indented one level deeper).
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|', 2)
+        if not self_time.strip().isdigit():
+            continue  # The header line
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        imports.append((name.strip(), int(self_time) / 1e6, int(cumulative) / 1e6, depth))
+    return imports
+
+
+def module_imports(imports):
+    """
+    The imports made by the last top level import, e.g. the module being measured, leaving out the ones made by
+    the interpreter at startup (site, encodings...)
+    """
+    top_level = [i for i, (_, _, _, depth) in enumerate(imports) if depth == 0]
+    start = top_level[-2] + 1 if len(top_level) > 1 else 0
+    return imports[start:]
+
+
+def package_times(imports):
+    """Cumulative time (s) per top level package, from the outermost import of each"""
+    times = {}
+    for name, _, cumulative, _ in imports:
+        package = name.split('.')[0]
+        times[package] = max(times.get(package, 0), cumulative)
+    return times
+
+
+def measure_import(module):
+    """Import module in a fresh interpreter, returns the parsed -X importtime output"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=REPOSITORY_DIRECTORY, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ImportError(f'Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}')
+    return module_imports(parse_importtime(result.stderr))
+
+
+def run_import_times(modules=None, repeat=3, log=print):
+    """
+    Time importing each module repeat times (keeping the fastest, the first run may be compiling bytecode).
+    Returns a dictionary of {module: {'cumulative (s)', 'slowest packages', 'lazy packages loaded'}}.
+    """
+    results = {}
+    for module in modules or processing_modules():
+        runs = [measure_import(module) for _ in range(repeat)]
+        imports = min(runs, key=lambda run: run[-1][2])
+        packages = package_times(imports)
+        slowest = sorted(((package, time) for package, time in packages.items() if package != 'processing'),
+                         key=lambda item: -item[1])[:5]
+        results[module] = {
+            'cumulative (s)': imports[-1][2],
+            'slowest packages': dict(slowest),
+            'lazy packages loaded': [package for package in LAZY_PACKAGES if package in packages],
+        }
+        log(f'{module}: {imports[-1][2] * 1000:.1f} ms '
+            f'({", ".join(f"{package} {time * 1000:.0f} ms" for package, time in slowest)})')
+    return results
+
+
+def check_results(results, max_seconds=None):
+    """Returns a list of problems: processing modules loading lazy packages, or importing too slowly"""
+    problems = []
+    for module, result in results.items():
+        if result['lazy packages loaded']:
+            problems.append(f'{module} imports {", ".join(result["lazy packages loaded"])} at import time')
+        if max_seconds is not None and result['cumulative (s)'] > max_seconds:
+            problems.append(f'{module} takes {result["cumulative (s)"] * 1000:.0f} ms to import '
+                            f'(limit {max_seconds * 1000:.0f} ms)')
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time importing the processing modules.')
+    parser.add_argument('--modules', nargs='*', help='Modules to import (default every processing module)')
+    parser.add_argument('--repeat', type=int, default=3, help='Imports per module, the fastest is kept')
+    parser.add_argument('--max-ms', type=float, help='Fail if a module takes longer than this to import')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON file to save the results to')
+    args = parser.parse_args(argv)
+
+    results = run_import_times(args.modules, args.repeat)
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'Results saved to {args.output}')
+
+    problems = check_results(results, args.max_ms / 1000 if args.max_ms is not None else None)
+    for problem in problems:
+        print(f'PROBLEM {problem}')
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
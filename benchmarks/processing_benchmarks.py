@@ -0,0 +1,482 @@
+"""
+Benchmarks for the processing functions.
+
+Run from the repository root:
+    python -m benchmarks.processing_benchmarks
+    python -m benchmarks.processing_benchmarks --sizes scalar 1k --cases friction
+    python -m benchmarks.processing_benchmarks --baseline benchmarks/baseline.json --threshold 20
+
+Each case is timed at the batch sizes it supports (scalar, 1k, 100k and 1M elements) and the results are
+written to JSON. Given a baseline, the run fails (exit code 1) if a hot path case is slower than the
+baseline by more than the threshold percentage.
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import tempfile
+import statistics
+import numpy as np
+import pandas as pd
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(REPOSITORY_DIRECTORY, 'benchmarks', 'latest.json')
+DEFAULT_THRESHOLD = 25.0  # %
+
+SIZES = {'scalar': 1, '1k': 1_000, '100k': 100_000, '1M': 1_000_000}
+ALL_SIZES = list(SIZES)
+ARRAY_SIZES = ['1k', '100k', '1M']
+
+BENCHMARKS = {}
+
+# Files written by the setup of the file based cases, removed at the end of the run
+_temporary_directory = None
+
+
+class BenchmarkSkipped(Exception):
+    """Raised by a case's setup when it can't run in this environment, e.g. missing data files"""
+
+
+def benchmark(name, sizes=ALL_SIZES, hot=False):
+    """
+    Register a benchmark case. The decorated function takes the number of elements (None for scalar) and
+    returns a callable with no arguments that does the work being timed.
+    hot: Hot path cases are the ones checked against the regression threshold.
+    """
+    def register(setup):
+        BENCHMARKS[name] = {'setup': setup, 'sizes': list(sizes), 'hot': hot}
+        return setup
+    return register
+
+
+def temporary_path(filename):
+    global _temporary_directory
+    if _temporary_directory is None:
+        _temporary_directory = tempfile.TemporaryDirectory()
+    return os.path.join(_temporary_directory.name, filename)
+
+
+def random_values(n, low, high, seed=0):
+    """n uniform random values, or a single float when n is None (scalar)"""
+    rng = np.random.default_rng(seed)
+    if n is None:
+        return float(rng.uniform(low, high))
+    return rng.uniform(low, high, n)
+
+
+def pipe_schedule(n):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        'Material': np.where(rng.random(n) < 0.5, 'Copper', 'Steel'),
+        'Nominal diameter (mm)': rng.choice([15, 22, 28, 35, 42, 54], n),
+        'Internal diameter (mm)': rng.uniform(13, 52, n),
+        'Velocity (m/s)': rng.uniform(0.2, 1.5, n),
+        'Pressure drop (Pa/m)': rng.uniform(50, 400, n),
+    })
+
+
+###### Fluid properties ######
+
+@benchmark('Glycol-water properties (table)', hot=True)
+def glycol_table(n):
+    from processing.property_tables import lookup_glycol_water_properties, get_glycol_water_table
+    get_glycol_water_table()
+    glycol_percentage, temperature = random_values(n, 0, 0.5), random_values(n, 10, 90, seed=1)
+    return lambda: lookup_glycol_water_properties(glycol_percentage, temperature)
+
+
+@benchmark('Glycol-water properties (CoolProp)', sizes=['scalar'])
+def glycol_coolprop(n):
+    from processing.property_tables import coolprop_glycol_water_properties
+    return lambda: coolprop_glycol_water_properties(0.3, 60.0)
+
+
+@benchmark('Water state (PyFluids cache)', sizes=['scalar'], hot=True)
+def water_state(n):
+    from pyfluids import FluidsList
+    from processing.fluid_state_cache import get_fluid_state
+    return lambda: get_fluid_state(FluidsList.Water, 50, 101325).density
+
+
+@benchmark('Air properties', sizes=['scalar'])
+def air_properties(n):
+    from processing.ventilation_processing import get_air_properties
+    return lambda: get_air_properties(20, 101325)
+
+
+@benchmark('Air properties (table)', hot=True)
+def air_table(n):
+    from processing.property_tables import lookup_air_properties, get_air_table
+    get_air_table()
+    temperature, pressure = random_values(n, -10, 40), random_values(n, 85000, 103000, seed=1)
+    return lambda: lookup_air_properties(temperature, pressure)
+
+
+@benchmark('Air properties (CoolProp)', sizes=['scalar'])
+def air_coolprop(n):
+    from processing.property_tables import coolprop_air_properties
+    return lambda: coolprop_air_properties(20.0, 101325)
+
+
+@benchmark('Expansion factor', hot=True)
+def expansion(n):
+    from processing.heating_processing import expansion_factor
+    temperatures = random_values(n, 10, 100)
+    return lambda: expansion_factor(temperatures)
+
+
+###### Friction factor and pipe hydraulics ######
+
+@benchmark('Darcy friction factor (Fluids)', sizes=['scalar'])
+def friction_factor_scalar(n):
+    from processing.heating_processing import calculate_darcy_friction_factor
+    return lambda: calculate_darcy_friction_factor(1e5, 0.046, 28)
+
+
+def friction_factor_case(friction_model):
+    @benchmark(f'Darcy friction factor ({friction_model})', hot=True)
+    def friction_factor_array(n):
+        from processing.heating_processing import calculate_darcy_friction_factor_array
+        reynolds_number = random_values(n, 1000, 1e6)
+        return lambda: calculate_darcy_friction_factor_array(reynolds_number, 0.046, 28, friction_model)
+
+
+for _friction_model in ['Colebrook', 'Swamee-Jain', 'Haaland', 'Serghides']:
+    friction_factor_case(_friction_model)
+
+
+@benchmark('Pipe hydraulics', hot=True)
+def pipe_hydraulics(n):
+    from processing.heating_processing import calculate_pipe_hydraulics
+    flow_rate = random_values(n, 0.05, 5) / 1000
+    return lambda: calculate_pipe_hydraulics(flow_rate, 0.028, 0.046e-3, 988, 0.00055)
+
+
+@benchmark('Pipe schedule (DataFrame)', sizes=ARRAY_SIZES)
+def pipe_schedule_dataframe(n):
+    from processing.heating_processing import calculate_pipe_schedule
+    df = pd.DataFrame({'Flow rate (L/s)': random_values(n, 0.05, 5), 'Internal diameter (mm)': 28.0,
+                       'Equivalent roughness (mm)': 0.046, 'Density (kg/m³)': 988.0, 'Viscosity (Pa.s)': 0.00055})
+    return lambda: calculate_pipe_schedule(df)
+
+
+@benchmark('Automatic pipe sizing', sizes=['scalar', '1k', '100k'], hot=True)
+def pipe_sizing(n):
+    from processing.pipe_catalog import get_pipe_catalog
+    from processing.pipe_sizing import size_pipes
+    catalog = get_pipe_catalog()
+    flow_rate = random_values(n, 0.05, 5)
+    return lambda: size_pipes(flow_rate, catalog.materials[0], 988, 0.00055, max_velocity=1.5,
+                              max_pressure_drop=300, catalog=catalog)
+
+
+@benchmark('Tree pipe network', sizes=ARRAY_SIZES, hot=True)
+def tree_network(n):
+    from processing.pipe_network import PipeNetwork
+    rng = np.random.default_rng(2)
+    # Each section hangs off a random earlier section
+    parent = np.concatenate(([-1], (rng.random(n - 1) * np.arange(1, n)).astype(np.int64)))
+    network = PipeNetwork(parent, 5.0, 28.0, 0.046, k_factor=1.5, terminal_flow=rng.uniform(0, 0.1, n))
+    return lambda: network.solve(988, 0.00055)
+
+
+@benchmark('Looped pipe network', sizes=['1k', '100k'], hot=True)
+def looped_network(n):
+    from processing.looped_network import LoopedPipeNetwork
+    # Square grid with about n pipes, fed from one corner
+    side = max(int(np.sqrt(n / 2)), 2)
+    nodes = np.arange(side * side).reshape(side, side)
+    start_node = np.concatenate((nodes[:, :-1].ravel(), nodes[:-1, :].ravel()))
+    end_node = np.concatenate((nodes[:, 1:].ravel(), nodes[1:, :].ravel()))
+    network = LoopedPipeNetwork(start_node, end_node, 10.0, 54.0, 0.046, {0: 100000.0},
+                                node_demand=np.r_[0, np.full(side * side - 1, 0.01)])
+    return lambda: network.solve(988, 0.00055)
+
+
+###### Ventilation ######
+
+@benchmark('Duct pressure loss', sizes=['scalar'])
+def duct_pressure_loss(n):
+    from processing.ventilation_processing import calculate_pressure_loss
+    return lambda: calculate_pressure_loss(400, 1.2, 4.0)
+
+
+def duct_friction_case(friction_model):
+    @benchmark(f'Duct friction ({friction_model})', hot=True)
+    def duct_friction(n):
+        from processing.ventilation_processing import calculate_duct_friction
+        air_velocity = random_values(n, 1, 10)
+        diameter = random_values(n, 100, 1250)
+        return lambda: calculate_duct_friction(air_velocity, diameter, 1.2, friction_model=friction_model)
+
+
+for _friction_model in ['Colebrook', 'Haaland']:
+    duct_friction_case(_friction_model)
+
+
+@benchmark('Tree duct network', sizes=ARRAY_SIZES, hot=True)
+def duct_network(n):
+    from processing.duct_network import DuctNetwork
+    rng = np.random.default_rng(2)
+    # Each section hangs off a random earlier section
+    parent = np.concatenate(([-1], (rng.random(n - 1) * np.arange(1, n)).astype(np.int64)))
+    network = DuctNetwork(parent, 5.0, width=800.0, height=400.0, k_factor=0.5,
+                          terminal_flow=rng.uniform(0, 0.001, n), terminal_pressure_loss=25.0)
+    return lambda: network.solve(1.2)
+
+
+@benchmark('Psychrometric chart', sizes=['scalar'], hot=True)
+def psychrometric_chart(n):
+    from processing.ventilation_processing import plot_psychrometric
+    # The Ventilation page defaults
+    return lambda: plot_psychrometric(101325, (5, 45), (0, 100), (-10, 45), 0.025)
+
+
+@benchmark('Humidity ratio from wet-bulb', hot=True)
+def humidity_ratio_wet_bulb(n):
+    from processing.psychrometrics import humidity_ratio_from_wet_bulb
+    temperature = random_values(n, -10, 45)
+    wet_bulb = temperature - random_values(n, 0, 10, seed=1)
+    return lambda: humidity_ratio_from_wet_bulb(temperature, wet_bulb, 101325)
+
+
+@benchmark('Dew point', hot=True)
+def dew_point(n):
+    from processing.psychrometrics import dew_point_from_relative_humidity
+    temperature = random_values(n, -10, 45)
+    relative_humidity = random_values(n, 0.05, 1, seed=1)
+    return lambda: dew_point_from_relative_humidity(temperature, relative_humidity)
+
+
+@benchmark('Wet-bulb from humidity ratio', sizes=ARRAY_SIZES)
+def wet_bulb(n):
+    from processing.psychrometrics import wet_bulb_from_humidity_ratio
+    temperature = random_values(n, -10, 45)
+    humidity_ratio = random_values(n, 0.001, 0.02, seed=1)
+    return lambda: wet_bulb_from_humidity_ratio(temperature, humidity_ratio, 101325)
+
+
+@benchmark('Weather file (EPW)', sizes=['1k', '100k'], hot=True)
+def weather_file(n):
+    from processing.weather import process_weather_files
+    path = temporary_path(f'weather_{n}.epw')
+    rng = np.random.default_rng(1)
+    rows = pd.DataFrame({'Year': 2020, 'Month': 1, 'Day': 1, 'Hour': np.arange(n) % 24 + 1, 'Minute': 60,
+                         'Source': '?', 'Dry-bulb': rng.uniform(-10, 35, n).round(1), 'Dew point': 5.0,
+                         'Relative humidity': rng.uniform(20, 100, n).round(), 'Pressure': 101325})
+    with open(path, 'w') as file:
+        file.write('HEADER\n' * 8)
+        rows.to_csv(file, header=False, index=False)
+    return lambda: process_weather_files(path)
+
+
+@benchmark('Standard duct sizing', sizes=ARRAY_SIZES, hot=True)
+def standard_duct_sizing(n):
+    from processing.duct_sizing import size_round_ducts, size_rect_ducts
+    air_volume = random_values(n, 0.02, 5)
+
+    def run():
+        size_round_ducts(air_volume, 1.2, max_velocity=5.0, max_pressure_drop=1.0)
+        return size_rect_ducts(air_volume, 1.2, max_velocity=5.0, max_pressure_drop=1.0, max_depth=400)
+    return run
+
+
+@benchmark('Room schedule flows', sizes=ARRAY_SIZES, hot=True)
+def room_schedule_flows(n):
+    from processing.room_ventilation import calculate_room_flows, aggregate_room_flows
+    rng = np.random.default_rng(1)
+    columns = {'Zone': rng.choice([f'Zone {i}' for i in range(50)], n), 'AHU': rng.choice(['AHU-01', 'AHU-02'], n),
+               'Floor area (m²)': random_values(n, 5, 80), 'Ceiling height (m)': random_values(n, 2.4, 3.6, seed=1),
+               'Occupancy (people)': rng.integers(0, 20, n).astype(float),
+               'Air changes (/hour)': rng.choice([2.0, 6.0, 10.0], n), 'Air per person (l/s)': 10.0}
+
+    def run():
+        results = calculate_room_flows(columns)
+        return aggregate_room_flows(columns, results, 'Zone'), aggregate_room_flows(columns, results, 'AHU')
+    return run
+
+
+###### Schedules, export and reports ######
+
+@benchmark('Excel export', sizes=['1k', '100k'], hot=True)
+def excel_export(n):
+    from processing.export import dataframe_to_excel
+    df = pipe_schedule(n)
+    return lambda: dataframe_to_excel({'Pipe Data': df})
+
+
+@benchmark('CSV export', sizes=ARRAY_SIZES)
+def csv_export(n):
+    from processing.export import dataframe_to_csv
+    df = pipe_schedule(n)
+    return lambda: dataframe_to_csv(df)
+
+
+@benchmark('Parquet export', sizes=ARRAY_SIZES)
+def parquet_export(n):
+    from processing.export import dataframe_to_parquet
+    df = pipe_schedule(n)
+    return lambda: dataframe_to_parquet(df)
+
+
+def schedule_ingestion_case(file_type, sizes):
+    @benchmark(f'Schedule ingestion ({file_type})', sizes=sizes, hot=True)
+    def schedule_ingestion(n):
+        from processing.export import write_excel
+        from processing.heating_processing import PIPE_SIZING_COLUMNS
+        from processing.schedules import read_schedule
+        df = pipe_schedule(n)
+        path = temporary_path(f'schedule_{n}.{file_type}')
+        if file_type == 'xlsx':
+            write_excel({'Pipe Data': df}, path)
+        elif file_type == 'csv':
+            df.to_csv(path, index=False)
+        else:
+            df.to_parquet(path)
+        return lambda: read_schedule(path, list(PIPE_SIZING_COLUMNS), text_columns=['Material'])
+
+
+schedule_ingestion_case('xlsx', ['1k', '100k'])
+schedule_ingestion_case('csv', ARRAY_SIZES)
+schedule_ingestion_case('parquet', ARRAY_SIZES)
+
+
+@benchmark('Entry store extend', sizes=ARRAY_SIZES)
+def entry_store_extend(n):
+    from processing.entry_store import EntryStore
+    from processing.heating_processing import PIPE_SIZING_COLUMNS
+    columns = {name: values.to_numpy() for name, values in pipe_schedule(n).items()}
+
+    def extend():
+        store = EntryStore(PIPE_SIZING_COLUMNS)
+        store.extend(columns)
+        return store.to_dataframe()
+    return extend
+
+
+@benchmark('Calorifier PDF', sizes=['scalar'])
+def calorifier_pdf(n):
+    from processing.heating_processing import create_resultsheet
+    if not os.path.exists(os.path.join('data', 'Building Services', 'calorifier-reheat')):
+        raise BenchmarkSkipped('the calorifier report images are not in data/Building Services')
+    return lambda: create_resultsheet(15, 60, 30, 300, 40, 'Reheat Time', '', True, 80, 60, 0.5)
+
+
+@benchmark('Stack selection', sizes=['scalar'])
+def stack_selection(n):
+    from processing.public_health_processing import select_stack_option
+    return lambda: select_stack_option(7.0, True, 'Secondary')
+
+
+###### Running and comparing ######
+
+def time_case(function, repeat=5):
+    """
+    Time a callable the way timeit does: pick a number of calls per repeat that takes at least 0.2 s,
+    then take the best and median of the repeats. Returns seconds per call.
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    times = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    return {'best (s)': min(times), 'median (s)': statistics.median(times), 'repeats': repeat,
+            'calls per repeat': number}
+
+
+def run_benchmarks(cases=None, sizes=None, repeat=5, log=print):
+    """
+    Run the registered cases (optionally only those whose name contains one of cases) at the given sizes.
+    Returns the results dictionary that is saved as JSON.
+    """
+    results = {}
+    for name, case in BENCHMARKS.items():
+        if cases and not any(pattern.lower() in name.lower() for pattern in cases):
+            continue
+        for size in case['sizes']:
+            if sizes and size not in sizes:
+                continue
+            key = f'{name} [{size}]'
+            n = None if size == 'scalar' else SIZES[size]
+            try:
+                function = case['setup'](n)
+                function()  # Warm up, e.g. loading tables and caches
+                result = time_case(function, repeat)
+            except BenchmarkSkipped as error:
+                log(f'{key:<50} skipped: {error}')
+                continue
+            result.update({'case': name, 'size': size, 'elements': SIZES[size], 'hot': case['hot']})
+            result['per element (s)'] = result['best (s)'] / result['elements']
+            results[key] = result
+            log(f'{key:<50} {result["best (s)"] * 1000:12.4f} ms')
+    return {
+        'metadata': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+        },
+        'results': results,
+    }
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD, hot_only=True):
+    """
+    Compare two benchmark runs by their best times.
+    Returns a list of the regressions, cases slower than the baseline by more than threshold %.
+    """
+    regressions = []
+    for key, result in current['results'].items():
+        reference = baseline['results'].get(key)
+        if reference is None or (hot_only and not result['hot']):
+            continue
+        change = (result['best (s)'] / reference['best (s)'] - 1) * 100
+        if change > threshold:
+            regressions.append({'benchmark': key, 'baseline (s)': reference['best (s)'],
+                                'current (s)': result['best (s)'], 'change (%)': change})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the processing functions at different batch sizes.')
+    parser.add_argument('--cases', nargs='*', help='Only run cases whose name contains one of these')
+    parser.add_argument('--sizes', nargs='*', choices=ALL_SIZES, help='Batch sizes to run (default all)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed repeats per case')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON file to save the results to')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Fail if a hot path is this much slower than the baseline (%%)')
+    parser.add_argument('--all-cases', action='store_true',
+                        help='Check every case against the threshold, not just the hot paths')
+    args = parser.parse_args(argv)
+
+    # Some functions read their data files relative to the repository
+    os.chdir(REPOSITORY_DIRECTORY)
+    try:
+        results = run_benchmarks(args.cases, args.sizes, args.repeat)
+    finally:
+        if _temporary_directory is not None:
+            _temporary_directory.cleanup()
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'Results saved to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare_results(results, baseline, args.threshold, hot_only=not args.all_cases)
+        for regression in regressions:
+            print(f'REGRESSION {regression["benchmark"]}: {regression["baseline (s)"] * 1000:.4f} ms -> '
+                  f'{regression["current (s)"] * 1000:.4f} ms (+{regression["change (%)"]:.1f} %)')
+        if regressions:
+            return 1
+        print(f'No regressions over {args.threshold:g} %')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,8 @@
-import os
-from glob import glob
 import streamlit as st
 
+from processing import instrumentation
+from tool_registry import get_tool_registry
+
 WSP_LOGO_SVG = """
 <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 72.5 34.479" fill="#ff372f">
 <path d="M86.144,27.894a14.183,14.183,0,0,0-3.3-9.317h5.43a15.607,15.607,0,0,1,2.885,9.317v.014a15.617,15.617,0,0,1-2.895,9.333h-5.43a14.176,14.176,0,0,0,3.312-9.333Z" transform="translate(-18.657 -18.577)" ></path>
@@ -28,6 +29,24 @@ def setup_page(title, maintainer, ):
 
     st.title(title)
     add_red_line()
+    add_timing_panel()
+
+
+def add_timing_panel():
+    """
+    Collapsible panel showing where the time went in this run of the page, only shown when timings are
+    enabled (see processing/instrumentation.py). It is filled in once the page has finished running.
+    """
+    if not instrumentation.is_enabled():
+        return
+    placeholder = st.expander('Timings').empty()
+
+    def show_timings(run):
+        with placeholder.container():
+            st.caption(f'Page run took {run.wall_time * 1000:.0f} ms')
+            st.dataframe(run.timings.rows(), hide_index=True)
+
+    instrumentation.on_page_finished(show_timings)
 
 
 def add_red_line():
@@ -57,12 +76,8 @@ def styled_text(text, **kwargs):
 
 def get_tools():
     """
-    returns an iterable of the path to the tool script and its categoru
+    returns an iterable of the path to the tool script and its category, from the cached tool manifest
+    (see tool_registry.py) so the tools folder isn't searched on every rerun
     """
-    # Use the directory of this file to get a reference to pages, so it works in the tests
-    for path in glob(os.path.join(os.path.dirname(__file__), 'tools', '*', '*.py'), recursive=True):
-        # Ignore the __init__ files
-        if not path.endswith('__.py'):
-            # Use the folder names as the category titles
-            category = os.path.basename(os.path.dirname(path))
-            yield path, category
+    for tool in get_tool_registry().tools():
+        yield tool['path'], tool['category']
@@ -1,6 +1,8 @@
 import os
 import streamlit as st
-from common import WSP_LOGO_SVG, get_tools
+from common import WSP_LOGO_SVG
+from tool_registry import get_tool_registry
+from processing.instrumentation import page_run
 
 # The content of this page is applied to all other pages
 st.set_page_config(page_title='Modelling Tools', layout='wide')
@@ -24,14 +26,12 @@ dashboard = st.Page('dashboard.py', title='Dashboard', default=True)
 # Don't give a category name to this one
 tools = {'': [dashboard]}
 
-for path, category in get_tools():
-    # Make the page
-    page = st.Page(path)
-    # Assign it to its category
-    if category in tools:
-        tools[category].append(page)
-    else:
-        tools[category] = [page]
+# The tool manifest is cached, the tool scripts are only imported when their page is opened
+for category, category_tools in get_tool_registry().categories().items():
+    tools[category] = [st.Page(tool['path'], title=tool['title']) for tool in category_tools]
 
 pg = st.navigation(tools, position='hidden')
-pg.run()
+
+# Time the whole page run when timings are enabled
+with page_run(pg.title):
+    pg.run()
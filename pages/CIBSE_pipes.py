@@ -1,86 +1,80 @@
 import streamlit as st
 from common import setup_page
-import pandas as pd
 import math
-from pyfluids import Fluid, FluidsList, Input
 
 from processing.heating_processing import (get_glycol_water_properties,
                                                   calculate_reynolds_number,
                                                   calculate_darcy_friction_factor,
                                                   calculate_pressure_drop_per_meter,
-                                                  convert_df_to_excel)
+                                                  PIPE_SIZING_COLUMNS)
+from processing.export import EXPORT_FORMATS, export_dataframe
+from processing.fluid_state_cache import get_fluid_state
+from processing.entry_store import get_entry_store
+from processing.instrumentation import section
+from processing.schedules import read_schedule, ScheduleError, SCHEDULE_FILE_TYPES
+from processing.pipe_catalog import get_pipe_catalog
 
 setup_page('Heating', 'david.naylor@wsp.com')
 
 def load_excel_data(uploaded_file):
-    """Function to upload and load Excel data into session state"""
-    # Read the Excel file into a DataFrame
-    df = pd.read_excel(uploaded_file)
-
-    # List of required columns
-    required_columns = ["Material", "Nominal diameter (mm)", "Internal diameter (mm)", "Velocity (m/s)",
-                        "Pressure drop (Pa/m)"]
-
-    # Check if all required columns exist in the uploaded file
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    if missing_columns:
-        st.error(f"The uploaded file is missing the following required columns: {', '.join(missing_columns)}")
+    """Function to upload and load Excel, CSV or Parquet data into session state"""
+    # Read only the required columns, rows with missing values are dropped and counted
+    try:
+        return read_schedule(uploaded_file, list(PIPE_SIZING_COLUMNS), text_columns=["Material"], return_dropped=True)
+    except ScheduleError as error:
+        st.error(str(error))
         return
 
-    # Drop rows with missing or NaN values in the required columns
-    df = df.dropna(subset=required_columns)
-
-    # Create a list of tuples with the cleaned data (for all required columns)
-    pipe_entries = [
-        (
-            row['Material'],
-            row['Nominal diameter (mm)'],
-            row['Internal diameter (mm)'],
-            row['Velocity (m/s)'],
-            row["Pressure drop (Pa/m)"]
-        )
-        for _, row in df.iterrows()
-    ]
-
-    return pipe_entries
+def show_dropped_rows(uploaded_file):
+    # Rows with a blank or non-numeric value are skipped when a schedule is loaded, say how many
+    if uploaded_file is not None and st.session_state.get('loaded_file_id') == uploaded_file.file_id:
+        dropped_rows = st.session_state.get('loaded_file_dropped_rows', 0)
+        if dropped_rows:
+            st.warning(f"Rows skipped with a blank or non-numeric value: {dropped_rows}")
 
 def check_existing_file():
     # give the option to reload an excel file into the doc
     existing_file = st.checkbox('Reload existing excel file')
     if existing_file:
         # File upload section to load an existing Excel file
-        uploaded_file = st.file_uploader("Choose an Excel file", type=["xlsx"], key='uploaded_file')
-        if uploaded_file is not None:
-            pipe_entries = load_excel_data(uploaded_file)
-
-            # Update the session state with all column values
-            st.session_state['pipe_entries'] = pipe_entries
-            st.toast('Excel data loaded successfully!')
-
-def add_pipe_entry(df_pipes):
+        uploaded_file = st.file_uploader("Choose an Excel, CSV or Parquet file", type=SCHEDULE_FILE_TYPES,
+                                         key='uploaded_file')
+        # Only read the file when a new one is uploaded, not on every rerun
+        if uploaded_file is not None and st.session_state.get('loaded_file_id') != uploaded_file.file_id:
+            loaded = load_excel_data(uploaded_file)
+            if loaded is not None:
+                columns, dropped_rows = loaded
+                # Replace the entries in session state with the loaded schedule
+                pipe_entries = get_entry_store(st.session_state, 'pipe_entries', PIPE_SIZING_COLUMNS)
+                pipe_entries.clear()
+                pipe_entries.extend(columns)
+                st.session_state['loaded_file_id'] = uploaded_file.file_id
+                st.session_state['loaded_file_dropped_rows'] = dropped_rows
+                st.toast('Excel data loaded successfully!')
+        show_dropped_rows(uploaded_file)
+
+def add_pipe_entry(catalog):
     """Function to add a new pipe entry to session state"""
     st.subheader('Add new entry')
 
     # Inputs
-    pipe_material = st.selectbox('Pipe material', df_pipes['Material'].unique())
+    pipe_material = st.selectbox('Pipe material', catalog.materials)
 
-    # Filter the row based on the selected material
-    eq_roughness_row = df_pipes[df_pipes['Material'] == pipe_material]
-    if not eq_roughness_row.empty:
-        eq_roughness_mm = eq_roughness_row['Equivalent roughness'].values[0]  # m
+    # Look up the roughness for the selected material
+    eq_roughness_mm = catalog.material_roughness(pipe_material)
+    if eq_roughness_mm is not None:
         st.write(f"Equivalent roughness is {eq_roughness_mm} mm")
     else:
         st.warning("No roughness data found for the selected pipe material.")
         eq_roughness_mm = 0
 
-    nominal_diameters = df_pipes[df_pipes['Material'] == pipe_material]['Nominal diameter '].unique()
+    nominal_diameters = catalog.nominal_diameters(pipe_material).tolist()
     nom_diameter_mm = st.selectbox('Nominal diameter', nominal_diameters)
-    int_diameter_row = df_pipes[
-        (df_pipes['Material'] == pipe_material) & (df_pipes['Nominal diameter '] == nom_diameter_mm)]
+    pipe_dimensions = catalog.lookup(pipe_material, nom_diameter_mm)
 
-    # Extract the internal diameter from the row
-    if not int_diameter_row.empty:
-        int_diameter_mm = int_diameter_row['Internal diameter'].values[0]  # Extract the value
+    # Extract the internal diameter from the catalog
+    if pipe_dimensions is not None:
+        int_diameter_mm = pipe_dimensions[0]
         st.write(f"Internal diameter: {int_diameter_mm} mm")
     else:
         st.write("Internal diameter not found.")
@@ -101,10 +95,10 @@ def add_pipe_entry(df_pipes):
         # Get glycol-water mixture properties
         fluid_density, fluid_viscosity = get_glycol_water_properties(glycol_percentage, temperature, pressure)
     else:
-        # Create the fluid instance based on the selected fluid using PyFluids
-        fluid = Fluid(FluidsList.Water)
-        # Update the fluid's state based on the input pressure and temperature
-        fluid.update(Input.temperature(temperature), Input.pressure(pressure))
+        # Get the water state from the shared PyFluids cache based on the input pressure and temperature,
+        # PyFluids is only imported when it's needed as loading it takes seconds
+        from pyfluids import FluidsList
+        fluid = get_fluid_state(FluidsList.Water, temperature, pressure)
         fluid_density = fluid.density  # kg/m³
         fluid_viscosity = fluid.dynamic_viscosity  # Pa.s
 
@@ -143,61 +137,51 @@ def add_pipe_entry(df_pipes):
 
     # Add the diameter and length to session state
     if st.button('Add pipe'):
-        st.session_state['pipe_entries'].append(
-            (pipe_material, nom_diameter_mm, int_diameter_mm, round(velocity, 3), round(pressure_drop_per_meter, 1)))
+        pipe_entries = get_entry_store(st.session_state, 'pipe_entries', PIPE_SIZING_COLUMNS)
+        pipe_entries.append(pipe_material, nom_diameter_mm, int_diameter_mm, round(velocity, 3),
+                            round(pressure_drop_per_meter, 1))
         st.toast(f'Added {pipe_material}, {nom_diameter_mm} mm, {velocity:.2f} m/s, {pressure_drop_per_meter:.2f} Pa/m')
         st.rerun()
 
-# Initialize session state for pipe entries if not already
-if 'pipe_entries' not in st.session_state:
-    st.session_state['pipe_entries'] = []
+# Pipe entries are kept in session state as columns
+pipe_entries = get_entry_store(st.session_state, 'pipe_entries', PIPE_SIZING_COLUMNS)
 
-# Load data from excel file into df
-pipe_data = 'data/Pipe dimension data.xlsx'
-xls_pipes = pd.ExcelFile(pipe_data)
-df_pipes = xls_pipes.parse('Formatted data')
+# Load the pipe dimension data (cached, the workbook is only parsed when it changes)
+pipe_catalog = get_pipe_catalog()
 
 check_existing_file()
 
 # Show the form to add pipes
-add_pipe_entry(df_pipes)
+add_pipe_entry(pipe_catalog)
 
 # Display the list of pipes that have been added in a table (from both manual input and uploaded file)
-if len(st.session_state['pipe_entries']) > 0:
+if len(pipe_entries) > 0:
     st.subheader("Pipe Details")
 
-    # Create a DataFrame from session state data
-    pipe_data = []
-    for pipe_material, nom_diameter_mm, int_diameter_mm, velocity, pressure_drop_per_meter in st.session_state[
-        'pipe_entries']:
-        pipe_data.append([pipe_material, nom_diameter_mm, int_diameter_mm, velocity, pressure_drop_per_meter])
-
-    df = pd.DataFrame(pipe_data,
-                        columns=["Material", "Nominal diameter (mm)", "Internal diameter (mm)", "Velocity (m/s)",
-                                "Pressure drop (Pa/m)"])
-
-    # Calculate total length and total volume
-    #total_length = df["Length (m)"].sum()
-    #total_volume = df["Pipe volume (m³)"].sum()
-
-    # Append a totals row to the DataFrame
-    #df.loc['Total'] = ['', '', '', total_length, total_volume]
+    # Only rebuilt when the entries change
+    df = pipe_entries.to_dataframe()
 
     # Display the table
-    st.dataframe(df)
-
-    # Download the Excel file
+    with section('Pipe table'):
+        st.dataframe(df)
+
+    # Download the table, CSV and Parquet are much quicker than Excel for large schedules
+    export_format = st.selectbox('Download format', list(EXPORT_FORMATS))
+    with section('Pipe table export'):
+        data, extension, mime = pipe_entries.cached(
+            ('export', export_format), lambda: export_dataframe(df, export_format, sheet_name='Pipe Data'))
     st.download_button(
-        label="Download as Excel",
-        data=convert_df_to_excel(df),
-        file_name="pipe_data.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        label=f"Download as {export_format}",
+        data=data,
+        file_name=f"pipe_data{extension}",
+        mime=mime
     )
 
     # Option to clear all entries
     if st.button('Clear all'):
         # Clear the list of pipe entries
-        st.session_state['pipe_entries'] = []
+        pipe_entries.clear()
+        st.session_state.pop('loaded_file_id', None)
         existing_file = False
 
         st.success('All entries and loaded files have been cleared.')
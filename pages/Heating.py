@@ -1,7 +1,6 @@
 import streamlit as st
 from common import setup_page
 import pandas as pd
-from pyfluids import Fluid, FluidsList, Input
 
 from processing.heating_processing import (create_resultsheet,
                                                   calculate_coil_size,
@@ -15,41 +14,22 @@ from processing.heating_processing import (create_resultsheet,
                                                   calculate_heat_transfer,
                                                   calculate_deltaT,
                                                   calculate_flow_rate,
-                                                  get_heating_conversion_factors)
+                                                  get_heating_conversion_factors,
+                                                  PIPE_SIZING_COLUMNS)
+from processing.fluid_state_cache import get_fluid_state
+from processing.entry_store import get_entry_store
+from processing.schedules import read_schedule, ScheduleError, SCHEDULE_FILE_TYPES
 
 
 def load_excel_data(uploaded_file):
-    """Function to upload and load Excel data into session state"""
-    # Read the Excel file into a DataFrame
-    df = pd.read_excel(uploaded_file)
-
-    # List of required columns
-    required_columns = ["Material", "Nominal diameter (mm)", "Internal diameter (mm)", "Velocity (m/s)",
-                        "Pressure drop (Pa/m)"]
-
-    # Check if all required columns exist in the uploaded file
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    if missing_columns:
-        st.error(f"The uploaded file is missing the following required columns: {', '.join(missing_columns)}")
+    """Function to upload and load Excel, CSV or Parquet data into session state"""
+    # Read only the required columns, rows with missing values are dropped and counted
+    try:
+        return read_schedule(uploaded_file, list(PIPE_SIZING_COLUMNS), text_columns=["Material"], return_dropped=True)
+    except ScheduleError as error:
+        st.error(str(error))
         return
 
-    # Drop rows with missing or NaN values in the required columns
-    df = df.dropna(subset=required_columns)
-
-    # Create a list of tuples with the cleaned data (for all required columns)
-    pipe_entries = [
-        (
-            row['Material'],
-            row['Nominal diameter (mm)'],
-            row['Internal diameter (mm)'],
-            row['Velocity (m/s)'],
-            row["Pressure drop (Pa/m)"]
-        )
-        for _, row in df.iterrows()
-    ]
-
-    return pipe_entries
-
 def export_results(initial_temperature, 
                    final_temperature, 
                    coil_size, 
@@ -251,18 +231,34 @@ def append_values_expansion(max_temperature, static_head, SV_margin, EV_size, ve
     })
 
 
+def show_dropped_rows(uploaded_file):
+    # Rows with a blank or non-numeric value are skipped when a schedule is loaded, say how many
+    if uploaded_file is not None and st.session_state.get('loaded_file_id') == uploaded_file.file_id:
+        dropped_rows = st.session_state.get('loaded_file_dropped_rows', 0)
+        if dropped_rows:
+            st.warning(f"Rows skipped with a blank or non-numeric value: {dropped_rows}")
+
+
 def check_existing_file():
     # give the option to reload an excel file into the doc
     existing_file = st.checkbox('Reload existing excel file')
     if existing_file:
         # File upload section to load an existing Excel file
-        uploaded_file = st.file_uploader("Choose an Excel file", type=["xlsx"], key='uploaded_file')
-        if uploaded_file is not None:
-            pipe_entries = load_excel_data(uploaded_file)
-
-            # Update the session state with all column values
-            st.session_state['pipe_entries'] = pipe_entries
-            st.toast('Excel data loaded successfully!')
+        uploaded_file = st.file_uploader("Choose an Excel, CSV or Parquet file", type=SCHEDULE_FILE_TYPES,
+                                         key='uploaded_file')
+        # Only read the file when a new one is uploaded, not on every rerun
+        if uploaded_file is not None and st.session_state.get('loaded_file_id') != uploaded_file.file_id:
+            loaded = load_excel_data(uploaded_file)
+            if loaded is not None:
+                columns, dropped_rows = loaded
+                # Replace the entries in session state with the loaded schedule
+                pipe_entries = get_entry_store(st.session_state, 'pipe_entries', PIPE_SIZING_COLUMNS)
+                pipe_entries.clear()
+                pipe_entries.extend(columns)
+                st.session_state['loaded_file_id'] = uploaded_file.file_id
+                st.session_state['loaded_file_dropped_rows'] = dropped_rows
+                st.toast('Excel data loaded successfully!')
+        show_dropped_rows(uploaded_file)
 
 
 def EV_results(df):
@@ -487,11 +483,11 @@ if tool_selection == 'Heat transfer':
 
     # Function to get fluid properties (for Water or Air)
     def get_medium_properties(transfer_medium, medium_temperature, pressure):
+        # PyFluids (and CoolProp) take seconds to import, so they're only loaded by the tools that use them
+        from pyfluids import FluidsList
 
-        fluid = Fluid(getattr(FluidsList, transfer_medium))
-
-        # Update the fluid's state with the given temperature and pressure
-        fluid.update(Input.pressure(pressure), Input.temperature(medium_temperature))
+        # Get the fluid's state at the given temperature and pressure (cached between reruns)
+        fluid = get_fluid_state(getattr(FluidsList, transfer_medium), medium_temperature, pressure)
 
         # Return key properties
         properties = {
@@ -545,6 +541,9 @@ if tool_selection == 'Heat transfer':
         st.success(f"Mass flow rate: {flow_rate:.2f} l/s")
 
 if tool_selection == 'Pyfluids':
+    # Only imported here, loading PyFluids takes seconds
+    from pyfluids import FluidsList
+
     # Create a list of all available fluids from FluidsList
     fluids = [fluid for fluid in FluidsList]
 
@@ -557,11 +556,8 @@ if tool_selection == 'Pyfluids':
     # Temperature input (in Celsius) with a slider
     temperature = st.slider('Temperature (°C)', min_value=1, max_value=100, value=50)
 
-    # Create the fluid instance based on the selected fluid
-    fluid = Fluid(fluid_selection)
-
-    # Update the fluid's state based on the input pressure and temperature
-    fluid.update(Input.pressure(pressure), Input.temperature(temperature))
+    # Get the fluid's state based on the input pressure and temperature (cached between reruns)
+    fluid = get_fluid_state(fluid_selection, temperature, pressure)
 
     # Display specific heat in kJ/kg·K
     st.markdown(f"**Specific Heat (kJ/kg·K)**: {fluid.specific_heat / 1000:.3f}")
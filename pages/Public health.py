@@ -1,10 +1,14 @@
 import streamlit as st
 import math
-import pandas as pd
 
 from common import setup_page
+from processing.pipe_catalog import get_pipe_catalog
+from processing.export import EXPORT_FORMATS, export_dataframe
+from processing.entry_store import get_entry_store
+from processing.instrumentation import section
+from processing.schedules import ScheduleError, SCHEDULE_FILE_TYPES
 from processing.public_health_processing import (load_excel_data,
-                                                        convert_df_to_excel,
+                                                        PIPE_VOLUME_COLUMNS,
                                                         select_stack_option,
                                                         appliance_du)
 
@@ -37,89 +41,101 @@ if tool_selection == 'Gradients':
                ''')
 
 if tool_selection == 'Pipe volume':
-    # Initialize session state for pipe entries if not already
-    if 'pipe_entries' not in st.session_state:
-        st.session_state['pipe_entries'] = []
+    # Pipe entries are kept in session state as columns, with running totals of the length and volume
+    pipe_entries = get_entry_store(st.session_state, 'pipe_entries', PIPE_VOLUME_COLUMNS,
+                                   total_columns=['Length (m)', 'Pipe volume (m³)'])
 
-    # Load data from excel file into df
-    pipe_data = 'data/Pipe dimension data.xlsx'
-    xls_pipes = pd.ExcelFile(pipe_data)
-    df_pipes = xls_pipes.parse('Formatted data')
+    # Load the pipe dimension data (cached, the workbook is only parsed when it changes)
+    pipe_catalog = get_pipe_catalog()
 
     # give the option to reload an excel file into the doc 
     existing_file = st.checkbox('Reload existing excel file')
     if existing_file:
         # File upload section to load an existing Excel file
-        uploaded_file = st.file_uploader("Choose an Excel file", type=["xlsx"], key='uploaded_file')
-        if uploaded_file is not None:
-            # Update the session state with all column values
-            st.session_state['pipe_entries'] = load_excel_data(uploaded_file)
-            st.toast('Excel data loaded successfully!')
+        uploaded_file = st.file_uploader("Choose an Excel, CSV or Parquet file", type=SCHEDULE_FILE_TYPES,
+                                         key='uploaded_file')
+        # Only read the file when a new one is uploaded, not on every rerun
+        if uploaded_file is not None and st.session_state.get('loaded_file_id') != uploaded_file.file_id:
+            try:
+                columns, dropped_rows = load_excel_data(uploaded_file)
+            except ScheduleError as error:
+                st.error(str(error))
+                columns = None
+            if columns is not None:
+                # Replace the entries with the loaded schedule
+                pipe_entries.clear()
+                pipe_entries.extend(columns)
+                st.session_state['loaded_file_id'] = uploaded_file.file_id
+                st.session_state['loaded_file_dropped_rows'] = dropped_rows
+                st.toast('Excel data loaded successfully!')
+        # Rows with a blank or non-numeric value are skipped, say how many
+        if uploaded_file is not None and st.session_state.get('loaded_file_id') == uploaded_file.file_id:
+            if st.session_state.get('loaded_file_dropped_rows'):
+                st.warning(f"Rows skipped with a blank or non-numeric value: "
+                           f"{st.session_state['loaded_file_dropped_rows']}")
 
     # Show the form to add pipes
     st.subheader('Add new entry')
 
-    pipe_material = st.selectbox('Pipe material', df_pipes['Material'].unique())
-    nominal_diameters = df_pipes[df_pipes['Material'] == pipe_material]['Nominal diameter '].unique()
+    pipe_material = st.selectbox('Pipe material', pipe_catalog.materials)
+    nominal_diameters = pipe_catalog.nominal_diameters(pipe_material).tolist()
     nom_diameter_mm = st.selectbox('Nominal diameter', nominal_diameters)
-    int_diameter_row = df_pipes[
-        (df_pipes['Material'] == pipe_material) & (df_pipes['Nominal diameter '] == nom_diameter_mm)]
+    pipe_dimensions = pipe_catalog.lookup(pipe_material, nom_diameter_mm)
 
-    # Extract the internal diameter from the row
-    if not int_diameter_row.empty:
-        int_diameter_mm = int_diameter_row['Internal diameter'].values[0]  # Extract the value
+    # Extract the internal diameter from the catalog
+    if pipe_dimensions is not None:
+        int_diameter_mm = pipe_dimensions[0]
         st.write(f"Internal diameter: {int_diameter_mm} mm")
     else:
         st.write("Internal diameter not found.")
         int_diameter_mm = st.number_input('Manually set pipe diameter (mm)', min_value=1, value=20)
 
-    length_m = st.number_input(f'Pipe length (m)', min_value=1, key=f'length_{len(st.session_state["pipe_entries"])}')
+    length_m = st.number_input(f'Pipe length (m)', min_value=1, key=f'length_{len(pipe_entries)}')
     m3_per_meter = math.pi * (int_diameter_mm / 2000) ** 2
     pipe_volume_m3 = m3_per_meter * length_m
 
     # Add the diameter and length to session state
     if st.button('Add pipe'):
-        st.session_state['pipe_entries'].append(
-            (pipe_material, nom_diameter_mm, int_diameter_mm, length_m, pipe_volume_m3))
+        pipe_entries.append(pipe_material, nom_diameter_mm, int_diameter_mm, length_m, pipe_volume_m3)
         st.toast(f'Added {pipe_material}, {nom_diameter_mm} mm, {length_m:.2f} m')
         st.rerun()
 
     # Display the list of pipes that have been added in a table (from both manual input and uploaded file)
-    if len(st.session_state['pipe_entries']) > 0:
+    if len(pipe_entries) > 0:
         st.subheader("Pipe Details")
 
-        # Create a DataFrame from session state data
-        pipe_data = []
-        for pipe_material, nom_diameter_mm, int_diameter_mm, length_m, pipe_volume_m3 in st.session_state[
-            'pipe_entries']:
-            pipe_data.append([pipe_material, nom_diameter_mm, int_diameter_mm, length_m, round(pipe_volume_m3, 2)])
+        def pipe_table():
+            """Entries with the volume rounded and a totals row, only rebuilt when the entries change"""
+            df = pipe_entries.to_dataframe().round({'Pipe volume (m³)': 2})
+            totals = pipe_entries.totals
+            # The index and numeric columns keep a single type, so the table doesn't need converting to display
+            df.index = df.index.astype(str)
+            df.loc['Total'] = ['', None, None, totals['Length (m)'], round(totals['Pipe volume (m³)'], 2)]
+            return df
 
-        df = pd.DataFrame(pipe_data,
-                          columns=["Material", "Nominal diameter (mm)", "Internal diameter (mm)", "Length (m)",
-                                   "Pipe volume (m³)"])
-
-        # Calculate total length and total volume
-        total_length = df["Length (m)"].sum()
-        total_volume = df["Pipe volume (m³)"].sum()
-
-        # Append a totals row to the DataFrame
-        df.loc['Total'] = ['', '', '', total_length, total_volume]
+        df = pipe_entries.cached('table', pipe_table)
 
         # Display the table
-        st.dataframe(df)
-
-        # Download the Excel file
+        with section('Pipe table'):
+            st.dataframe(df)
+
+        # Download the table, CSV and Parquet are much quicker than Excel for large schedules
+        export_format = st.selectbox('Download format', list(EXPORT_FORMATS))
+        with section('Pipe table export'):
+            data, extension, mime = pipe_entries.cached(
+                ('export', export_format), lambda: export_dataframe(df, export_format, sheet_name='Pipe Data'))
         st.download_button(
-            label="Download as Excel",
-            data=convert_df_to_excel(df),
-            file_name="pipe_data.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            label=f"Download as {export_format}",
+            data=data,
+            file_name=f"pipe_data{extension}",
+            mime=mime
         )
 
         # Option to clear all entries
         if st.button('Clear all'):
             # Clear the list of pipe entries
-            st.session_state['pipe_entries'] = []
+            pipe_entries.clear()
+            st.session_state.pop('loaded_file_id', None)
             existing_file = False
 
             st.success('All entries and loaded files have been cleared.')
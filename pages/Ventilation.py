@@ -1,6 +1,6 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-import psychrolib
 import bokeh
 
 from processing.ventilation_processing import (calculate_ach_volume,
@@ -11,6 +11,8 @@ from processing.ventilation_processing import (calculate_ach_volume,
                                                       plot_duct_cross_section,
                                                       calculate_duct_velocity,
                                                       calculate_pressure_loss,
+                                                      calculate_hydraulic_diameter,
+                                                      DUCT_ROUGHNESS,
                                                       find_min_rect_size,
                                                       calculate_aspect_ratio,
                                                       find_min_diameter,
@@ -18,7 +20,20 @@ from processing.ventilation_processing import (calculate_ach_volume,
                                                       conversion_factors,
                                                       convert_airflow_rate,
                                                       get_air_properties,
-                                                      plot_psychrometric)
+                                                      plot_psychrometric,
+                                                      add_psychrometric_points,
+                                                      add_psychrometric_density)
+from processing.duct_sizing import size_round_ducts, size_rect_ducts
+from processing.psychrometrics import humidity_ratio_from_wet_bulb
+from processing.schedules import ScheduleError, SCHEDULE_FILE_TYPES
+from processing.room_ventilation import (ROOM_SCHEDULE_COLUMNS, ROOM_REQUIRED_COLUMNS, read_room_schedule,
+                                         calculate_room_flows, aggregate_room_flows)
+from processing.duct_network import (DuctNetwork, read_duct_schedule, DUCT_SCHEDULE_COLUMNS, DUCT_OPTIONAL_COLUMNS,
+                                      DUCT_FITTINGS)
+from processing.export import EXPORT_FORMATS, export_dataframe
+from processing.weather import (WEATHER_FILE_TYPES, process_weather_files, DRY_BULB, WET_BULB, ENTHALPY,
+                                HUMIDITY_RATIO)
+from processing.instrumentation import section
 from common import setup_page
 
 
@@ -98,7 +113,7 @@ def append_values_area(room_reference, floor_area, ceiling_height, room_volume,
     })
 
 
-def display_rect_duct(air_volume, air_density):
+def display_rect_duct(air_volume, air_density, air_viscosity, roughness_mm):
     duct_calc_type = st.radio('Select the calculation type', ['Standard', 'Minimum duct size'], horizontal=True)
 
     if duct_calc_type == 'Standard':
@@ -110,7 +125,8 @@ def display_rect_duct(air_volume, air_density):
         # run calcs
         duct_area_sqm, eq_diameter_mm = calculate_rect_duct_area(width_mm, height_mm)
         duct_velocity = calculate_duct_velocity(duct_area_sqm, air_volume)
-        pressure_loss = calculate_pressure_loss(eq_diameter_mm, air_density, duct_velocity)
+        pressure_loss = calculate_pressure_loss(calculate_hydraulic_diameter(width_mm, height_mm), air_density,
+                                                duct_velocity, air_viscosity, roughness_mm)
 
         # results
         st.success(f'''
@@ -138,18 +154,28 @@ def display_rect_duct(air_volume, air_density):
         # run calcs
         duct_area, eq_diameter = calculate_rect_duct_area(width_mm, height_mm)
         duct_velocity = calculate_duct_velocity(duct_area, air_volume)
-        pressure_loss = calculate_pressure_loss(eq_diameter, air_density, duct_velocity)
+        pressure_loss = calculate_pressure_loss(calculate_hydraulic_diameter(width_mm, height_mm), air_density,
+                                                duct_velocity, air_viscosity, roughness_mm)
         aspect_ratio = calculate_aspect_ratio(width_mm, height_mm)
 
         if aspect_ratio >= 4:
             st.warning('Aspect ratio is greater than 4 to 1 in one axis, this is typically not ok.')
 
+        # Smallest standard size up to 4 to 1, no wider than the fixed dimension (the width of the minimum size)
+        standard = size_rect_ducts(air_volume, air_density, max_duct_velocity, max_aspect_ratio=4,
+                                   max_width=max_dim_mm, air_viscosity=air_viscosity, roughness_mm=roughness_mm)
+        if np.isnan(standard['Width (mm)'][0]):
+            standard_size = 'larger than the standard sizes'
+        else:
+            standard_size = f"{standard['Width (mm)'][0]:.0f}mm x {standard['Height (mm)'][0]:.0f}mm"
+
         # results
         st.success(f'''
                     Results
                     - Minimum size is {width_mm:.0f}mm x {height_mm:.0f}mm
                     - Pressure loss is {pressure_loss:.0f} Pa/m
                     - Aspect ratio is {aspect_ratio:.1f}
+                    - Smallest standard size is {standard_size}
                     ''')
 
     else:
@@ -159,10 +185,11 @@ def display_rect_duct(air_volume, air_density):
         # Example usage in Streamlit
         fig = plot_duct_cross_section(width_mm, height_mm, None)
         # Show the plot
-        st.pyplot(fig)
+        with section('Duct cross section render'):
+            st.pyplot(fig)
 
 
-def display_round_duct(air_volume, air_density):
+def display_round_duct(air_volume, air_density, air_viscosity, roughness_mm):
     """Handles the round duct shape calculations."""
 
     # Inputs
@@ -174,9 +201,15 @@ def display_round_duct(air_volume, air_density):
 
     # Run calculations
     min_diameter = find_min_diameter(air_volume, max_duct_velocity)
+    standard_diameter = size_round_ducts(air_volume, air_density, max_duct_velocity, air_viscosity=air_viscosity,
+                                         roughness_mm=roughness_mm)['Diameter (mm)'][0]
+    if np.isnan(standard_diameter):
+        standard_size = 'larger than the standard sizes'
+    else:
+        standard_size = f'{standard_diameter:.0f} mm'
     duct_area = calculate_round_duct_area(diameter_mm)
     duct_velocity = calculate_duct_velocity(duct_area, air_volume)
-    pressure_loss = calculate_pressure_loss(diameter_mm, air_density, duct_velocity)
+    pressure_loss = calculate_pressure_loss(diameter_mm, air_density, duct_velocity, air_viscosity, roughness_mm)
 
     # Results
     st.success(f'''
@@ -184,12 +217,60 @@ def display_round_duct(air_volume, air_density):
                - Velocity is {duct_velocity:.2f} m/s
                - Pressure drop is {pressure_loss:.2f} Pa/m
                - Min diameter for {max_duct_velocity} m/s is {min_diameter} mm
+               - Smallest standard diameter for {max_duct_velocity} m/s is {standard_size}
                ''')
     with st.expander('Plot'):
         # Example usage to plot a round duct:
         plot_duct_cross_section(None, None, diameter_mm)
 
 
+def load_room_schedule(uploaded_file):
+    """Read a room schedule and calculate every room, the results (or error) are kept until a new file is uploaded"""
+    # A file that can't be read isn't read again on every rerun, and the last file's results aren't left showing
+    st.session_state['room_schedule_id'] = uploaded_file.file_id
+    st.session_state.pop('room_schedule', None)
+    st.session_state.pop('room_schedule_error', None)
+    try:
+        columns, dropped_rows = read_room_schedule(uploaded_file)
+    except ScheduleError as error:
+        st.session_state['room_schedule_error'] = str(error)
+        return
+    results = calculate_room_flows(columns)
+    st.session_state['room_schedule'] = {
+        'rooms': pd.DataFrame({**columns, **results}),
+        'zones': pd.DataFrame(aggregate_room_flows(columns, results, 'Zone')),
+        'AHUs': pd.DataFrame(aggregate_room_flows(columns, results, 'AHU')),
+        'dropped_rows': dropped_rows,
+        'exports': {},
+    }
+
+
+def load_duct_network(uploaded_file):
+    """Read a duct schedule and build the network, it (or the error) is kept until a new file is uploaded"""
+    st.session_state['duct_network_id'] = uploaded_file.file_id
+    st.session_state.pop('duct_network', None)
+    st.session_state.pop('duct_network_error', None)
+    try:
+        columns = read_duct_schedule(uploaded_file)
+        network = DuctNetwork.from_schedule(columns)
+    except ValueError as error:
+        # A ScheduleError, or sections without a size or that loop back on themselves
+        st.session_state['duct_network_error'] = str(error)
+        return
+    st.session_state['duct_network'] = {'sections': columns['Section'], 'network': network}
+
+
+def load_weather_file(uploaded_file):
+    """Bin the hours of a weather file, the bins (or error) are kept until a new file is uploaded"""
+    st.session_state['weather_file_id'] = uploaded_file.file_id
+    st.session_state.pop('weather_bins', None)
+    st.session_state.pop('weather_file_error', None)
+    try:
+        st.session_state['weather_bins'] = process_weather_files(uploaded_file)
+    except ScheduleError as error:
+        st.session_state['weather_file_error'] = str(error)
+
+
 # WSP header
 setup_page('Ventilation', 'david.naylor@wsp.com')
 
@@ -198,11 +279,13 @@ if 'ACH_results' not in st.session_state:
     st.session_state['ACH_results'] = []
 
 tool_selection = st.selectbox('Select your tool', (
-    'Volume flow rates', 'Unit converter', 'CIBSE duct sizing', 'Louvres', 'Psychrometirc chart'), index=None)
+    'Volume flow rates', 'Room schedule', 'Unit converter', 'CIBSE duct sizing', 'Duct network', 'Louvres',
+    'Psychrometirc chart'),
+                              index=None)
 
 with st.expander('How to use'):
     st.markdown('''
-                This is a basic app to help you do quick checks for ventilation calculations, it's not here to calculate your index leg.  
+                This is a basic app to help you do quick checks for ventilation calculations, upload a duct schedule to the duct network tool to find your index leg.  
                 - Select a calculation type below  
                 - Some results are stored in the results dropdown, although they won't stay if you refresh the page.
                 ''')
@@ -283,6 +366,46 @@ if tool_selection == 'Volume flow rates':
         df = pd.DataFrame(st.session_state.ACH_results)
         results(df)
 
+if tool_selection == 'Room schedule':
+    st.markdown("Upload a schedule of rooms to find the most onerous of the air change and occupancy flow rates "
+                "for every room, with totals for each zone and AHU. The schedule needs the columns: "
+                + ', '.join(f"'{column}'" for column in ROOM_REQUIRED_COLUMNS) + ", and can have: "
+                + ', '.join(f"'{column}'" for column in ROOM_SCHEDULE_COLUMNS if column not in ROOM_REQUIRED_COLUMNS)
+                + ". Blank values are taken as 0, and rooms without a zone or AHU are grouped as 'Unassigned'.")
+    uploaded_file = st.file_uploader("Choose an Excel, CSV or Parquet file", type=SCHEDULE_FILE_TYPES,
+                                     key='room_schedule_file')
+    # Only calculate the schedule when a new file is uploaded, not on every rerun
+    if uploaded_file is not None and st.session_state.get('room_schedule_id') != uploaded_file.file_id:
+        load_room_schedule(uploaded_file)
+
+    if uploaded_file is not None and 'room_schedule_error' in st.session_state:
+        st.error(st.session_state['room_schedule_error'])
+
+    if uploaded_file is not None and 'room_schedule' in st.session_state:
+        room_schedule = st.session_state['room_schedule']
+        if room_schedule['dropped_rows']:
+            st.warning(f"Rows left out without a room reference or floor area: {room_schedule['dropped_rows']}")
+        rooms_tab, zones_tab, ahus_tab = st.tabs(['Rooms', 'Zones', 'AHUs'])
+        with rooms_tab:
+            st.dataframe(room_schedule['rooms'], hide_index=True)
+        with zones_tab:
+            st.dataframe(room_schedule['zones'], hide_index=True)
+        with ahus_tab:
+            st.dataframe(room_schedule['AHUs'], hide_index=True)
+
+        export_format = st.selectbox('Download format', list(EXPORT_FORMATS))
+        with section('Room schedule export'):
+            if export_format not in room_schedule['exports']:
+                room_schedule['exports'][export_format] = export_dataframe(room_schedule['rooms'], export_format,
+                                                                           sheet_name='Rooms')
+            data, extension, mime = room_schedule['exports'][export_format]
+        st.download_button(
+            label=f"Download rooms as {export_format}",
+            data=data,
+            file_name=f"room_schedule{extension}",
+            mime=mime
+        )
+
 if tool_selection == 'Unit converter':
 
     # Conversion factors from one unit to another. User input for the value and units
@@ -313,12 +436,75 @@ if tool_selection == 'CIBSE duct sizing':
 
     st.subheader('Duct')
     duct_shape = st.radio('select the duct shape', ['Rectangular', 'Round'], horizontal=True)
+    duct_material = st.selectbox('Duct material', list(DUCT_ROUGHNESS),
+                                 index=list(DUCT_ROUGHNESS).index('Galvanised steel'))
+    roughness_mm = DUCT_ROUGHNESS[duct_material]
+    st.write(f"Equivalent roughness is {roughness_mm} mm")
 
     if duct_shape == 'Rectangular':
-        display_rect_duct(air_volume, properties['Density (kg/m³)'])
+        display_rect_duct(air_volume, properties['Density (kg/m³)'], properties['Dynamic viscosity (Pa·s)'],
+                          roughness_mm)
 
     elif duct_shape == 'Round':
-        display_round_duct(air_volume, properties['Density (kg/m³)'])
+        display_round_duct(air_volume, properties['Density (kg/m³)'], properties['Dynamic viscosity (Pa·s)'],
+                           roughness_mm)
+
+if tool_selection == 'Duct network':
+    st.markdown("Upload a duct schedule to find the pressure loss of every section, the index run and the fan static "
+                "pressure. The schedule needs the columns: " + ', '.join(f"'{column}'" for column in DUCT_SCHEDULE_COLUMNS)
+                + ", with the upstream section left blank for sections connected to the fan. It can also have: "
+                + ', '.join(f"'{column}'" for column in DUCT_OPTIONAL_COLUMNS)
+                + ", and a column with the number of each fitting in the section for any of: "
+                + ', '.join(f"'{fitting}'" for fitting in DUCT_FITTINGS))
+    uploaded_file = st.file_uploader("Choose an Excel, CSV or Parquet file", type=SCHEDULE_FILE_TYPES,
+                                     key='duct_schedule_file')
+    # Only read the schedule when a new file is uploaded, the network is solved again when the inputs change
+    if uploaded_file is not None and st.session_state.get('duct_network_id') != uploaded_file.file_id:
+        load_duct_network(uploaded_file)
+
+    if uploaded_file is not None and 'duct_network_error' in st.session_state:
+        st.error(st.session_state['duct_network_error'])
+
+    if uploaded_file is not None and 'duct_network' in st.session_state:
+        with st.expander('Air and plant'):
+            air_temperature = st.number_input('Air Temperature (°C)', value=20, key='duct_network_temperature')
+            pressure = st.number_input('Pressure (Pa)', min_value=0, value=101325, key='duct_network_pressure')
+            plant_pressure_loss = st.number_input('Plant pressure loss (Pa)', min_value=0.0, step=10.0, value=0.0,
+                                                  help='Pressure loss of the AHU (filters, coils, etc.) and any '
+                                                       'ductwork not in the schedule')
+            margin = st.number_input('Fan margin (%)', min_value=0, max_value=50, step=5, value=10)
+
+        properties = get_air_properties(air_temperature, pressure)
+        sections = st.session_state['duct_network']['sections']
+        network_results = st.session_state['duct_network']['network'].solve(
+            properties['Density (kg/m³)'], properties['Dynamic viscosity (Pa·s)'],
+            plant_pressure_loss=plant_pressure_loss, margin=margin / 100)
+        index_run = network_results.pop('Index run')
+        index_pressure_loss = network_results.pop('Index run pressure loss (Pa)')
+        fan_static_pressure = network_results.pop('Fan static pressure (Pa)')
+
+        st.success(f'''
+                   Results
+                   - The index run ends at section {sections[index_run[-1]]}, {len(index_run)} sections from the fan
+                   - Index run pressure loss is {index_pressure_loss:.0f} Pa
+                   - Fan static pressure is {fan_static_pressure:.0f} Pa, with the plant and {margin}% margin
+                   ''')
+        sections_df = pd.DataFrame({'Section': sections, **network_results})
+        sections_tab, index_tab = st.tabs(['Sections', 'Index run'])
+        with sections_tab:
+            st.dataframe(sections_df, hide_index=True)
+        with index_tab:
+            st.dataframe(sections_df.iloc[index_run], hide_index=True)
+
+        export_format = st.selectbox('Download format', list(EXPORT_FORMATS))
+        with section('Duct network export'):
+            data, extension, mime = export_dataframe(sections_df, export_format, sheet_name='Sections')
+        st.download_button(
+            label=f"Download sections as {export_format}",
+            data=data,
+            file_name=f"duct_network{extension}",
+            mime=mime
+        )
 
 if tool_selection == 'Louvres':
     st.markdown('Calculate louvre size requirement and face velocity')
@@ -372,9 +558,7 @@ if tool_selection == 'Psychrometirc chart':
         # Button to add the point
         if st.button("Add Point"):
             if wb_temp <= db_temp:
-                # Set unit system to SI
-                psychrolib.SetUnitSystem(psychrolib.SI)
-                hum_ratio_point = psychrolib.GetHumRatioFromTWetBulb(db_temp, wb_temp, pressure)
+                hum_ratio_point = float(humidity_ratio_from_wet_bulb(db_temp, wb_temp, pressure))
                 # Append the point to session state
                 st.session_state['points'].append((db_temp, hum_ratio_point, label))
                 st.success(
@@ -398,10 +582,29 @@ if tool_selection == 'Psychrometirc chart':
             # Update session state with any changes made in the data editor
             st.session_state['points'] = list(edited_points.itertuples(index=False, name=None))
 
-            # Extract data for plotting
-            db_temps, hum_ratios, labels = zip(*st.session_state['points'])
-            p.circle(db_temps, hum_ratios, size=10, color="red", legend_label="Added points")
+            # The points are overlaid as their own data source, the chart lines come from a cache
+            add_psychrometric_points(p, st.session_state['points'])
+
+    with st.expander('Weather file'):
+        st.markdown("Shade the hours of an annual weather file (EPW, or CSV with 'Dry-bulb temperature (°C)' and "
+                    "'Relative humidity (%)' or 'Wet-bulb temperature (°C)' columns) on the chart")
+        weather_file = st.file_uploader("Choose an EPW or CSV file", type=WEATHER_FILE_TYPES, key='weather_file')
+        # Only process the file when a new one is uploaded, not on every rerun
+        if weather_file is not None and st.session_state.get('weather_file_id') != weather_file.file_id:
+            load_weather_file(weather_file)
+        if weather_file is not None and 'weather_file_error' in st.session_state:
+            st.error(st.session_state['weather_file_error'])
+        if weather_file is not None and 'weather_bins' in st.session_state:
+            weather_bins = st.session_state['weather_bins']
+            add_psychrometric_density(p, weather_bins)
+            st.markdown(f"{weather_bins.hours} hours, {weather_bins.invalid} without a valid state")
+            # Values exceeded for 0.4, 1 and 2 % of the hours, as for annual design conditions
+            design_columns = [DRY_BULB, WET_BULB, ENTHALPY, HUMIDITY_RATIO]
+            st.dataframe(pd.DataFrame({f'Exceeded {percentage} % of hours':
+                                       [weather_bins.design_value(column, percentage) for column in design_columns]
+                                       for percentage in [0.4, 1, 2]}, index=design_columns))
 
     # Display the plot by embedding html
-    st.components.v1.html(bokeh.embed.file_html(p))
+    with section('Psychrometric chart embed'):
+        st.components.v1.html(bokeh.embed.file_html(p))
 
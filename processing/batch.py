@@ -0,0 +1,311 @@
+"""
+Headless batch sizing over schedule files, for overnight runs without the Streamlit app.
+
+Run from the repository root:
+    python -m processing.batch pipes pipe_schedule.xlsx sized_pipes.parquet --max-pressure-drop 250
+    python -m processing.batch stacks stacks.csv stacks_sized.csv --frequency-factor 0.7 --workers 8
+
+The input is read with read_schedule (Excel, CSV or Parquet), split into chunks that are sized in parallel
+worker processes, and the results are streamed to the CSV or Parquet output chunk by chunk, in input order.
+Problems with the input are raised as ScheduleError, nothing here reports to a user interface.
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from processing.duct_sizing import size_round_ducts, size_rect_ducts
+from processing.export import CHUNK_SIZE, write_csv, write_parquet
+from processing.heating_processing import (calculate_CFP, calculate_max_system_pressure, calculate_acceptance_factor,
+                                           calculate_EV_size, expansion_factor, get_glycol_water_properties)
+from processing.instrumentation import timed
+from processing.pipe_catalog import get_pipe_catalog
+from processing.pipe_sizing import size_pipes
+from processing.public_health_processing import select_stack_option
+from processing.room_ventilation import (ROOM_SCHEDULE_COLUMNS, ROOM_TEXT_COLUMNS, calculate_room_flows,
+                                         read_room_schedule)
+from processing.schedules import read_schedule, ScheduleError
+from processing.ventilation_processing import (calculate_round_duct_area, calculate_pressure_loss, get_air_properties,
+                                               DEFAULT_DUCT_ROUGHNESS, STANDARD_AIR_VISCOSITY)
+
+# Text values of a yes/no column that count as yes
+TRUE_VALUES = {'yes', 'y', 'true', '1', '1.0'}
+
+
+###### Stack sizing ######
+
+STACK_COLUMNS = {
+    'Total DU (l/s)': float,
+    'WC present': object,
+    'Venting method': object,
+}
+
+
+def _size_stacks(columns, frequency_factor):
+    flow_rate = np.sqrt(columns['Total DU (l/s)']) * frequency_factor
+    wc_present = np.isin(np.char.lower(columns['WC present'].astype(str)), list(TRUE_VALUES))
+    return {
+        'Waste water flow rate (l/s)': flow_rate,
+        'Stack': [select_stack_option(flow, wc, vent_method.capitalize())
+                  for flow, wc, vent_method in zip(flow_rate, wc_present, columns['Venting method'])],
+    }
+
+
+###### Pipe sizing ######
+
+PIPE_BATCH_COLUMNS = {
+    'Material': object,
+    'Flow rate (l/s)': float,
+}
+
+
+def _pipe_fluid_properties(options):
+    """The water (or glycol-water) properties are found once here, rather than in every worker"""
+    if options['max_velocity'] is None and options['max_pressure_drop'] is None:
+        raise ValueError('Pipe sizing needs a maximum velocity, a maximum pressure drop or both')
+    if options['glycol_percentage']:
+        density, viscosity = get_glycol_water_properties(options['glycol_percentage'] / 100, options['temperature'],
+                                                         options['pressure'])
+    else:
+        from pyfluids import FluidsList
+        from processing.fluid_state_cache import get_fluid_state
+
+        fluid = get_fluid_state(FluidsList.Water, options['temperature'], options['pressure'])
+        density, viscosity = fluid.density, fluid.dynamic_viscosity
+    return {'fluid_density': float(density), 'fluid_viscosity': float(viscosity),
+            'max_velocity': options['max_velocity'], 'max_pressure_drop': options['max_pressure_drop'],
+            'friction_model': options['friction_model']}
+
+
+def _check_pipe_materials(columns):
+    unknown = sorted(set(np.unique(columns['Material']).tolist()) - set(get_pipe_catalog().materials))
+    if unknown:
+        raise ScheduleError(f"Materials not in the pipe catalog: {', '.join(unknown)}")
+
+
+def _size_pipes(columns, fluid_density, fluid_viscosity, max_velocity, max_pressure_drop, friction_model):
+    results = {name: np.full(len(columns['Material']), np.nan) for name in
+               ['Nominal diameter (mm)', 'Internal diameter (mm)', 'Velocity (m/s)', 'Pressure drop (Pa/m)']}
+    materials, material_index = np.unique(columns['Material'], return_inverse=True)
+    for i, material in enumerate(materials):
+        rows = material_index == i
+        sized = size_pipes(columns['Flow rate (l/s)'][rows], material, fluid_density, fluid_viscosity,
+                           max_velocity, max_pressure_drop, friction_model=friction_model)
+        for name, values in sized.items():
+            results[name][rows] = values
+    return results
+
+
+###### Expansion vessel sizing ######
+
+EXPANSION_COLUMNS = {
+    'System volume (l)': float,
+    'Maximum temperature (°C)': float,
+    'Static head (m)': float,
+    'Lowest working pressure (bar g)': float,
+}
+
+
+def _size_expansion_vessels(columns, safety_valve_margin):
+    cold_fill_pressure = calculate_CFP(columns['Static head (m)'])
+    max_system_pressure = calculate_max_system_pressure(columns['Lowest working pressure (bar g)'],
+                                                        safety_valve_margin)
+    vessel_acceptance = calculate_acceptance_factor(cold_fill_pressure, max_system_pressure)
+    factors = expansion_factor(columns['Maximum temperature (°C)'])
+    return {
+        'Cold fill pressure (bar abs)': cold_fill_pressure,
+        'Maximum system pressure (bar abs)': max_system_pressure,
+        'Vessel acceptance': vessel_acceptance,
+        'Expansion factor': factors,
+        'Expansion vessel size (l)': calculate_EV_size(columns['System volume (l)'], factors, vessel_acceptance),
+    }
+
+
+###### Duct sizing ######
+
+DUCT_COLUMNS = {
+    'Air volume (m³/s)': float,
+}
+
+
+def _duct_air_density(options):
+    air = get_air_properties(options['temperature'], options['pressure'])
+    return {'air_density': air['Density (kg/m³)'], 'air_viscosity': air['Dynamic viscosity (Pa·s)'],
+            'max_velocity': options['max_velocity'], 'max_dimension': options['max_dimension'],
+            'max_pressure_drop': options['max_pressure_drop'], 'max_aspect_ratio': options['max_aspect_ratio'],
+            'max_depth': options['max_depth'], 'roughness': options['roughness'],
+            'friction_model': options['friction_model']}
+
+
+def _size_ducts(columns, air_density, max_velocity, max_dimension, max_pressure_drop=None, max_aspect_ratio=4.0,
+                max_depth=None, air_viscosity=STANDARD_AIR_VISCOSITY, roughness=DEFAULT_DUCT_ROUGHNESS,
+                friction_model='Colebrook'):
+    # The same sizes as find_min_diameter and find_min_rect_size, for whole columns
+    air_volume = columns['Air volume (m³/s)']
+    required_area = air_volume / max_velocity
+    diameter = np.ceil(np.sqrt(4 * required_area / np.pi) * 1000)
+    round_velocity = air_volume / calculate_round_duct_area(diameter)
+    if max_dimension:
+        width = np.full(len(air_volume), float(max_dimension))
+        height = required_area / (max_dimension / 1000) * 1000
+    else:
+        width = height = np.ceil(np.sqrt(required_area) * 1000)
+    # The smallest standard sizes meeting every limit
+    friction = {'air_viscosity': air_viscosity, 'roughness_mm': roughness, 'friction_model': friction_model}
+    standard_round = size_round_ducts(air_volume, air_density, max_velocity, max_pressure_drop, **friction)
+    # The fixed dimension is the width, for the standard sizes as well
+    standard_rect = size_rect_ducts(air_volume, air_density, max_velocity, max_pressure_drop, max_aspect_ratio,
+                                    max_depth, max_dimension or None, **friction)
+    return {
+        'Diameter (mm)': diameter,
+        'Round velocity (m/s)': round_velocity,
+        'Round pressure loss (Pa/m)': calculate_pressure_loss(diameter, air_density, round_velocity, air_viscosity,
+                                                              roughness, friction_model),
+        'Width (mm)': width,
+        'Height (mm)': height,
+        'Rectangular velocity (m/s)': air_volume / (width * height / 1e6),
+        'Standard diameter (mm)': standard_round['Diameter (mm)'],
+        'Standard round velocity (m/s)': standard_round['Velocity (m/s)'],
+        'Standard round pressure loss (Pa/m)': standard_round['Pressure loss (Pa/m)'],
+        'Standard width (mm)': standard_rect['Width (mm)'],
+        'Standard height (mm)': standard_rect['Height (mm)'],
+        'Standard rectangular velocity (m/s)': standard_rect['Velocity (m/s)'],
+        'Standard rectangular pressure loss (Pa/m)': standard_rect['Pressure loss (Pa/m)'],
+    }
+
+
+###### Running jobs ######
+
+def _read_rooms(source):
+    # Blank demand inputs are 0, only rooms without a reference or floor area are dropped
+    columns, _ = read_room_schedule(source)
+    return columns
+
+
+# columns: Required input columns and their types, options: the job's options and their defaults
+# prepare: Optional, turns the options into the arguments of run once, before the work is split up
+# check: Optional, validates the whole input before any work is done
+# read: Optional, reads the input instead of read_schedule, for schedules with columns that can be left blank
+BATCH_JOBS = {
+    'stacks': {'columns': STACK_COLUMNS, 'text_columns': ['WC present', 'Venting method'],
+               'options': {'frequency_factor': 0.5}, 'run': _size_stacks},
+    'pipes': {'columns': PIPE_BATCH_COLUMNS, 'text_columns': ['Material'],
+              'options': {'temperature': 50.0, 'pressure': 101325.0, 'glycol_percentage': 0.0, 'max_velocity': None,
+                          'max_pressure_drop': None, 'friction_model': 'Colebrook'},
+              'prepare': _pipe_fluid_properties, 'check': _check_pipe_materials, 'run': _size_pipes},
+    'expansion': {'columns': EXPANSION_COLUMNS, 'text_columns': [],
+                  'options': {'safety_valve_margin': 0.5}, 'run': _size_expansion_vessels},
+    'ducts': {'columns': DUCT_COLUMNS, 'text_columns': [],
+              'options': {'max_velocity': 5.0, 'max_dimension': None, 'temperature': 20.0, 'pressure': 101325.0,
+                          'max_pressure_drop': None, 'max_aspect_ratio': 4.0, 'max_depth': None,
+                          'roughness': DEFAULT_DUCT_ROUGHNESS, 'friction_model': 'Colebrook'},
+              'prepare': _duct_air_density, 'run': _size_ducts},
+    # Per room only, the zone and AHU totals (room_ventilation.aggregate_room_flows) need every room at once
+    'rooms': {'columns': ROOM_SCHEDULE_COLUMNS, 'text_columns': ROOM_TEXT_COLUMNS, 'options': {},
+              'read': _read_rooms, 'run': calculate_room_flows},
+}
+
+# Output writers by file extension
+BATCH_WRITERS = {
+    '.csv': write_csv,
+    '.parquet': write_parquet,
+}
+
+
+def run_chunk(job, columns, arguments):
+    """Size one chunk of rows, returns a DataFrame of the input columns followed by the results"""
+    results = BATCH_JOBS[job]['run'](columns, **arguments)
+    return pd.DataFrame({**columns, **results})
+
+
+def _run_chunk(task):
+    return run_chunk(*task)
+
+
+@timed()
+def run_batch(job, source, output, options=None, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Run one of the BATCH_JOBS over every row of a schedule.
+    source: Input file path or file object (Excel, CSV or Parquet), with the job's required columns.
+    output: Output file path, ending .csv or .parquet.
+    options: Dictionary overriding the job's default options.
+    workers: Number of worker processes, defaults to the number of CPUs. 1 runs everything in this process.
+    chunk_size: Rows per chunk, each chunk is sized by one worker and written to the output in turn.
+    Returns the number of rows sized. Raises ScheduleError for problems with the input and ValueError for
+    unknown jobs, options or output types.
+    """
+    if job not in BATCH_JOBS:
+        raise ValueError(f"Unknown batch job '{job}', choose from {', '.join(BATCH_JOBS)}")
+    spec = BATCH_JOBS[job]
+    extension = os.path.splitext(os.fspath(output))[1].lower()
+    if extension not in BATCH_WRITERS:
+        raise ValueError(f"Unsupported output type '{extension}', use one of: {', '.join(BATCH_WRITERS)}")
+    unknown_options = set(options or {}) - set(spec['options'])
+    if unknown_options:
+        raise ValueError(f"Unknown options for the {job} job: {', '.join(sorted(unknown_options))}")
+
+    arguments = {**spec['options'], **(options or {})}
+    if 'prepare' in spec:
+        arguments = spec['prepare'](arguments)
+
+    if 'read' in spec:
+        columns = spec['read'](source)
+    else:
+        columns = read_schedule(source, list(spec['columns']), spec['text_columns'])
+    if 'check' in spec:
+        spec['check'](columns)
+    rows = len(next(iter(columns.values())))
+
+    # An empty schedule still gets one (empty) chunk, so the output has its header
+    tasks = [(job, {name: values[start:start + chunk_size] for name, values in columns.items()}, arguments)
+             for start in range(0, max(rows, 1), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers == 1:
+        BATCH_WRITERS[extension](map(_run_chunk, tasks), output)
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            # Results come back in input order, each is written as soon as it (and the ones before it) is done
+            BATCH_WRITERS[extension](executor.map(_run_chunk, tasks), output)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Size every row of a schedule file without the app.')
+    parser.add_argument('job', choices=list(BATCH_JOBS), help='What to size')
+    parser.add_argument('input', help='Schedule file (.xlsx, .csv or .parquet)')
+    parser.add_argument('output', help='Results file (.csv or .parquet)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: number of CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows per chunk')
+    parser.add_argument('--frequency-factor', type=float, help='stacks: Frequency factor K (default 0.5)')
+    parser.add_argument('--temperature', type=float, help='pipes, ducts: Fluid temperature (°C)')
+    parser.add_argument('--pressure', type=float, help='pipes, ducts: Pressure (Pa)')
+    parser.add_argument('--glycol-percentage', type=float, help='pipes: Glycol percentage (0 to 60)')
+    parser.add_argument('--max-velocity', type=float, help='pipes, ducts: Maximum velocity (m/s)')
+    parser.add_argument('--max-pressure-drop', type=float, help='pipes, ducts: Maximum pressure drop (Pa/m)')
+    parser.add_argument('--friction-model', help='pipes, ducts: Friction model used to screen the sizes')
+    parser.add_argument('--max-dimension', type=float, help='ducts: Fixed rectangular duct width (mm), also the widest standard size')
+    parser.add_argument('--max-aspect-ratio', type=float, help='ducts: Maximum standard duct aspect ratio (default 4)')
+    parser.add_argument('--max-depth', type=float, help='ducts: Maximum standard rectangular duct height (mm)')
+    parser.add_argument('--roughness', type=float, help='ducts: Duct equivalent roughness (mm, default 0.15)')
+    parser.add_argument('--safety-valve-margin', type=float, help='expansion: Safety valve margin (bar)')
+    args = parser.parse_args(argv)
+
+    # Only the options given on the command line, and used by the job, override its defaults
+    options = {name: value for name, value in vars(args).items()
+               if name in BATCH_JOBS[args.job]['options'] and value is not None}
+
+    start = time.perf_counter()
+    try:
+        rows = run_batch(args.job, args.input, args.output, options, args.workers, args.chunk_size)
+    except (ScheduleError, ValueError) as error:
+        print(f'Error: {error}', file=sys.stderr)
+        return 1
+    print(f'Sized {rows} rows in {time.perf_counter() - start:.1f} s, results saved to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
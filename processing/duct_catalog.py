@@ -0,0 +1,43 @@
+import numpy as np
+
+from processing.ventilation_processing import (calculate_aspect_ratio, calculate_rect_duct_area,
+                                               calculate_round_duct_area, calculate_hydraulic_diameter)
+
+# Standard circular duct diameters (mm), BS EN 1506
+ROUND_DIAMETERS = [63, 80, 100, 125, 150, 160, 200, 250, 300, 315, 355, 400, 450, 500, 560, 600, 630, 710, 800, 900,
+                   1000, 1120, 1250]
+# Standard rectangular duct sides (mm), BS EN 1505
+RECT_SIDES = [100, 150, 200, 250, 300, 400, 500, 600, 800, 1000, 1200, 1400, 1600, 1800, 2000]
+
+_catalog = None
+
+
+class DuctCatalog:
+    """
+    Standard duct sizes, held as arrays of candidates in the order they're preferred (smallest first).
+    Round: every diameter, sorted. Rectangular: every width x height made from the standard sides, with the
+    height (depth) no more than the width, sorted by area and then aspect ratio.
+    Pass other sizes to use a manufacturer's range. All dimensions are in mm.
+    """
+
+    def __init__(self, round_diameters=ROUND_DIAMETERS, rect_sides=RECT_SIDES):
+        self.diameter = np.unique(np.asarray(round_diameters, dtype=float))
+        self.round_area = calculate_round_duct_area(self.diameter)
+
+        sides = np.unique(np.asarray(rect_sides, dtype=float))
+        width, height = np.meshgrid(sides, sides, indexing='ij')
+        flat = width >= height
+        width, height = width[flat], height[flat]
+        aspect_ratio = calculate_aspect_ratio(width, height)
+        order = np.lexsort((aspect_ratio, width * height))
+        self.width, self.height, self.aspect_ratio = width[order], height[order], aspect_ratio[order]
+        self.rect_area, _ = calculate_rect_duct_area(self.height, self.width)
+        self.rect_hydraulic_diameter = calculate_hydraulic_diameter(self.width, self.height)
+
+
+def get_duct_catalog():
+    """Returns the shared catalog of standard duct sizes"""
+    global _catalog
+    if _catalog is None:
+        _catalog = DuctCatalog()
+    return _catalog
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+from processing.instrumentation import timed
+from processing.schedules import read_schedule, ScheduleError
+from processing.tree_network import topological_order, accumulate_to_root, find_index_run
+from processing.ventilation_processing import (calculate_duct_velocity, calculate_round_duct_area,
+                                               calculate_rect_duct_area, calculate_hydraulic_diameter,
+                                               calculate_duct_friction, STANDARD_AIR_VISCOSITY,
+                                               DEFAULT_DUCT_ROUGHNESS)
+
+# Typical loss coefficients (zeta) of common duct fittings, applied to the velocity pressure of the section the
+# fitting is in. Representative values in the style of the CIBSE Guide C tables, the full tables vary with the
+# geometry (and for tees the flow split), so use the manufacturer's data or the 'K factor' column where it matters.
+DUCT_FITTINGS = {
+    'Bend 90° (round)': 0.2,
+    'Bend 45° (round)': 0.12,
+    'Bend 90° (rectangular)': 0.25,
+    'Mitred bend 90° (turning vanes)': 0.3,
+    'Mitred bend 90° (no vanes)': 1.2,
+    'Tee (straight through)': 0.1,
+    'Tee (branch)': 0.7,
+    'Sudden contraction': 0.35,
+    'Volume control damper (open)': 0.3,
+    'Fire damper (open)': 0.2,
+    'Open end (exit to room)': 1.0,
+}
+
+# Columns of a duct schedule. Sections are named, and linked by the name of the section upstream (towards the
+# fan), left blank for sections connected directly to the fan. Round sections have a diameter, rectangular
+# sections a width and height.
+DUCT_SCHEDULE_COLUMNS = ['Section', 'Upstream section', 'Length (m)']
+DUCT_TEXT_COLUMNS = ['Section', 'Upstream section']
+DUCT_OPTIONAL_COLUMNS = ['Diameter (mm)', 'Width (mm)', 'Height (mm)', 'Equivalent roughness (mm)', 'K factor',
+                         'Terminal flow (m³/s)', 'Terminal pressure loss (Pa)']
+
+
+def fittings_k_factor(fitting_counts, n):
+    """
+    Sum of the fittings loss coefficients in each section.
+    fitting_counts: Dictionary of {fitting name: number of that fitting in each section}, see DUCT_FITTINGS.
+    n: Number of sections.
+    """
+    k_factor = np.zeros(n)
+    for fitting, count in fitting_counts.items():
+        k_factor += DUCT_FITTINGS[fitting] * np.nan_to_num(np.asarray(count, dtype=float))
+    return k_factor
+
+
+def read_duct_schedule(source):
+    """
+    Read a duct schedule from an Excel, CSV or Parquet file, with the DUCT_SCHEDULE_COLUMNS, any of the
+    DUCT_OPTIONAL_COLUMNS and a column of counts for any of the DUCT_FITTINGS.
+    Returns a dictionary of {column: numpy array} with the 'Parent' index of every section and the total
+    'K factor' of its fittings, ready for DuctNetwork.from_schedule.
+    Raises ScheduleError if columns are missing or the sections don't link up.
+    """
+    # The upstream section is read as an optional column so the blanks (the fan) are kept, it's checked below
+    required_columns = [col for col in DUCT_SCHEDULE_COLUMNS if col != 'Upstream section']
+    columns = read_schedule(source, required_columns, DUCT_TEXT_COLUMNS,
+                            ['Upstream section'] + DUCT_OPTIONAL_COLUMNS + list(DUCT_FITTINGS))
+    n = len(columns['Section'])
+    if 'Upstream section' not in columns:
+        raise ScheduleError("The uploaded file is missing the following required columns: Upstream section",
+                            ['Upstream section'])
+    if 'Diameter (mm)' not in columns and not ('Width (mm)' in columns and 'Height (mm)' in columns):
+        raise ScheduleError("The duct schedule needs a 'Diameter (mm)' column, or 'Width (mm)' and 'Height (mm)'",
+                            ['Diameter (mm)'])
+
+    # Section names are looked up all at once, blanks are connected to the fan
+    sections = pd.Index(np.char.strip(columns['Section'].astype(str)))
+    if not sections.is_unique:
+        duplicates = sections[sections.duplicated()].unique()[:10]
+        raise ScheduleError(f"Section names must be unique, found duplicates: {', '.join(duplicates)}")
+    upstream = np.char.strip(columns['Upstream section'].astype(str))
+    parent = sections.get_indexer(upstream)
+    unknown = np.unique(upstream[(parent == -1) & (upstream != '')])[:10]
+    if len(unknown):
+        raise ScheduleError(f"Upstream sections not found in the schedule: {', '.join(unknown)}")
+    columns['Parent'] = parent
+
+    fitting_counts = {fitting: columns[fitting] for fitting in DUCT_FITTINGS if fitting in columns}
+    columns['K factor'] = (fittings_k_factor(fitting_counts, n)
+                           + np.nan_to_num(columns.get('K factor', np.zeros(n)).astype(float)))
+    return columns
+
+
+class DuctNetwork:
+    """
+    Branched supply or extract ductwork, held as arrays with one entry per duct section.
+    parent: Index of the upstream section (towards the fan), -1 for sections connected directly to the fan.
+    length: Section length (m).
+    diameter: Diameter of round sections (mm), NaN for rectangular sections.
+    width, height: Size of rectangular sections (mm), not used where there is a diameter.
+    roughness: Equivalent roughness (mm), see DUCT_ROUGHNESS.
+    k_factor: Sum of the fittings loss coefficients in the section, see fittings_k_factor.
+    terminal_flow: Air supplied (or extracted) at the end of the section (m³/s), e.g. by a diffuser.
+    terminal_pressure_loss: Pressure loss of the terminal at the end of the section (Pa), e.g. diffuser and damper.
+    """
+
+    def __init__(self, parent, length, diameter=np.nan, width=np.nan, height=np.nan,
+                 roughness=DEFAULT_DUCT_ROUGHNESS, k_factor=0, terminal_flow=0, terminal_pressure_loss=0):
+        self.parent = np.asarray(parent, dtype=np.int64)
+        n = len(self.parent)
+        self.length = np.broadcast_to(np.asarray(length, dtype=float), n)
+        self.diameter = np.broadcast_to(np.asarray(diameter, dtype=float), n)
+        self.width = np.broadcast_to(np.asarray(width, dtype=float), n)
+        self.height = np.broadcast_to(np.asarray(height, dtype=float), n)
+        self.roughness = np.broadcast_to(np.asarray(roughness, dtype=float), n)
+        self.k_factor = np.broadcast_to(np.asarray(k_factor, dtype=float), n)
+        self.terminal_flow = np.broadcast_to(np.asarray(terminal_flow, dtype=float), n)
+        self.terminal_pressure_loss = np.broadcast_to(np.asarray(terminal_pressure_loss, dtype=float), n)
+
+        # Sizes are fixed, so the areas and hydraulic diameters are worked out once
+        is_round = ~np.isnan(self.diameter)
+        rect_area, _ = calculate_rect_duct_area(self.height, self.width)
+        self.area = np.where(is_round, calculate_round_duct_area(self.diameter), rect_area)
+        self.hydraulic_diameter = np.where(is_round, self.diameter,
+                                           calculate_hydraulic_diameter(self.width, self.height))
+        if not np.all(self.area > 0):
+            raise ValueError('Every section needs a diameter, or a width and height')
+        # Validates the topology once, the order is reused by every solve
+        self.order = topological_order(self.parent)
+
+    def __len__(self):
+        return len(self.parent)
+
+    @classmethod
+    def from_schedule(cls, columns):
+        """Build a network from the columns of a duct schedule, see read_duct_schedule"""
+        n = len(columns['Parent'])
+
+        def optional(name, default):
+            return np.where(np.isnan(columns[name]), default, columns[name]) if name in columns else default
+
+        return cls(columns['Parent'], columns['Length (m)'], optional('Diameter (mm)', np.nan),
+                   optional('Width (mm)', np.nan), optional('Height (mm)', np.nan),
+                   optional('Equivalent roughness (mm)', DEFAULT_DUCT_ROUGHNESS),
+                   columns['K factor'] if 'K factor' in columns else np.zeros(n),
+                   optional('Terminal flow (m³/s)', 0), optional('Terminal pressure loss (Pa)', 0))
+
+    @timed()
+    def solve(self, air_density, air_viscosity=STANDARD_AIR_VISCOSITY, friction_model='Colebrook',
+              plant_pressure_loss=0, margin=0):
+        """
+        Accumulate the terminal flows back to the fan, calculate each section's pressure loss and find the index
+        run (the run from the fan to a terminal with the greatest total pressure loss).
+        air_density: Density (kg/m³), air_viscosity: Dynamic viscosity (Pa.s), e.g. from get_air_properties.
+        friction_model: See heating_processing.FRICTION_MODELS.
+        plant_pressure_loss: Pressure loss of the plant the fan has to overcome as well (Pa), e.g. AHU filters,
+        coils and intake/discharge ductwork.
+        margin: Fraction added to the fan static pressure, e.g. 0.1 for 10 %.
+        Returns a dictionary of per-section arrays plus the index run (fan first), its pressure loss and the fan
+        static pressure.
+        """
+        flow_rate = accumulate_to_root(self.parent, self.order, self.terminal_flow)
+        velocity = calculate_duct_velocity(self.area, flow_rate)
+        velocity_pressure = 0.5 * air_density * velocity ** 2
+        # Sections with no flow (e.g. spare spigots) have no pressure loss
+        pressure_loss_per_meter = calculate_duct_friction(velocity, self.hydraulic_diameter, air_density,
+                                                          air_viscosity, self.roughness,
+                                                          friction_model)['Pressure loss (Pa/m)']
+
+        # Straight duct plus fittings
+        friction_loss = pressure_loss_per_meter * self.length
+        fittings_loss = self.k_factor * velocity_pressure
+        section_pressure_loss = friction_loss + fittings_loss
+        cumulative_pressure_loss, index_run, index_pressure_loss = find_index_run(
+            self.parent, self.order, section_pressure_loss, self.terminal_pressure_loss,
+            terminals=(self.terminal_flow > 0) | (self.terminal_pressure_loss != 0))
+
+        return {
+            'Flow rate (m³/s)': flow_rate,
+            'Velocity (m/s)': velocity,
+            'Velocity pressure (Pa)': velocity_pressure,
+            'Pressure loss (Pa/m)': pressure_loss_per_meter,
+            'Friction loss (Pa)': friction_loss,
+            'Fittings loss (Pa)': fittings_loss,
+            'Section pressure loss (Pa)': section_pressure_loss,
+            'Cumulative pressure loss (Pa)': cumulative_pressure_loss,
+            'Index run': index_run,
+            'Index run pressure loss (Pa)': index_pressure_loss,
+            'Fan static pressure (Pa)': (index_pressure_loss + plant_pressure_loss) * (1 + margin),
+        }
@@ -0,0 +1,133 @@
+import numpy as np
+
+from processing.duct_catalog import get_duct_catalog
+from processing.instrumentation import timed
+from processing.ventilation_processing import (calculate_duct_velocity, calculate_pressure_loss,
+                                               STANDARD_AIR_VISCOSITY, DEFAULT_DUCT_ROUGHNESS)
+
+# Rows of the flows x candidates matrices evaluated at once, about 10 MB per matrix for the 120 rectangular sizes
+SIZING_CHUNK = 10000
+
+
+def _select(air_volume, air_density, air_viscosity, areas, diameters, max_velocity, max_pressure_drop, roughness_mm,
+            friction_model):
+    """
+    Evaluate every candidate size for every flow as a flows x sizes matrix, candidates in order of preference.
+    diameters: Hydraulic diameters of the candidates (mm).
+    Returns (sized, candidate column, velocity, pressure loss) of the first acceptable candidate for each flow.
+    """
+    sized = np.zeros(len(air_volume), dtype=bool)
+    column = np.zeros(len(air_volume), dtype=int)
+    velocity = np.full(len(air_volume), np.nan)
+    pressure_loss = np.full(len(air_volume), np.nan)
+    if not len(areas):
+        return sized, column, velocity, pressure_loss
+
+    for start in range(0, len(air_volume), SIZING_CHUNK):
+        rows = slice(start, start + SIZING_CHUNK)
+        density = air_density if air_density.ndim == 0 else air_density[rows, np.newaxis]
+        viscosity = air_viscosity if air_viscosity.ndim == 0 else air_viscosity[rows, np.newaxis]
+        velocity_matrix = calculate_duct_velocity(areas[np.newaxis, :], air_volume[rows, np.newaxis])
+        pressure_matrix = calculate_pressure_loss(diameters[np.newaxis, :], density, velocity_matrix, viscosity,
+                                                  roughness_mm, friction_model)
+
+        acceptable = np.ones(velocity_matrix.shape, dtype=bool)
+        if max_velocity is not None:
+            acceptable &= velocity_matrix <= max_velocity
+        if max_pressure_drop is not None:
+            acceptable &= pressure_matrix <= max_pressure_drop
+
+        # The first acceptable column is the preferred size
+        chunk_column = np.argmax(acceptable, axis=1)
+        matrix_rows = np.arange(len(chunk_column))
+        sized[rows] = acceptable.any(axis=1)
+        column[rows] = chunk_column
+        velocity[rows] = velocity_matrix[matrix_rows, chunk_column]
+        pressure_loss[rows] = pressure_matrix[matrix_rows, chunk_column]
+    return sized, column, np.where(sized, velocity, np.nan), np.where(sized, pressure_loss, np.nan)
+
+
+def _air_arrays(air_volume, air_density, air_viscosity):
+    air_volume = np.atleast_1d(np.asarray(air_volume, dtype=float))
+    # Air properties can be given per flow, so they are lined up with the rows of the matrix
+    air_density = np.asarray(air_density, dtype=float)
+    if air_density.ndim:
+        air_density = np.broadcast_to(air_density, air_volume.shape)
+    air_viscosity = np.asarray(air_viscosity, dtype=float)
+    if air_viscosity.ndim:
+        air_viscosity = np.broadcast_to(air_viscosity, air_volume.shape)
+    return air_volume, air_density, air_viscosity
+
+
+@timed()
+def size_round_ducts(air_volume, air_density, max_velocity=None, max_pressure_drop=None, catalog=None,
+                     air_viscosity=STANDARD_AIR_VISCOSITY, roughness_mm=DEFAULT_DUCT_ROUGHNESS,
+                     friction_model='Colebrook'):
+    """
+    Select the smallest standard round duct for each air volume that meets every limit.
+    air_volume: Air volume flow rates (m³/s).
+    air_density: Air density (kg/m³), scalar or one per flow.
+    max_velocity: Velocity limit (m/s), None for no limit.
+    max_pressure_drop: Pressure loss limit (Pa/m), None for no limit.
+    catalog: DuctCatalog of the standard sizes, the shared one by default.
+    air_viscosity: Dynamic viscosity (Pa.s), scalar or one per flow.
+    roughness_mm, friction_model: Duct roughness and friction model, as for calculate_duct_friction.
+    Flows that no standard size can carry within the limits are returned as NaN.
+    """
+    if catalog is None:
+        catalog = get_duct_catalog()
+    air_volume, air_density, air_viscosity = _air_arrays(air_volume, air_density, air_viscosity)
+
+    sized, column, velocity, pressure_loss = _select(air_volume, air_density, air_viscosity, catalog.round_area,
+                                                     catalog.diameter, max_velocity, max_pressure_drop, roughness_mm,
+                                                     friction_model)
+    diameter = catalog.diameter if len(catalog.diameter) else np.array([np.nan])
+    return {
+        'Diameter (mm)': np.where(sized, diameter[column], np.nan),
+        'Velocity (m/s)': velocity,
+        'Pressure loss (Pa/m)': pressure_loss,
+    }
+
+
+@timed()
+def size_rect_ducts(air_volume, air_density, max_velocity=None, max_pressure_drop=None, max_aspect_ratio=4.0,
+                    max_depth=None, max_width=None, catalog=None, air_viscosity=STANDARD_AIR_VISCOSITY,
+                    roughness_mm=DEFAULT_DUCT_ROUGHNESS, friction_model='Colebrook'):
+    """
+    Select the standard rectangular duct with the smallest area for each air volume that meets every limit.
+    air_volume, air_density, max_velocity, max_pressure_drop, catalog, air_viscosity, roughness_mm,
+    friction_model: As for size_round_ducts.
+    max_aspect_ratio: Largest ratio of the long side to the short side, None for no limit.
+    max_depth: Largest height (mm), e.g. to fit a ceiling void, None for no limit.
+    max_width: Largest width (mm), e.g. a fixed width, None for no limit. The width is the long side, so this
+    limits both sides.
+    Of sizes with the same area the squarest is chosen. The pressure loss uses the hydraulic diameter.
+    Flows that no standard size can carry within the limits are returned as NaN.
+    """
+    if catalog is None:
+        catalog = get_duct_catalog()
+    air_volume, air_density, air_viscosity = _air_arrays(air_volume, air_density, air_viscosity)
+
+    # The shape limits don't depend on the flow, so they narrow down the candidates before the matrix
+    candidates = np.ones(len(catalog.width), dtype=bool)
+    if max_aspect_ratio is not None:
+        candidates &= catalog.aspect_ratio <= max_aspect_ratio
+    if max_depth is not None:
+        candidates &= catalog.height <= max_depth
+    if max_width is not None:
+        candidates &= catalog.width <= max_width
+    width, height = catalog.width[candidates], catalog.height[candidates]
+
+    sized, column, velocity, pressure_loss = _select(air_volume, air_density, air_viscosity,
+                                                     catalog.rect_area[candidates],
+                                                     catalog.rect_hydraulic_diameter[candidates], max_velocity,
+                                                     max_pressure_drop, roughness_mm, friction_model)
+    if not len(width):
+        width = height = np.array([np.nan])
+    return {
+        'Width (mm)': np.where(sized, width[column], np.nan),
+        'Height (mm)': np.where(sized, height[column], np.nan),
+        'Aspect ratio': np.where(sized, width[column] / height[column], np.nan),
+        'Velocity (m/s)': velocity,
+        'Pressure loss (Pa/m)': pressure_loss,
+    }
@@ -0,0 +1,100 @@
+import numpy as np
+
+
+class EntryStore:
+    """
+    Growable table of entries (e.g. pipes added on a page) held as typed NumPy columns.
+    columns: Dictionary of {column name: dtype}, e.g. {'Material': object, 'Length (m)': float}.
+    total_columns: Columns whose totals are kept up to date as entries are added.
+    Appending doubles the column capacity when it runs out, so it's O(1) on average. The DataFrame view and
+    anything else built with cached() is kept until the entries next change.
+    """
+
+    def __init__(self, columns, total_columns=(), capacity=16):
+        self.columns = dict(columns)
+        self.total_columns = list(total_columns)
+        self._data = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.columns.items()}
+        self._size = 0
+        self._totals = {name: 0.0 for name in self.total_columns}
+        self._cache = {}
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, size):
+        """Grow every column to hold at least size entries"""
+        capacity = len(next(iter(self._data.values())))
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        for name, values in self._data.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._data[name] = grown
+
+    def append(self, *values):
+        """Add one entry, with a value for each column in order"""
+        if len(values) != len(self.columns):
+            raise ValueError(f'Expected {len(self.columns)} values, got {len(values)}')
+        self._reserve(self._size + 1)
+        for name, value in zip(self.columns, values):
+            self._data[name][self._size] = value
+        self._size += 1
+        for name in self.total_columns:
+            self._totals[name] += float(self._data[name][self._size - 1])
+        self._cache.clear()
+
+    def extend(self, columns):
+        """Add many entries at once from a dictionary of {column name: array}, e.g. a loaded schedule"""
+        lengths = {len(columns[name]) for name in self.columns}
+        if len(lengths) != 1:
+            raise ValueError('Every column must have the same number of entries')
+        count = lengths.pop()
+        self._reserve(self._size + count)
+        for name, values in self._data.items():
+            values[self._size:self._size + count] = np.asarray(columns[name], dtype=values.dtype)
+        for name in self.total_columns:
+            self._totals[name] += float(np.sum(self._data[name][self._size:self._size + count]))
+        self._size += count
+        self._cache.clear()
+
+    def clear(self):
+        self._size = 0
+        self._totals = {name: 0.0 for name in self.total_columns}
+        self._cache.clear()
+
+    def column(self, name):
+        """Read-only view of a column's entries"""
+        values = self._data[name][:self._size]
+        values.flags.writeable = False
+        return values
+
+    @property
+    def totals(self):
+        """Running totals of the total_columns"""
+        return dict(self._totals)
+
+    def cached(self, key, build):
+        """Returns build(), only calling it again after the entries have changed"""
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def to_dataframe(self):
+        """DataFrame of the entries, cached until the next change"""
+        import pandas as pd
+
+        return self.cached('dataframe', lambda: pd.DataFrame({name: self._data[name][:self._size].copy()
+                                                               for name in self.columns}))
+
+
+def get_entry_store(state, key, columns, total_columns=()):
+    """
+    Returns the EntryStore held in state[key] (e.g. st.session_state), creating a new one if there isn't one
+    or the one there has different columns (pages can share the same key).
+    """
+    store = state.get(key)
+    if not isinstance(store, EntryStore) or list(store.columns) != list(columns):
+        store = EntryStore(columns, total_columns)
+        state[key] = store
+    return store
@@ -0,0 +1,155 @@
+import os
+import math
+from io import BytesIO
+import pandas as pd
+
+from processing.instrumentation import timed
+
+# Rows written per chunk when a single DataFrame is exported
+CHUNK_SIZE = 10000
+
+EXCEL_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def iter_chunks(df, chunk_size=CHUNK_SIZE):
+    """Yields consecutive row slices of a DataFrame, without copying it"""
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def _as_chunks(data, chunk_size=CHUNK_SIZE):
+    """A sheet can be given as a DataFrame or an iterable of DataFrame chunks, returns an iterator of chunks"""
+    if isinstance(data, pd.DataFrame):
+        # An empty DataFrame still has a header row to write
+        return iter_chunks(data, chunk_size) if len(data) else iter([data])
+    return iter(data)
+
+
+def _column_values(series):
+    """Python values for a column, with missing values as None so their cells are left blank"""
+    values = series.tolist()
+    if series.dtype.kind == 'f':
+        # NaN and infinity can't be stored in an Excel cell
+        return [value if math.isfinite(value) else None for value in values]
+    if series.hasnans:
+        return [None if pd.isna(value) else value for value in values]
+    return values
+
+
+@timed()
+def write_excel(sheets, output, constant_memory=True, chunk_size=CHUNK_SIZE):
+    """
+    Write one or more sheets to an Excel workbook.
+    sheets: Dictionary of {sheet name: DataFrame or iterable of DataFrame chunks}, e.g. schedule, totals, inputs.
+    output: File path or binary file object.
+    constant_memory: Flush each row to disk as it's written (xlsxwriter's constant_memory mode), so memory
+    use doesn't grow with the number of rows.
+    The header comes from the first chunk's columns and the index isn't written.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': constant_memory,
+                                            'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+    try:
+        header_format = workbook.add_format({'bold': True, 'border': 1})
+        for sheet_name, data in sheets.items():
+            worksheet = workbook.add_worksheet(sheet_name)
+            row = 0
+            for chunk in _as_chunks(data, chunk_size):
+                if row == 0:
+                    worksheet.write_row(0, 0, [str(column) for column in chunk.columns], header_format)
+                    row = 1
+                # Rows must be written in order in constant memory mode
+                for values in zip(*(_column_values(chunk[column]) for column in chunk.columns)):
+                    worksheet.write_row(row, 0, values)
+                    row += 1
+    finally:
+        workbook.close()
+
+
+def dataframe_to_excel(sheets, constant_memory=True, chunk_size=CHUNK_SIZE):
+    """Returns the Excel workbook as bytes, e.g. for a download button. sheets is as for write_excel"""
+    output = BytesIO()
+    write_excel(sheets, output, constant_memory, chunk_size)
+    return output.getvalue()
+
+
+def convert_df_to_excel(df, sheet_name='Pipe Data'):
+    """Function to convert DataFrame to Excel"""
+    return dataframe_to_excel({sheet_name: df})
+
+
+@timed()
+def write_csv(data, output, chunk_size=CHUNK_SIZE):
+    """
+    Write a DataFrame (or iterable of DataFrame chunks) as UTF-8 CSV, one chunk at a time.
+    output: File path or binary file object.
+    """
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, 'wb') as file:
+            return write_csv(data, file, chunk_size)
+    header = True
+    for chunk in _as_chunks(data, chunk_size):
+        output.write(chunk.to_csv(index=False, header=header).encode('utf-8'))
+        header = False
+
+
+def dataframe_to_csv(data, chunk_size=CHUNK_SIZE):
+    """Returns a DataFrame (or iterable of DataFrame chunks) as UTF-8 CSV bytes, much faster than Excel"""
+    output = BytesIO()
+    write_csv(data, output, chunk_size)
+    return output.getvalue()
+
+
+@timed()
+def write_parquet(data, output, chunk_size=CHUNK_SIZE):
+    """
+    Write a DataFrame (or iterable of DataFrame chunks) as Parquet, one row group per chunk.
+    output: File path or binary file object.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in _as_chunks(data, chunk_size):
+            # Object columns can mix types (e.g. a totals row with blank text cells), which Parquet can't store,
+            # so they're written as text
+            text_columns = {column: chunk[column].where(chunk[column].isna(), chunk[column].astype(str))
+                            for column in chunk.columns if chunk[column].dtype == object}
+            table = pa.Table.from_pandas(chunk.assign(**text_columns), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def dataframe_to_parquet(data, chunk_size=CHUNK_SIZE):
+    """Returns a DataFrame (or iterable of DataFrame chunks) as Parquet bytes, written one row group per chunk"""
+    output = BytesIO()
+    write_parquet(data, output, chunk_size)
+    return output.getvalue()
+
+
+# Download formats: {name: (file extension, mime type)}
+EXPORT_FORMATS = {
+    'Excel': ('.xlsx', EXCEL_MIME),
+    'CSV': ('.csv', 'text/csv'),
+    'Parquet': ('.parquet', 'application/octet-stream'),
+}
+
+
+def export_dataframe(data, export_format='Excel', sheet_name='Data'):
+    """
+    Returns (bytes, file extension, mime type) for one of the EXPORT_FORMATS.
+    data: DataFrame or iterable of DataFrame chunks.
+    sheet_name: Worksheet name, only used for Excel.
+    """
+    extension, mime = EXPORT_FORMATS[export_format]
+    if export_format == 'Excel':
+        return dataframe_to_excel({sheet_name: data}), extension, mime
+    if export_format == 'CSV':
+        return dataframe_to_csv(data), extension, mime
+    return dataframe_to_parquet(data), extension, mime
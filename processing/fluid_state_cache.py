@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+
+class FluidStateCache:
+    """
+    Bounded least-recently-used cache of PyFluids states.
+    States are keyed by fluid, temperature and pressure, quantised to temperature_resolution (°C)
+    and pressure_resolution (Pa), so widget reruns with the same inputs reuse the previous
+    equation-of-state solve instead of repeating it.
+    """
+
+    def __init__(self, maxsize=256, temperature_resolution=0.01, pressure_resolution=1.0):
+        self.maxsize = maxsize
+        self.temperature_resolution = temperature_resolution
+        self.pressure_resolution = pressure_resolution
+        self.hits = 0
+        self.misses = 0
+        self._states = OrderedDict()
+        # Streamlit runs each session in its own thread
+        self._lock = threading.Lock()
+
+    def get_state(self, fluid_name, temperature, pressure):
+        """
+        Returns a Fluid with its state updated at the (quantised) temperature in °C and pressure in Pa.
+        fluid_name: A member of pyfluids.FluidsList.
+        The returned Fluid is shared, so callers must not update it.
+        """
+        temperature_step = round(temperature / self.temperature_resolution)
+        pressure_step = round(pressure / self.pressure_resolution)
+        key = (fluid_name, temperature_step, pressure_step)
+
+        with self._lock:
+            if key in self._states:
+                self.hits += 1
+                self._states.move_to_end(key)
+                return self._states[key]
+            self.misses += 1
+
+        # PyFluids loads CoolProp, which takes seconds, so it's only imported when a state is first solved
+        from pyfluids import Fluid, Input
+        fluid = Fluid(fluid_name)
+        fluid.update(Input.temperature(temperature_step * self.temperature_resolution),
+                     Input.pressure(pressure_step * self.pressure_resolution))
+
+        with self._lock:
+            self._states[key] = fluid
+            self._evict()
+        return fluid
+
+    def set_maxsize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """Hit/miss counters and the current size, in the spirit of functools.lru_cache"""
+        return {'hits': self.hits, 'misses': self.misses, 'maxsize': self.maxsize, 'currsize': len(self._states)}
+
+    def _evict(self):
+        while len(self._states) > self.maxsize:
+            self._states.popitem(last=False)
+
+
+# Shared by all the pages, it lives as long as the Streamlit server process
+fluid_state_cache = FluidStateCache()
+
+
+def get_fluid_state(fluid_name, temperature, pressure):
+    """Returns a Fluid in the requested state from the shared cache (see FluidStateCache.get_state)"""
+    return fluid_state_cache.get_state(fluid_name, temperature, pressure)
@@ -1,13 +1,10 @@
-from fpdf import FPDF
+import os
 import getpass
 import datetime
 import csv
 import numpy as np
-from fluids.friction import friction_factor
-from fluids.core import Reynolds
-import CoolProp.CoolProp as CP
-from io import BytesIO
-import pandas as pd
+from processing.property_tables import lookup_glycol_water_properties
+from processing.instrumentation import timed
 
 
 #### Calculations ####
@@ -32,6 +29,7 @@ def calculate_primary_flowrate(primary_flow_temp, primary_return_temp, coil_size
 
 #### PDF ####
 
+@timed()
 def create_resultsheet(initial_temperature, final_temperature, coil_size, vessel_volume, reheat_time, calculation_type,
                        engineers_notes, include_primary, primary_flow_temp, primary_return_temp, primary_flowrate):
     def add_variables(pdf):
@@ -93,7 +91,7 @@ def create_resultsheet(initial_temperature, final_temperature, coil_size, vessel
         pdf.image('data/Building Services/calorifier-reheat/Calorifier_schematic.png', x=30, y=50, w=150)
 
     # Initialize PDF
-    pdf = MyPDF()
+    pdf = get_pdf_class()()
     pdf.alias_nb_pages()  # This is required to get the total number of pages
 
     # Page 1 - variables and notes
@@ -115,63 +113,83 @@ def create_resultsheet(initial_temperature, final_temperature, coil_size, vessel
     return pdf_bytes
 
 
-class MyPDF(FPDF):
-    def header(self):
-        # Rendering logo (this is the slow bit :( !!!!!):
-        self.image('data/Building Services/calorifier-reheat/wsp_cmyk-01-reduced1.png', x=10, y=10, w=33)
-        self.set_font("Arial", "B", 15)
-        # Moving cursor to the right:
-        self.cell(80)
-        # Printing title:
-        self.cell(30, 10, "Calorifier Calculation Sheet", border=0, ln=1, align="C")
-        self.ln(2)
-        self.line(x1=10, y1=30, y2=30, x2=200)
-        self.ln(15)
-
-    def footer(self):
-        # Position cursor at 1.5 cm from bottom:
-        self.set_y(-15)
-        self.set_font("Arial", "I", 8)
-        # Printing page number, date, user:
-        self.cell(0, 10,
-                  f"Page {self.page_no()}/{{nb}} | Generated by: {getpass.getuser()} | Date and Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | Tool developed by the Cambridge MEP team",
-                  0, 0, 'C')
+_pdf_class = None
+
+
+def get_pdf_class():
+    """Returns the calculation sheet PDF class, defined on first use so fpdf is only imported when a PDF is made"""
+    global _pdf_class
+    if _pdf_class is None:
+        from fpdf import FPDF
+
+        class MyPDF(FPDF):
+            def header(self):
+                # Rendering logo (this is the slow bit :( !!!!!):
+                self.image('data/Building Services/calorifier-reheat/wsp_cmyk-01-reduced1.png', x=10, y=10, w=33)
+                self.set_font("Arial", "B", 15)
+                # Moving cursor to the right:
+                self.cell(80)
+                # Printing title:
+                self.cell(30, 10, "Calorifier Calculation Sheet", border=0, ln=1, align="C")
+                self.ln(2)
+                self.line(x1=10, y1=30, y2=30, x2=200)
+                self.ln(15)
+
+            def footer(self):
+                # Position cursor at 1.5 cm from bottom:
+                self.set_y(-15)
+                self.set_font("Arial", "I", 8)
+                # Printing page number, date, user:
+                self.cell(0, 10,
+                          f"Page {self.page_no()}/{{nb}} | Generated by: {getpass.getuser()} | Date and Time: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | Tool developed by the Cambridge MEP team",
+                          0, 0, 'C')
+
+        _pdf_class = MyPDF
+    return _pdf_class
 
 
 ###################### Expansion #############################
 
+EXPANSION_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'Expansion_data.csv')
+
+_expansion_table = None
+
+
+def get_expansion_table():
+    """Returns the temperatures and expansion factors as arrays, reading the CSV file on first use only"""
+    global _expansion_table
+    if _expansion_table is None:
+        with open(EXPANSION_DATA_PATH, 'r') as file:
+            data = list(csv.DictReader(file))
+        temperatures = np.array([float(row['Temperature']) for row in data])
+        expansion_factors = np.array([float(row['Expansion Factor']) for row in data])
+        _expansion_table = temperatures, expansion_factors
+    return _expansion_table
+
+
+@timed()
+def expansion_factor(temps):
+    """
+    Vectorised water expansion factor for an array of maximum temperatures (°C).
+    Linear interpolation of the expansion data, temperatures outside the data are extrapolated
+    linearly from the first/last two points.
+    """
+    temperatures, expansion_factors = get_expansion_table()
+    temps = np.asarray(temps, dtype=float)
+    factors = np.interp(temps, temperatures, expansion_factors)
+
+    # np.interp clamps at the ends, so extend the end segments instead
+    below = temps < temperatures[0]
+    above = temps > temperatures[-1]
+    low_slope = (expansion_factors[1] - expansion_factors[0]) / (temperatures[1] - temperatures[0])
+    high_slope = (expansion_factors[-1] - expansion_factors[-2]) / (temperatures[-1] - temperatures[-2])
+    factors = np.where(below, expansion_factors[0] + low_slope * (temps - temperatures[0]), factors)
+    factors = np.where(above, expansion_factors[-1] + high_slope * (temps - temperatures[-1]), factors)
+    return factors
+
+
 def calculate_expansion_factor(max_temperature):
-    # Read the data from the CSV file
-    with open('data/Expansion_data.csv', 'r') as file:
-        reader = csv.DictReader(file)
-        data = list(reader)
-
-    # Convert the data to lists for easier manipulation
-    temperatures = [float(row['Temperature']) for row in data]
-    expansion_factors = [float(row['Expansion Factor']) for row in data]
-
-    # Check if the temperature is in the data
-    if max_temperature in temperatures:
-        index = temperatures.index(max_temperature)
-        expansion_factor = expansion_factors[index]
-        return expansion_factor
-    else:
-        # If the temperature is not in the data, interpolate the data of the two nearest points
-        idx = np.searchsorted(temperatures, max_temperature)
-        if idx == 0:
-            # If temperature is below the lowest temperature in the data
-            idx = 1
-        elif idx == len(temperatures):
-            # If temperature is above the highest temperature in the data
-            idx = len(temperatures) - 1
-
-        # Perform linear interpolation
-        t1 = temperatures[idx - 1]
-        t2 = temperatures[idx]
-        f1 = expansion_factors[idx - 1]
-        f2 = expansion_factors[idx]
-        expansion_factor = f1 + ((f2 - f1) / (t2 - t1)) * (max_temperature - t1)
-        return expansion_factor
+    return float(expansion_factor(max_temperature))
 
 def calculate_CFP(static_head):
     exclude_air = 0.35
@@ -235,23 +253,25 @@ def calculate_flow_rate(delta_t, heat_transfer, cp_metric, density):
 ###################### CIBSE pipe sizing #############################
 
 
-def convert_df_to_excel(df):
-    """Function to convert DataFrame to Excel"""
-    output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Pipe Data')
-    writer._save()
-    processed_data = output.getvalue()
-    return processed_data
+# Columns of the pipe sizing schedule and their types
+PIPE_SIZING_COLUMNS = {
+    'Material': object,
+    'Nominal diameter (mm)': float,
+    'Internal diameter (mm)': float,
+    'Velocity (m/s)': float,
+    'Pressure drop (Pa/m)': float,
+}
 
 
 def calculate_reynolds_number(velocity, int_diameter, fluid_density, fluid_viscosity):
     """Calculate Reynolds number using the Fluids library"""
+    from fluids.core import Reynolds
     return Reynolds(V=velocity, D=int_diameter, rho=fluid_density, mu=fluid_viscosity)
 
 
 def calculate_darcy_friction_factor(reynolds_number, eq_roughness, int_diameter):  # int_diameter
     """Calculate Darcy friction factor using the Fluids library (Colebrook-White)"""
+    from fluids.friction import friction_factor
     return friction_factor(Re=reynolds_number, eD=eq_roughness / int_diameter)  #/int_diameter
 
 
@@ -260,24 +280,174 @@ def calculate_pressure_drop_per_meter(friction_factor, density, velocity, diamet
     return (friction_factor * density * velocity ** 2) / (2 * diameter)
 
 
-def get_glycol_water_properties(glycol_percentage, temperature, pressure=101325):
+def colebrook_friction_factor(reynolds_number, eD):
+    """Exact Colebrook-White Darcy friction factor (two Clamond iterations, accurate to ~1e-9)"""
+    X1 = eD * reynolds_number * 0.1239681863354175460160858261654858382699
+    X2 = np.log(reynolds_number) - 0.7793974884556819406441139701653776731705
+    F = X2 - 0.2
+    X1F = X1 + F
+    X1F1 = 1. + X1F
+    E = (np.log(X1F) - 0.2) / X1F1
+    F = F - (X1F1 + 0.5 * E) * E * X1F / (X1F1 + E * (1. + E / 3.))
+    X1F = X1 + F
+    X1F1 = 1. + X1F
+    E = (np.log(X1F) + F - X2) / X1F1
+    F = F - (X1F1 + 0.5 * E) * E * X1F / (X1F1 + E * (1. + E / 3.))
+    return 1.325474527619599502640416597148504422899 / (F * F)
+
+
+def swamee_jain_friction_factor(reynolds_number, eD):
+    """Swamee-Jain (1976) explicit approximation of Colebrook-White"""
+    return 0.25 / np.log10(eD / 3.7 + 5.74 / reynolds_number ** 0.9) ** 2
+
+
+def haaland_friction_factor(reynolds_number, eD):
+    """Haaland (1983) explicit approximation of Colebrook-White"""
+    return (-1.8 * np.log10((eD / 3.7) ** 1.11 + 6.9 / reynolds_number)) ** -2
+
+
+def serghides_friction_factor(reynolds_number, eD):
+    """Serghides (1984) explicit approximation of Colebrook-White (Steffensen acceleration)"""
+    A = -2 * np.log10(eD / 3.7 + 12 / reynolds_number)
+    B = -2 * np.log10(eD / 3.7 + 2.51 * A / reynolds_number)
+    C = -2 * np.log10(eD / 3.7 + 2.51 * B / reynolds_number)
+    return (A - (B - A) ** 2 / (C - 2 * B + A)) ** -2
+
+
+# Laminar-turbulent transition, the same as fluids.friction.LAMINAR_TRANSITION_PIPE
+LAMINAR_TRANSITION_PIPE = 2040.0
+
+# Turbulent friction factor models, 'Colebrook' is the exact reference, the others are faster explicit
+# approximations. Use friction_model_accuracy to see how far each strays from the reference.
+FRICTION_MODELS = {
+    'Colebrook': colebrook_friction_factor,
+    'Swamee-Jain': swamee_jain_friction_factor,
+    'Haaland': haaland_friction_factor,
+    'Serghides': serghides_friction_factor,
+}
+
+
+def calculate_darcy_friction_factor_array(reynolds_number, eq_roughness, int_diameter, friction_model='Colebrook'):
     """
-    Returns the density and dynamic viscosity of a water-ethylene glycol mixture.
-    glycol_percentage: Fraction of glycol (0 to 1).
-    temperature: Temperature in Celsius.
-    pressure: Pressure in Pascals.
+    Vectorised Darcy friction factor for arrays of pipes.
+    Turbulent pipes use the selected friction_model from FRICTION_MODELS. The default is Clamond's exact
+    solution of Colebrook-White (the same method the Fluids library uses for scalars).
+    Laminar pipes (Re < 2040) use 64/Re.
+    eq_roughness and int_diameter only need to share units.
+    """
+    if friction_model not in FRICTION_MODELS:
+        raise ValueError(f"Unknown friction model '{friction_model}', choose from {', '.join(FRICTION_MODELS)}")
+    turbulent_friction_factor = FRICTION_MODELS[friction_model]
+
+    reynolds_number = np.asarray(reynolds_number, dtype=float)
+    eD = np.asarray(eq_roughness, dtype=float) / np.asarray(int_diameter, dtype=float)
+    reynolds_number, eD = np.broadcast_arrays(reynolds_number, eD)
+
+    laminar = reynolds_number < LAMINAR_TRANSITION_PIPE
+    darcy_friction_factor = np.empty(reynolds_number.shape)
+
+    # Laminar flow
+    darcy_friction_factor[laminar] = 64 / reynolds_number[laminar]
+
+    # Turbulent flow
+    darcy_friction_factor[~laminar] = turbulent_friction_factor(reynolds_number[~laminar], eD[~laminar])
+
+    return darcy_friction_factor
+
+
+def friction_model_accuracy(friction_model, reynolds_numbers=None, relative_roughness=None):
+    """
+    Accuracy report for a friction model against the exact Colebrook-White solution.
+    By default it covers turbulent flow from Re 4000 to 1e8 and relative roughness from smooth to 0.05.
+    Returns the maximum and mean relative error (%) and where the maximum occurs.
+    """
+    if reynolds_numbers is None:
+        reynolds_numbers = np.logspace(np.log10(4000), 8, 200)
+    if relative_roughness is None:
+        relative_roughness = np.concatenate(([0], np.logspace(-6, np.log10(0.05), 100)))
+    reynolds_numbers, relative_roughness = np.meshgrid(reynolds_numbers, relative_roughness)
+
+    reference = colebrook_friction_factor(reynolds_numbers, relative_roughness)
+    approximation = FRICTION_MODELS[friction_model](reynolds_numbers, relative_roughness)
+    relative_error = np.abs(approximation - reference) / reference * 100
+    worst = np.unravel_index(np.argmax(relative_error), relative_error.shape)
+
+    return {
+        'Friction model': friction_model,
+        'Max relative error (%)': float(relative_error[worst]),
+        'Mean relative error (%)': float(relative_error.mean()),
+        'Worst Reynolds number': float(reynolds_numbers[worst]),
+        'Worst relative roughness': float(relative_roughness[worst]),
+    }
+
+
+@timed()
+def calculate_pipe_hydraulics(flow_rate, int_diameter, eq_roughness, fluid_density, fluid_viscosity,
+                              friction_model='Colebrook'):
+    """
+    Size a whole schedule of pipes in a single vectorised pass.
+    flow_rate: Volume flow rate (m³/s).
+    int_diameter: Internal diameter (m).
+    eq_roughness: Equivalent roughness (m).
+    fluid_density: Density (kg/m³).
+    fluid_viscosity: Dynamic viscosity (Pa.s).
+    friction_model: Any of FRICTION_MODELS, explicit approximations are faster than the exact 'Colebrook'.
+    Inputs can be scalars or NumPy arrays and are broadcast against each other.
+    Pipes with no flow have no pressure drop and a NaN friction factor.
+    Returns a dictionary of arrays.
     """
-    # Convert glycol percentage to an integer percentage for the CoolProp identifier
-    glycol_percentage_int = int(glycol_percentage * 100)
+    flow_rate = np.asarray(flow_rate, dtype=float)
+    int_diameter = np.asarray(int_diameter, dtype=float)
+    fluid_density = np.asarray(fluid_density, dtype=float)
+
+    # Calculate pipe area and velocity
+    pipe_area = np.pi * (int_diameter / 2) ** 2  # m2
+    velocity = flow_rate / pipe_area  # m/s
+
+    reynolds_number = fluid_density * velocity * int_diameter / fluid_viscosity
+    # The friction factor is undefined at Re = 0, so pipes with no flow (e.g. spare connections) are left out
+    reynolds_number, eq_roughness, int_diameter = np.broadcast_arrays(reynolds_number, eq_roughness, int_diameter)
+    no_flow = reynolds_number == 0
+    darcy_friction_factor = np.full(reynolds_number.shape, np.nan)
+    darcy_friction_factor[~no_flow] = calculate_darcy_friction_factor_array(
+        reynolds_number[~no_flow], eq_roughness[~no_flow], int_diameter[~no_flow], friction_model)
+    pressure_drop_per_meter = np.where(no_flow, 0.0, calculate_pressure_drop_per_meter(
+        darcy_friction_factor, fluid_density, velocity, int_diameter))
+    velocity_pressure = 0.5 * fluid_density * velocity ** 2
+
+    return {
+        'Velocity (m/s)': velocity,
+        'Reynolds number': reynolds_number,
+        'Darcy friction factor': darcy_friction_factor,
+        'Pressure drop (Pa/m)': pressure_drop_per_meter,
+        'Velocity pressure (Pa)': velocity_pressure,
+    }
 
-    # Define the fluid name in CoolProp for ethylene glycol-water mixture with the specified concentration
-    fluid_name = f"INCOMP::MEG-{glycol_percentage_int}%"  # e.g., "INCOMP::MEG-30%"
 
-    # Convert temperature to Kelvin
-    temperature_K = temperature + 273.15
+@timed()
+def calculate_pipe_schedule(df, friction_model='Colebrook'):
+    """
+    Size every pipe in a schedule DataFrame.
+    Required columns: 'Flow rate (L/s)', 'Internal diameter (mm)', 'Equivalent roughness (mm)',
+    'Density (kg/m³)' and 'Viscosity (Pa.s)'.
+    friction_model: See FRICTION_MODELS.
+    Returns a copy of the DataFrame with the results columns appended.
+    """
+    results = calculate_pipe_hydraulics(df['Flow rate (L/s)'].to_numpy() / 1000,  # L/s to m³/s
+                                        df['Internal diameter (mm)'].to_numpy() / 1000,  # mm to m
+                                        df['Equivalent roughness (mm)'].to_numpy() / 1000,  # mm to m
+                                        df['Density (kg/m³)'].to_numpy(),
+                                        df['Viscosity (Pa.s)'].to_numpy(), friction_model)
+    return df.assign(**results)
 
-    # Calculate density and dynamic viscosity using CoolProp
-    density = CP.PropsSI('D', 'T', temperature_K, 'P', pressure, fluid_name)  # Density in kg/m³
-    viscosity = CP.PropsSI('V', 'T', temperature_K, 'P', pressure, fluid_name)  # Dynamic viscosity in Pa.s
 
-    return density, viscosity
+def get_glycol_water_properties(glycol_percentage, temperature, pressure=101325):
+    """
+    Returns the density and dynamic viscosity of a water-ethylene glycol mixture.
+    glycol_percentage: Fraction of glycol (0 to 1).
+    temperature: Temperature in Celsius.
+    pressure: Pascals, only used when the state falls outside the precomputed table.
+    Values are interpolated from the glycol/water table in property_tables, which falls back to CoolProp.
+    Scalars or arrays can be passed.
+    """
+    return lookup_glycol_water_properties(glycol_percentage, temperature, pressure)
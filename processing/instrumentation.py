@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import datetime
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+
+# Set MEP_TIMINGS=1 to collect timings, and MEP_TIMINGS_LOG to a file path to log each page run as a JSON line
+ENABLE_VARIABLE = 'MEP_TIMINGS'
+LOG_VARIABLE = 'MEP_TIMINGS_LOG'
+
+_enabled = os.environ.get(ENABLE_VARIABLE, '') not in ('', '0')
+_log_path = os.environ.get(LOG_VARIABLE) or None
+
+# Streamlit runs each session's script in its own thread, so the current page run is held per thread
+_local = threading.local()
+_lock = threading.Lock()
+_NULL_CONTEXT = nullcontext()
+
+
+class Timings:
+    """Call counts and wall times, keyed by name. Times of nested functions and sections are inclusive."""
+
+    def __init__(self):
+        self.records = {}
+
+    def add(self, name, elapsed):
+        record = self.records.get(name)
+        if record is None:
+            self.records[name] = [1, elapsed, elapsed]
+        else:
+            record[0] += 1
+            record[1] += elapsed
+            if elapsed > record[2]:
+                record[2] = elapsed
+
+    def rows(self):
+        """One dictionary per name, slowest total first (e.g. for st.dataframe)"""
+        return [{'Name': name, 'Calls': calls, 'Total (ms)': total * 1000, 'Max (ms)': longest * 1000}
+                for name, (calls, total, longest) in sorted(self.records.items(), key=lambda item: -item[1][1])]
+
+    def to_dict(self):
+        return {name: {'calls': calls, 'total (s)': total, 'max (s)': longest}
+                for name, (calls, total, longest) in self.records.items()}
+
+
+class PageRun:
+    """Timings of one run of a page's script"""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = datetime.datetime.now()
+        self.wall_time = None
+        self.timings = Timings()
+        self.finished_callbacks = []
+
+
+_global_timings = Timings()
+
+
+def enable(log_path=None):
+    """Start collecting timings, optionally logging each page run to log_path as JSON lines"""
+    global _enabled, _log_path
+    _enabled = True
+    if log_path is not None:
+        _log_path = log_path
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def get_timings():
+    """Timings recorded outside a page run (e.g. in scripts and the tests)"""
+    return _global_timings
+
+
+def reset():
+    global _global_timings
+    with _lock:
+        _global_timings = Timings()
+
+
+def _record(name, elapsed):
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run.timings.add(name, elapsed)
+    else:
+        with _lock:
+            _global_timings.add(name, elapsed)
+
+
+def timed(name=None):
+    """
+    Decorator recording the wall time and call count of a function, under name or module.function.
+    When timings are disabled the only cost is checking a flag.
+    """
+    def decorate(function):
+        label = name or f"{function.__module__.split('.')[-1]}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _record(label, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+class _Section:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def section(name):
+    """Context manager recording the wall time of a block, e.g. an expensive part of a page"""
+    if not _enabled:
+        return _NULL_CONTEXT
+    return _Section(name)
+
+
+def on_page_finished(callback):
+    """Call callback(run) when the current page run completes, e.g. to fill in a timing panel"""
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run.finished_callbacks.append(callback)
+
+
+def _write_log(run):
+    line = json.dumps({
+        'time': run.started.isoformat(timespec='milliseconds'),
+        'process': os.getpid(),
+        'page': run.page,
+        'wall time (s)': run.wall_time,
+        'timings': run.timings.to_dict(),
+    })
+    with _lock:
+        with open(_log_path, 'a', encoding='utf-8') as file:
+            file.write(line + '\n')
+
+
+@contextmanager
+def page_run(page):
+    """
+    Collect the timings of everything inside the block as one page run (a Streamlit rerun).
+    When it finishes normally the on_page_finished callbacks are called, and the run is logged if a log
+    file is set (also when the run ends with st.rerun or st.stop). Yields the PageRun, or None if disabled.
+    """
+    if not _enabled:
+        yield None
+        return
+
+    run = PageRun(page)
+    _local.run = run
+    start = time.perf_counter()
+    try:
+        yield run
+    except BaseException:
+        run.wall_time = time.perf_counter() - start
+        raise
+    else:
+        run.wall_time = time.perf_counter() - start
+        for callback in run.finished_callbacks:
+            callback(run)
+    finally:
+        _local.run = None
+        if _log_path:
+            _write_log(run)
@@ -0,0 +1,229 @@
+import numpy as np
+
+from processing.heating_processing import calculate_darcy_friction_factor_array
+from processing.instrumentation import timed
+
+# Flows below this (m³/s) are treated as this when linearising, so stagnant pipes don't make the system singular
+MINIMUM_FLOW = 1e-9
+
+# Reynolds numbers bounding the transitional range
+LAMINAR_REYNOLDS = 2000
+TURBULENT_REYNOLDS = 4000
+
+
+class LoopedPipeNetwork:
+    """
+    Looped (ring main / meshed) pipe network solved with the Newton-Raphson global gradient method
+    (Todini & Pilati). Pipes join numbered nodes, nodes are numbered from 0.
+    start_node, end_node: Node indices at each end of each pipe, positive flow runs from start to end.
+    length: Pipe length (m).
+    internal_diameter: Internal diameter (mm).
+    eq_roughness: Equivalent roughness (mm).
+    k_factor: Sum of the fittings loss coefficients in the pipe.
+    node_demand: Flow drawn off at each node (L/s), negative for flow put in.
+    fixed_pressure: Dictionary of {node: pressure (Pa)} for the nodes held at a known pressure, e.g. the plant.
+    Every part of the network must be connected to at least one fixed pressure node.
+    """
+
+    def __init__(self, start_node, end_node, length, internal_diameter, eq_roughness, fixed_pressure,
+                 k_factor=0, node_demand=0, number_of_nodes=None):
+        self.start_node = np.asarray(start_node, dtype=np.int64)
+        self.end_node = np.asarray(end_node, dtype=np.int64)
+        n_pipes = len(self.start_node)
+        if number_of_nodes is None:
+            number_of_nodes = int(max(self.start_node.max(), self.end_node.max())) + 1
+        self.number_of_nodes = number_of_nodes
+
+        self.length = np.broadcast_to(np.asarray(length, dtype=float), n_pipes)
+        self.internal_diameter = np.broadcast_to(np.asarray(internal_diameter, dtype=float), n_pipes)
+        self.eq_roughness = np.broadcast_to(np.asarray(eq_roughness, dtype=float), n_pipes)
+        self.k_factor = np.broadcast_to(np.asarray(k_factor, dtype=float), n_pipes)
+        self.node_demand = np.broadcast_to(np.asarray(node_demand, dtype=float), number_of_nodes)
+
+        self.fixed_nodes = np.array(sorted(fixed_pressure), dtype=np.int64)
+        if len(self.fixed_nodes) == 0:
+            raise ValueError('At least one node must be given a fixed pressure')
+        self.fixed_pressure = np.array([fixed_pressure[node] for node in self.fixed_nodes], dtype=float)
+
+        self._build_incidence()
+
+    def _build_incidence(self):
+        """Assemble the node-pipe incidence matrices and the sparsity pattern of the Newton system once"""
+        import scipy.sparse as sp
+        import scipy.sparse.linalg as spla
+
+        n_pipes = len(self.start_node)
+        pipes = np.arange(n_pipes)
+
+        # Unknown pressure nodes are numbered 0..n-1, fixed ones are numbered separately
+        is_fixed = np.zeros(self.number_of_nodes, dtype=bool)
+        is_fixed[self.fixed_nodes] = True
+        free_nodes = np.flatnonzero(~is_fixed)
+        n_free = len(free_nodes)
+        fixed_index = np.full(self.number_of_nodes, -1, dtype=np.int64)
+        fixed_index[self.fixed_nodes] = np.arange(len(self.fixed_nodes))
+
+        # Renumber the free nodes with a fill-reducing ordering, found once here and reused by every iteration
+        if n_free:
+            free_index = np.full(self.number_of_nodes, -1, dtype=np.int64)
+            free_index[free_nodes] = np.arange(n_free)
+            scatter, indices, indptr = self._assemble_pattern(free_index[self.start_node],
+                                                              free_index[self.end_node], n_free)
+            # Any diagonally dominant values will do, only the structure matters for the ordering
+            position, signs, _ = scatter
+            values = np.bincount(position, weights=signs, minlength=len(indices))
+            values[indices == np.repeat(np.arange(n_free), np.diff(indptr))] += 1
+            pattern = sp.csc_matrix((values, indices, indptr), shape=(n_free, n_free))
+            perm_c = spla.splu(pattern, permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0,
+                               options=dict(SymmetricMode=True)).perm_c
+            free_nodes = free_nodes[np.argsort(perm_c)]
+        self.free_nodes = free_nodes
+        self._n_free = n_free
+
+        free_index = np.full(self.number_of_nodes, -1, dtype=np.int64)
+        free_index[free_nodes] = np.arange(n_free)
+        start_free, end_free = free_index[self.start_node], free_index[self.end_node]
+        start_fixed, end_fixed = fixed_index[self.start_node], fixed_index[self.end_node]
+
+        # A12: pipes x free nodes, -1 where the pipe starts and +1 where it ends. A10: the same for fixed nodes
+        self.A12 = self._incidence(pipes, start_free, end_free, n_free)
+        self.A21 = self.A12.T.tocsr()
+        self.A10 = self._incidence(pipes, start_fixed, end_fixed, len(self.fixed_nodes))
+
+        # The Newton matrix A21 W A12 has the same sparsity on every iteration, so its CSC structure and the
+        # position each pipe's weight adds into are worked out here and only the values change when solving
+        if n_free:
+            self._scatter, self._indices, self._indptr = self._assemble_pattern(start_free, end_free, n_free)
+
+    @staticmethod
+    def _incidence(pipes, start_index, end_index, n_columns):
+        import scipy.sparse as sp
+
+        starts, ends = start_index >= 0, end_index >= 0
+        return sp.csr_matrix((np.concatenate((-np.ones(starts.sum()), np.ones(ends.sum()))),
+                              (np.concatenate((pipes[starts], pipes[ends])),
+                               np.concatenate((start_index[starts], end_index[ends])))),
+                             shape=(len(pipes), n_columns))
+
+    @staticmethod
+    def _assemble_pattern(start_free, end_free, n_free):
+        """
+        Returns, for the weighted Laplacian A21 W A12 in CSC form, a (position, sign, pipe) scatter map plus the
+        row indices and column pointers. Pipes contribute +w on both diagonals and -w off the diagonal.
+        """
+        pipes = np.arange(len(start_free))
+        starts, ends = start_free >= 0, end_free >= 0
+        both = starts & ends
+        rows = np.concatenate((start_free[starts], end_free[ends], start_free[both], end_free[both]))
+        cols = np.concatenate((start_free[starts], end_free[ends], end_free[both], start_free[both]))
+        signs = np.concatenate((np.ones(starts.sum() + ends.sum()), -np.ones(2 * both.sum())))
+        entry_pipes = np.concatenate((pipes[starts], pipes[ends], pipes[both], pipes[both]))
+
+        # Sorting by column then row gives CSC order, duplicates (parallel pipes) share a position
+        keys, position = np.unique(cols * n_free + rows, return_inverse=True)
+        indices = keys % n_free
+        indptr = np.searchsorted(keys // n_free, np.arange(n_free + 1))
+        return (position, signs, entry_pipes), indices, indptr
+
+    def _pressure_losses(self, flow, fluid_density, fluid_viscosity, friction_model='Colebrook'):
+        """Pressure loss (Pa) along each pipe in the direction of flow and its derivative with respect to flow"""
+        int_diameter = self.internal_diameter / 1000  # mm to m
+        area = np.pi * (int_diameter / 2) ** 2
+        flow_magnitude = np.maximum(np.abs(flow), MINIMUM_FLOW)
+
+        velocity = flow_magnitude / area
+        reynolds_number = fluid_density * velocity * int_diameter / fluid_viscosity
+
+        # The friction factor jumps at the laminar/turbulent switch, which can leave a low-flow pipe with no
+        # consistent solution, so (as EPANET does) it is interpolated across the transitional range instead
+        turbulent_friction_factor = calculate_darcy_friction_factor_array(
+            np.maximum(reynolds_number, TURBULENT_REYNOLDS), self.eq_roughness, self.internal_diameter, friction_model)
+        laminar = reynolds_number < LAMINAR_REYNOLDS
+        blend = np.clip((reynolds_number - LAMINAR_REYNOLDS) / (TURBULENT_REYNOLDS - LAMINAR_REYNOLDS), 0, 1)
+        darcy_friction_factor = np.where(laminar, 64 / reynolds_number,
+                                         (1 - blend) * 64 / LAMINAR_REYNOLDS + blend * turbulent_friction_factor)
+
+        # Darcy-Weisbach plus fittings: loss = r |Q| Q
+        velocity_pressure_coefficient = fluid_density / (2 * area ** 2)
+        friction_resistance = darcy_friction_factor * self.length / int_diameter * velocity_pressure_coefficient
+        fittings_resistance = self.k_factor * velocity_pressure_coefficient
+        loss = (friction_resistance + fittings_resistance) * flow_magnitude * flow_magnitude * np.sign(flow)
+
+        # Turbulent friction and fittings losses go with Q², laminar friction losses with Q
+        derivative = (np.where(laminar, 1, 2) * friction_resistance + 2 * fittings_resistance) * flow_magnitude
+        return loss, derivative
+
+    @timed()
+    def solve(self, fluid_density, fluid_viscosity, tolerance=1e-8, max_iterations=100, initial_velocity=1.0,
+              friction_model='Colebrook'):
+        """
+        Solve the flow distribution and node pressures.
+        fluid_density: Density (kg/m³).
+        fluid_viscosity: Dynamic viscosity (Pa.s).
+        tolerance: Converged when the sum of the flow corrections is below this fraction of the sum of the flows.
+        initial_velocity: Starting velocity (m/s) in every pipe.
+        friction_model: See heating_processing.FRICTION_MODELS, the explicit models make each iteration cheaper.
+        Returns a dictionary with per-pipe and per-node arrays plus the iteration count, whether the solve
+        converged and the residual history.
+        """
+        import scipy.sparse as sp
+        import scipy.sparse.linalg as spla
+
+        area = np.pi * (self.internal_diameter / 2000) ** 2
+        flow = area * initial_velocity  # m³/s
+        demand = self.node_demand[self.free_nodes] / 1000  # L/s to m³/s
+        fixed_term = self.A10 @ self.fixed_pressure
+        pressure = np.zeros(self._n_free)
+
+        flow_residuals, continuity_residuals, energy_residuals = [], [], []
+        converged = False
+        iterations = 0
+        for iterations in range(1, max_iterations + 1):
+            loss, derivative = self._pressure_losses(flow, fluid_density, fluid_viscosity, friction_model)
+            inverse_derivative = 1 / derivative
+
+            # Energy residual for each pipe and continuity residual at each free node
+            energy = loss + self.A12 @ pressure + fixed_term
+            continuity = self.A21 @ flow - demand
+            energy_residuals.append(float(np.max(np.abs(energy), initial=0)))
+            continuity_residuals.append(float(np.max(np.abs(continuity), initial=0)) * 1000)
+
+            # Schur complement of the Newton system for the pressure corrections
+            if self._n_free:
+                position, signs, entry_pipes = self._scatter
+                values = np.bincount(position, weights=signs * inverse_derivative[entry_pipes],
+                                     minlength=len(self._indices))
+                matrix = sp.csc_matrix((values, self._indices, self._indptr), shape=(self._n_free, self._n_free))
+                # The ordering was fixed when the network was built, so no reordering is needed here
+                factor = spla.splu(matrix, permc_spec='NATURAL', diag_pivot_thresh=0,
+                                   options=dict(SymmetricMode=True))
+                pressure_change = factor.solve(continuity - self.A21 @ (inverse_derivative * energy))
+            else:
+                pressure_change = np.zeros(0)
+
+            flow_change = -inverse_derivative * (energy + self.A12 @ pressure_change)
+            flow = flow + flow_change
+            pressure = pressure + pressure_change
+
+            flow_residual = float(np.sum(np.abs(flow_change)) / max(np.sum(np.abs(flow)), MINIMUM_FLOW))
+            flow_residuals.append(flow_residual)
+            if flow_residual < tolerance:
+                converged = True
+                break
+
+        loss, _ = self._pressure_losses(flow, fluid_density, fluid_viscosity, friction_model)
+        node_pressure = np.empty(self.number_of_nodes)
+        node_pressure[self.free_nodes] = pressure
+        node_pressure[self.fixed_nodes] = self.fixed_pressure
+
+        return {
+            'Flow rate (L/s)': flow * 1000,
+            'Velocity (m/s)': flow / area,
+            'Pressure drop (Pa)': loss,
+            'Node pressure (Pa)': node_pressure,
+            'Iterations': iterations,
+            'Converged': converged,
+            'Flow residual': flow_residuals,
+            'Continuity residual (L/s)': continuity_residuals,
+            'Energy residual (Pa)': energy_residuals,
+        }
@@ -0,0 +1,133 @@
+import os
+import hashlib
+import numpy as np
+
+from processing.instrumentation import timed
+from processing.property_tables import save_npz, NPZ_LOAD_ERRORS
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+PIPE_DATA_PATH = os.path.join(DATA_DIRECTORY, 'Pipe dimension data.xlsx')
+PIPE_CACHE_PATH = os.path.join(DATA_DIRECTORY, 'pipe_dimension_data.npz')
+
+_catalog = None
+
+
+class PipeCatalog:
+    """
+    Pipe dimension data held as columns, with a dictionary index for (material, nominal diameter) lookups.
+    All dimensions are in mm, as they are in the workbook.
+    """
+
+    def __init__(self, materials, specifications, roughness, nominal_diameters, internal_diameters):
+        self.material = np.asarray(materials, dtype=str)
+        self.specification = np.asarray(specifications, dtype=str)
+        self.roughness = np.asarray(roughness, dtype=float)
+        self.nominal_diameter = np.asarray(nominal_diameters)
+        self.internal_diameter = np.asarray(internal_diameters, dtype=float)
+
+        # Materials in workbook order (this is the order shown in the select boxes)
+        self.materials = list(dict.fromkeys(self.material.tolist()))
+
+        self._rows = {}
+        self._material_rows = {}
+        for row, (material, nominal_diameter) in enumerate(zip(self.material.tolist(),
+                                                              self.nominal_diameter.tolist())):
+            self._rows.setdefault((material, nominal_diameter), row)
+            self._material_rows.setdefault(material, []).append(row)
+
+        # Per-material arrays sorted by nominal diameter
+        self._material_arrays = {}
+        for material, rows in self._material_rows.items():
+            rows = np.array(rows)
+            rows = rows[np.argsort(self.nominal_diameter[rows], kind='stable')]
+            self._material_arrays[material] = (self.nominal_diameter[rows], self.internal_diameter[rows])
+
+    def lookup(self, material, nominal_diameter):
+        """Returns (internal diameter mm, equivalent roughness mm), or None if the pipe isn't in the catalog"""
+        row = self._rows.get((material, nominal_diameter))
+        if row is None:
+            return None
+        return float(self.internal_diameter[row]), float(self.roughness[row])
+
+    def material_roughness(self, material):
+        """Equivalent roughness (mm) of a material, or None if it isn't in the catalog"""
+        rows = self._material_rows.get(material)
+        if rows is None:
+            return None
+        return float(self.roughness[rows[0]])
+
+    def nominal_diameters(self, material):
+        """Sorted nominal diameters (mm) available for a material"""
+        return self._material_arrays[material][0]
+
+    def internal_diameters(self, material):
+        """Internal diameters (mm) for a material, in the same order as nominal_diameters"""
+        return self._material_arrays[material][1]
+
+    def save(self, path, source_mtime, source_hash):
+        save_npz(path, material=self.material, specification=self.specification, roughness=self.roughness,
+                 nominal_diameter=self.nominal_diameter, internal_diameter=self.internal_diameter,
+                 source_mtime=source_mtime, source_hash=source_hash)
+
+    @classmethod
+    def from_excel(cls, path):
+        # Only needed when the cache is rebuilt, pandas' Excel reader is slow to import
+        import pandas as pd
+
+        df = pd.ExcelFile(path).parse('Formatted data')
+        return cls(df['Material'], df['Specification'], df['Equivalent roughness'], df['Nominal diameter '],
+                   df['Internal diameter'])
+
+
+def _file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+@timed()
+def load_pipe_catalog(source_path=PIPE_DATA_PATH, cache_path=PIPE_CACHE_PATH):
+    """
+    Load the catalog from the columnar cache, only parsing the workbook if the cache is missing or stale.
+    The cache is checked against the workbook's modification time first and its hash if that has changed.
+    """
+    source_mtime = os.path.getmtime(source_path)
+
+    try:
+        with np.load(cache_path) as cache:
+            cached = {name: cache[name] for name in ['material', 'specification', 'roughness', 'nominal_diameter',
+                                                     'internal_diameter', 'source_mtime', 'source_hash']}
+    except NPZ_LOAD_ERRORS:
+        # Missing, or cut off or corrupt, so the workbook is parsed again and the cache rewritten
+        cached = None
+
+    if cached is not None:
+        same_mtime = float(cached['source_mtime']) == source_mtime
+        source_hash = str(cached['source_hash'])
+        if same_mtime or source_hash == _file_hash(source_path):
+            catalog = PipeCatalog(cached['material'], cached['specification'], cached['roughness'],
+                                  cached['nominal_diameter'], cached['internal_diameter'])
+            if not same_mtime:
+                # The workbook was only touched, record its new time so later loads don't hash it again
+                _save_catalog(catalog, cache_path, source_mtime, source_hash)
+            return catalog
+
+    catalog = PipeCatalog.from_excel(source_path)
+    _save_catalog(catalog, cache_path, source_mtime, _file_hash(source_path))
+    return catalog
+
+
+def _save_catalog(catalog, cache_path, source_mtime, source_hash):
+    try:
+        catalog.save(cache_path, source_mtime, source_hash)
+    except OSError:
+        # A read-only deployment can still use the catalog for this session
+        pass
+
+
+def get_pipe_catalog():
+    """Returns the shared pipe catalog, reloading it only if the workbook has been modified"""
+    global _catalog
+    source_mtime = os.path.getmtime(PIPE_DATA_PATH)
+    if _catalog is None or _catalog[0] != source_mtime:
+        _catalog = source_mtime, load_pipe_catalog()
+    return _catalog[1]
@@ -0,0 +1,81 @@
+import numpy as np
+
+from processing.heating_processing import calculate_pipe_hydraulics
+from processing.instrumentation import timed
+from processing.tree_network import topological_order, accumulate_to_root, find_index_run
+
+
+class PipeNetwork:
+    """
+    Branched heating/chilled water network, held as arrays with one entry per pipe segment.
+    parent: Index of the upstream segment, -1 for segments connected directly to the plant.
+    length: Segment length (m).
+    internal_diameter: Internal diameter (mm).
+    eq_roughness: Equivalent roughness (mm).
+    k_factor: Sum of the fittings loss coefficients in the segment.
+    terminal_flow: Flow drawn off at the end of the segment (L/s), e.g. by a heat emitter.
+    terminal_pressure_drop: Pressure drop of the terminal at the end of the segment (Pa), e.g. emitter and valve.
+    """
+
+    def __init__(self, parent, length, internal_diameter, eq_roughness, k_factor=0, terminal_flow=0,
+                 terminal_pressure_drop=0):
+        self.parent = np.asarray(parent, dtype=np.int64)
+        n = len(self.parent)
+        self.length = np.broadcast_to(np.asarray(length, dtype=float), n)
+        self.internal_diameter = np.broadcast_to(np.asarray(internal_diameter, dtype=float), n)
+        self.eq_roughness = np.broadcast_to(np.asarray(eq_roughness, dtype=float), n)
+        self.k_factor = np.broadcast_to(np.asarray(k_factor, dtype=float), n)
+        self.terminal_flow = np.broadcast_to(np.asarray(terminal_flow, dtype=float), n)
+        self.terminal_pressure_drop = np.broadcast_to(np.asarray(terminal_pressure_drop, dtype=float), n)
+        # Validates the topology once, the order is reused by every solve
+        self.order = topological_order(self.parent)
+
+    def __len__(self):
+        return len(self.parent)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Build a network from a schedule with the columns 'Parent', 'Length (m)', 'Internal diameter (mm)',
+        'Equivalent roughness (mm)' and optionally 'K factor', 'Terminal flow (L/s)' and
+        'Terminal pressure drop (Pa)'. Parent refers to the row position (0 based), -1 for the plant.
+        """
+        return cls(df['Parent'].to_numpy(), df['Length (m)'].to_numpy(), df['Internal diameter (mm)'].to_numpy(),
+                   df['Equivalent roughness (mm)'].to_numpy(),
+                   df['K factor'].to_numpy() if 'K factor' in df else 0,
+                   df['Terminal flow (L/s)'].to_numpy() if 'Terminal flow (L/s)' in df else 0,
+                   df['Terminal pressure drop (Pa)'].to_numpy() if 'Terminal pressure drop (Pa)' in df else 0)
+
+    @timed()
+    def solve(self, fluid_density, fluid_viscosity, friction_model='Colebrook'):
+        """
+        Accumulate the terminal flows back to the plant, calculate each segment's pressure drop and find the
+        index circuit (the run from the plant to a terminal with the greatest total pressure drop).
+        friction_model: See heating_processing.FRICTION_MODELS.
+        Returns a dictionary of per-segment arrays plus the index circuit segments (plant first) and pressure drop.
+        """
+        flow_rate = accumulate_to_root(self.parent, self.order, self.terminal_flow)
+
+        # Segments with no flow (e.g. spare connections) have no pressure drop
+        hydraulics = calculate_pipe_hydraulics(flow_rate / 1000,  # L/s to m³/s
+                                               self.internal_diameter / 1000,  # mm to m
+                                               self.eq_roughness / 1000,  # mm to m
+                                               fluid_density, fluid_viscosity, friction_model)
+        pressure_drop_per_meter = hydraulics['Pressure drop (Pa/m)']
+        velocity_pressure = hydraulics['Velocity pressure (Pa)']
+
+        # Straight pipe plus fittings
+        segment_pressure_drop = pressure_drop_per_meter * self.length + self.k_factor * velocity_pressure
+        cumulative_pressure_drop, index_circuit, index_pressure_drop = find_index_run(
+            self.parent, self.order, segment_pressure_drop, self.terminal_pressure_drop,
+            terminals=(self.terminal_flow > 0) | (self.terminal_pressure_drop != 0))
+
+        return {
+            'Flow rate (L/s)': flow_rate,
+            'Velocity (m/s)': hydraulics['Velocity (m/s)'],
+            'Pressure drop (Pa/m)': pressure_drop_per_meter,
+            'Segment pressure drop (Pa)': segment_pressure_drop,
+            'Cumulative pressure drop (Pa)': cumulative_pressure_drop,
+            'Index circuit': index_circuit,
+            'Index circuit pressure drop (Pa)': index_pressure_drop,
+        }
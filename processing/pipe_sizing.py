@@ -0,0 +1,115 @@
+import numpy as np
+
+from processing.heating_processing import calculate_pipe_hydraulics
+from processing.instrumentation import timed
+from processing.pipe_catalog import get_pipe_catalog
+
+# Flows are sized this many at a time, so the flows x sizes matrices stay a few MB
+SIZING_CHUNK = 10000
+
+
+@timed()
+def size_pipes(flow_rate, material, fluid_density, fluid_viscosity, max_velocity=None, max_pressure_drop=None,
+               catalog=None, friction_model='Colebrook'):
+    """
+    Select the smallest catalog diameter for each design flow that meets every limit.
+    flow_rate: Design flow rates (L/s), must be positive.
+    material: Pipe material, as named in the pipe catalog.
+    fluid_density: Density (kg/m³), scalar or one per flow.
+    fluid_viscosity: Dynamic viscosity (Pa.s), scalar or one per flow.
+    max_velocity: Velocity limit (m/s), None for no limit.
+    max_pressure_drop: Pressure drop limit (Pa/m), None for no limit.
+    friction_model: Friction model used to screen the candidates, see heating_processing.FRICTION_MODELS.
+    All candidate diameters are evaluated at once as a flows x diameters matrix, SIZING_CHUNK flows at a time
+    so the memory use doesn't grow with the number of flows. When a fast explicit
+    friction model is used the selected sizes, and the flows it couldn't size, are re-checked with the exact
+    Colebrook solution.
+    Flows that no diameter can carry within the limits are returned as NaN.
+    """
+    if catalog is None:
+        catalog = get_pipe_catalog()
+
+    flow_rate = np.atleast_1d(np.asarray(flow_rate, dtype=float))
+    nominal_diameters = catalog.nominal_diameters(material)
+    internal_diameters = catalog.internal_diameters(material)
+    eq_roughness_mm = catalog.material_roughness(material)
+
+    # Fluid properties can be given per flow, so they are lined up with the rows of the matrix
+    fluid_density = np.asarray(fluid_density, dtype=float)
+    fluid_viscosity = np.asarray(fluid_viscosity, dtype=float)
+    if fluid_density.ndim:
+        fluid_density = np.broadcast_to(fluid_density, flow_rate.shape)[:, np.newaxis]
+    if fluid_viscosity.ndim:
+        fluid_viscosity = np.broadcast_to(fluid_viscosity, flow_rate.shape)[:, np.newaxis]
+
+    def select(rows, friction_model):
+        """Evaluate every candidate diameter for the given rows and return the first acceptable one"""
+        sized = np.zeros(len(rows), dtype=bool)
+        column = np.zeros(len(rows), dtype=int)
+        velocity = np.full(len(rows), np.nan)
+        pressure_drop = np.full(len(rows), np.nan)
+
+        for start in range(0, len(rows), SIZING_CHUNK):
+            chunk = slice(start, start + SIZING_CHUNK)
+            chunk_rows = rows[chunk]
+            hydraulics = calculate_pipe_hydraulics(
+                flow_rate[chunk_rows, np.newaxis] / 1000,  # L/s to m³/s
+                internal_diameters[np.newaxis, :] / 1000,  # mm to m
+                eq_roughness_mm / 1000,  # mm to m
+                fluid_density if fluid_density.ndim == 0 else fluid_density[chunk_rows],
+                fluid_viscosity if fluid_viscosity.ndim == 0 else fluid_viscosity[chunk_rows],
+                friction_model)
+            velocity_matrix = hydraulics['Velocity (m/s)']
+            pressure_matrix = hydraulics['Pressure drop (Pa/m)']
+
+            acceptable = np.ones(velocity_matrix.shape, dtype=bool)
+            if max_velocity is not None:
+                acceptable &= velocity_matrix <= max_velocity
+            if max_pressure_drop is not None:
+                acceptable &= pressure_matrix <= max_pressure_drop
+
+            # Diameters are sorted, so the first acceptable column is the smallest pipe
+            chunk_column = np.argmax(acceptable, axis=1)
+            matrix_rows = np.arange(len(chunk_column))
+            sized[chunk] = acceptable.any(axis=1)
+            column[chunk] = chunk_column
+            velocity[chunk] = velocity_matrix[matrix_rows, chunk_column]
+            pressure_drop[chunk] = pressure_matrix[matrix_rows, chunk_column]
+        return sized, column, velocity, pressure_drop
+
+    rows = np.arange(len(flow_rate))
+    sized, column, velocity, pressure_drop = select(rows, friction_model)
+
+    if friction_model != 'Colebrook' and max_pressure_drop is not None:
+        # Re-check only the selected designs with the exact friction factor. Velocity doesn't depend on the
+        # friction model, so only the pressure drop limit needs checking at the chosen and next smaller sizes
+        density, viscosity = np.squeeze(fluid_density), np.squeeze(fluid_viscosity)
+        exact = calculate_pipe_hydraulics(flow_rate / 1000, internal_diameters[column] / 1000, eq_roughness_mm / 1000,
+                                          density, viscosity)
+        pressure_drop = np.where(sized, exact['Pressure drop (Pa/m)'], pressure_drop)
+        smaller = np.maximum(column - 1, 0)
+        exact_smaller = calculate_pipe_hydraulics(flow_rate / 1000, internal_diameters[smaller] / 1000,
+                                                  eq_roughness_mm / 1000, density, viscosity)
+        too_small = sized & (pressure_drop > max_pressure_drop)
+        too_big = sized & (column > 0) & (exact_smaller['Pressure drop (Pa/m)'] <= max_pressure_drop)
+        if max_velocity is not None:
+            too_big &= exact_smaller['Velocity (m/s)'] <= max_velocity
+
+        # A flow the approximation couldn't size may pass with the exact friction factor, unless even the
+        # largest pipe is over the velocity limit
+        unsized = ~sized
+        if max_velocity is not None and len(internal_diameters):
+            largest_area = np.pi * (internal_diameters[-1] / 2000) ** 2  # m²
+            unsized &= flow_rate / 1000 / largest_area <= max_velocity
+
+        # The few flows the approximation got wrong are sized again with the exact method
+        retry = rows[too_small | too_big | unsized]
+        if len(retry):
+            sized[retry], column[retry], velocity[retry], pressure_drop[retry] = select(retry, 'Colebrook')
+
+    return {
+        'Nominal diameter (mm)': np.where(sized, nominal_diameters[column], np.nan),
+        'Internal diameter (mm)': np.where(sized, internal_diameters[column], np.nan),
+        'Velocity (m/s)': np.where(sized, velocity, np.nan),
+        'Pressure drop (Pa/m)': np.where(sized, pressure_drop, np.nan),
+    }
@@ -0,0 +1,184 @@
+import numpy as np
+
+# Vectorised moist air properties in SI units (°C, Pa, kg_water/kg_dry_air, J/kg), using the same ASHRAE
+# Handbook Fundamentals (2017) equations as psychrolib, so results match its scalar functions.
+# Inputs can be scalars or arrays that broadcast together. Points outside the range of validity are NaN
+# rather than raising, so one bad point doesn't stop a whole array.
+
+# Humidity ratios are never taken below this, as in psychrolib
+MIN_HUM_RATIO = 1e-7
+# Ratio of the molecular weights of water and dry air
+MOLECULAR_WEIGHT_RATIO = 0.621945
+TRIPLE_POINT_WATER = 0.01  # °C
+FREEZING_POINT_WATER = 0.0  # °C
+# Range of validity of the saturation pressure equations (°C)
+TEMPERATURE_LIMITS = (-100.0, 200.0)
+
+# Dew point Newton-Raphson iterations stop when every point has moved less than this (°C)
+DEW_POINT_TOLERANCE = 1e-6
+MAX_ITERATIONS = 100
+# Wet-bulb bisection stops when every point's bracket is narrower than this (°C)
+WET_BULB_TOLERANCE = 1e-4
+
+
+def _kelvin(temperature):
+    return np.asarray(temperature, dtype=float) + 273.15
+
+
+def _ln_saturation_vapour_pressure(temperature):
+    """Natural log of the saturation vapour pressure (Pa), over ice at or below the triple point"""
+    temperature = np.asarray(temperature, dtype=float)
+    T = _kelvin(temperature)
+    ln_T = np.log(T)
+    # Polynomials in Horner form
+    over_ice = (-5.6745359E+03 / T + 6.3925247 + T * (-9.677843E-03 + T * (6.2215701E-07 + T * (
+        2.0747825E-09 - 9.484024E-13 * T))) + 4.1635019 * ln_T)
+    over_water = (-5.8002206E+03 / T + 1.3914993 + T * (-4.8640239E-02 + T * (4.1764768E-05 - 1.4452093E-08 * T))
+                  + 6.5459673 * ln_T)
+    ln_pressure = np.where(temperature <= TRIPLE_POINT_WATER, over_ice, over_water)
+    return np.where((temperature >= TEMPERATURE_LIMITS[0]) & (temperature <= TEMPERATURE_LIMITS[1]),
+                    ln_pressure, np.nan)
+
+
+def _d_ln_saturation_vapour_pressure(temperature):
+    """Derivative of _ln_saturation_vapour_pressure with temperature, for the dew point solve"""
+    temperature = np.asarray(temperature, dtype=float)
+    T = _kelvin(temperature)
+    over_ice = (5.6745359E+03 / T ** 2 - 9.677843E-03 + T * (2 * 6.2215701E-07 + T * (
+        3 * 2.0747825E-09 - 4 * 9.484024E-13 * T)) + 4.1635019 / T)
+    over_water = (5.8002206E+03 / T ** 2 - 4.8640239E-02 + T * (2 * 4.1764768E-05 - 3 * 1.4452093E-08 * T)
+                  + 6.5459673 / T)
+    return np.where(temperature <= TRIPLE_POINT_WATER, over_ice, over_water)
+
+
+def saturation_vapour_pressure(temperature):
+    """Saturation vapour pressure (Pa) over liquid water, or over ice at or below 0.01 °C"""
+    return np.exp(_ln_saturation_vapour_pressure(temperature))
+
+
+def humidity_ratio_from_vapour_pressure(vapour_pressure, pressure):
+    """Humidity ratio (kg/kg) from the partial pressure of water vapour and the atmospheric pressure (Pa)"""
+    vapour_pressure = np.asarray(vapour_pressure, dtype=float)
+    vapour_pressure = np.where(vapour_pressure >= 0, vapour_pressure, np.nan)
+    return np.maximum(MOLECULAR_WEIGHT_RATIO * vapour_pressure / (pressure - vapour_pressure), MIN_HUM_RATIO)
+
+
+def vapour_pressure_from_humidity_ratio(humidity_ratio, pressure):
+    """Partial pressure of water vapour (Pa) from the humidity ratio (kg/kg) and atmospheric pressure (Pa)"""
+    humidity_ratio = _bounded_humidity_ratio(humidity_ratio)
+    return pressure * humidity_ratio / (MOLECULAR_WEIGHT_RATIO + humidity_ratio)
+
+
+def _bounded_humidity_ratio(humidity_ratio):
+    humidity_ratio = np.asarray(humidity_ratio, dtype=float)
+    return np.where(humidity_ratio >= 0, np.maximum(humidity_ratio, MIN_HUM_RATIO), np.nan)
+
+
+def saturation_humidity_ratio(temperature, pressure):
+    """Humidity ratio (kg/kg) of saturated air"""
+    saturation_pressure = saturation_vapour_pressure(temperature)
+    return np.maximum(MOLECULAR_WEIGHT_RATIO * saturation_pressure / (pressure - saturation_pressure),
+                      MIN_HUM_RATIO)
+
+
+def humidity_ratio_from_relative_humidity(temperature, relative_humidity, pressure):
+    """
+    Humidity ratio (kg/kg) from the dry-bulb temperature (°C), relative humidity (0 to 1) and pressure (Pa).
+    Relative humidities outside 0 to 1 give NaN.
+    """
+    relative_humidity = np.asarray(relative_humidity, dtype=float)
+    relative_humidity = np.where((relative_humidity >= 0) & (relative_humidity <= 1), relative_humidity, np.nan)
+    return humidity_ratio_from_vapour_pressure(relative_humidity * saturation_vapour_pressure(temperature), pressure)
+
+
+def relative_humidity_from_humidity_ratio(temperature, humidity_ratio, pressure):
+    """Relative humidity (0 to 1) from the dry-bulb temperature (°C), humidity ratio (kg/kg) and pressure (Pa)"""
+    return vapour_pressure_from_humidity_ratio(humidity_ratio, pressure) / saturation_vapour_pressure(temperature)
+
+
+def humidity_ratio_from_wet_bulb(temperature, wet_bulb_temperature, pressure):
+    """
+    Humidity ratio (kg/kg) from the dry-bulb and wet-bulb temperatures (°C) and pressure (Pa).
+    Wet-bulb temperatures above the dry-bulb give NaN.
+    """
+    temperature = np.asarray(temperature, dtype=float)
+    wet_bulb_temperature = np.asarray(wet_bulb_temperature, dtype=float)
+    saturated = saturation_humidity_ratio(wet_bulb_temperature, pressure)
+    # Over water, or over ice below freezing
+    over_water = (((2501. - 2.326 * wet_bulb_temperature) * saturated - 1.006 * (temperature - wet_bulb_temperature))
+                  / (2501. + 1.86 * temperature - 4.186 * wet_bulb_temperature))
+    over_ice = (((2830. - 0.24 * wet_bulb_temperature) * saturated - 1.006 * (temperature - wet_bulb_temperature))
+                / (2830. + 1.86 * temperature - 2.1 * wet_bulb_temperature))
+    humidity_ratio = np.where(wet_bulb_temperature >= FREEZING_POINT_WATER, over_water, over_ice)
+    return np.where(wet_bulb_temperature <= temperature, np.maximum(humidity_ratio, MIN_HUM_RATIO), np.nan)
+
+
+def enthalpy(temperature, humidity_ratio):
+    """Specific enthalpy of moist air (J/kg of dry air) from the dry-bulb temperature (°C) and humidity ratio"""
+    humidity_ratio = _bounded_humidity_ratio(humidity_ratio)
+    temperature = np.asarray(temperature, dtype=float)
+    return (1.006 * temperature + humidity_ratio * (2501. + 1.86 * temperature)) * 1000
+
+
+def dew_point_from_vapour_pressure(temperature, vapour_pressure):
+    """
+    Dew point temperature (°C) from the dry-bulb temperature (°C) and partial pressure of water vapour (Pa).
+    Solved by Newton-Raphson on every point at once, starting from the Magnus formula's (approximate) dew point,
+    and never above the dry-bulb temperature.
+    """
+    temperature, vapour_pressure = np.broadcast_arrays(np.asarray(temperature, dtype=float),
+                                                       np.asarray(vapour_pressure, dtype=float))
+    lower, upper = saturation_vapour_pressure(TEMPERATURE_LIMITS[0]), saturation_vapour_pressure(TEMPERATURE_LIMITS[1])
+    valid = (vapour_pressure >= lower) & (vapour_pressure <= upper)
+    ln_vapour_pressure = np.log(np.where(valid, vapour_pressure, 1.0))
+
+    gamma = ln_vapour_pressure - np.log(611.2)
+    dew_point = np.where(valid, np.clip(243.12 * gamma / (17.62 - gamma), *TEMPERATURE_LIMITS), np.nan)
+
+    # Only the points that haven't converged yet are iterated
+    active = np.flatnonzero(valid)
+    flat_dew_point, flat_ln_vapour_pressure = dew_point.reshape(-1), ln_vapour_pressure.reshape(-1)
+    for _ in range(MAX_ITERATIONS):
+        if not len(active):
+            break
+        current = flat_dew_point[active]
+        step = ((_ln_saturation_vapour_pressure(current) - flat_ln_vapour_pressure[active])
+                / _d_ln_saturation_vapour_pressure(current))
+        updated = np.clip(current - step, *TEMPERATURE_LIMITS)
+        flat_dew_point[active] = updated
+        active = active[np.abs(updated - current) > DEW_POINT_TOLERANCE]
+    return np.minimum(dew_point, temperature)
+
+
+def dew_point_from_humidity_ratio(temperature, humidity_ratio, pressure):
+    """Dew point temperature (°C) from the dry-bulb temperature (°C), humidity ratio (kg/kg) and pressure (Pa)"""
+    return dew_point_from_vapour_pressure(temperature, vapour_pressure_from_humidity_ratio(humidity_ratio, pressure))
+
+
+def dew_point_from_relative_humidity(temperature, relative_humidity):
+    """Dew point temperature (°C) from the dry-bulb temperature (°C) and relative humidity (0 to 1)"""
+    relative_humidity = np.asarray(relative_humidity, dtype=float)
+    relative_humidity = np.where((relative_humidity >= 0) & (relative_humidity <= 1), relative_humidity, np.nan)
+    return dew_point_from_vapour_pressure(temperature, relative_humidity * saturation_vapour_pressure(temperature))
+
+
+def wet_bulb_from_humidity_ratio(temperature, humidity_ratio, pressure):
+    """
+    Wet-bulb temperature (°C) from the dry-bulb temperature (°C), humidity ratio (kg/kg) and pressure (Pa).
+    Solved by bisection between the dew point and the dry-bulb temperature, as psychrolib does, but with every
+    point bisected at once.
+    """
+    temperature, humidity_ratio, pressure = np.broadcast_arrays(np.asarray(temperature, dtype=float),
+                                                                _bounded_humidity_ratio(humidity_ratio),
+                                                                np.asarray(pressure, dtype=float))
+    lower = dew_point_from_humidity_ratio(temperature, humidity_ratio, pressure)
+    upper = temperature.copy()
+    for _ in range(MAX_ITERATIONS):
+        wet_bulb = (lower + upper) / 2
+        # NaN brackets (invalid points) never get narrower, so they're left out of the check
+        if not np.nan_to_num(upper - lower).max(initial=0) > WET_BULB_TOLERANCE:
+            break
+        too_humid = humidity_ratio_from_wet_bulb(temperature, wet_bulb, pressure) > humidity_ratio
+        upper = np.where(too_humid, wet_bulb, upper)
+        lower = np.where(too_humid, lower, wet_bulb)
+    return (lower + upper) / 2
@@ -1,48 +1,24 @@
-import pandas as pd
-from io import BytesIO
-import streamlit as st
+from processing.schedules import read_schedule
 
 
-# Function to convert DataFrame to Excel
-def convert_df_to_excel(df):
-    output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Pipe Data')
-    writer._save()
-    processed_data = output.getvalue()
-    return processed_data
+# Columns of the pipe volume schedule and their types
+PIPE_VOLUME_COLUMNS = {
+    'Material': object,
+    'Nominal diameter (mm)': float,
+    'Internal diameter (mm)': float,
+    'Length (m)': float,
+    'Pipe volume (m³)': float,
+}
 
 
 # Function to upload and load Excel data
 def load_excel_data(uploaded_file):
-    # Read the Excel file into a DataFrame
-    df = pd.read_excel(uploaded_file)
-
-    # List of required columns
-    required_columns = ['Material', 'Nominal diameter (mm)', 'Internal diameter (mm)', 'Length (m)', 'Pipe volume (m³)']
-
-    # Check if all required columns exist in the uploaded file
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    if missing_columns:
-        st.error(f"The uploaded file is missing the following required columns: {', '.join(missing_columns)}")
-        return
-
-    # Drop rows with missing or NaN values in the required columns
-    df = df.dropna(subset=required_columns)
-
-    # Create a list of tuples with the cleaned data (for all required columns)
-    pipe_entries = [
-        (
-            row['Material'],
-            row['Nominal diameter (mm)'],
-            row['Internal diameter (mm)'],
-            row['Length (m)'],
-            row['Pipe volume (m³)']
-        )
-        for _, row in df.iterrows()
-    ]
-
-    return pipe_entries
+    """
+    Read a pipe volume schedule, only the required columns are read and rows with missing values are dropped.
+    Returns ({column: numpy array}, number of rows dropped), for the caller to report.
+    Raises ScheduleError if the file can't be read, for the caller to report.
+    """
+    return read_schedule(uploaded_file, list(PIPE_VOLUME_COLUMNS), text_columns=['Material'], return_dropped=True)
 
 
 dict_primary_ventilated_stacks = {
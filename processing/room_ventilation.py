@@ -0,0 +1,92 @@
+import numpy as np
+
+from processing.instrumentation import timed
+from processing.schedules import read_schedule
+from processing.ventilation_processing import (calculate_ach_volume, calculate_volume_flow_rate,
+                                               calculate_occupation_flow_rate, calculate_room_volume)
+
+# Columns of a room schedule
+ROOM_SCHEDULE_COLUMNS = {
+    'Room reference': object,
+    'Zone': object,
+    'AHU': object,
+    'Floor area (m²)': float,
+    'Ceiling height (m)': float,
+    'Occupancy (people)': float,
+    'Air changes (/hour)': float,
+    'Air per person (l/s)': float,
+}
+ROOM_TEXT_COLUMNS = ['Room reference', 'Zone', 'AHU']
+# Rooms without these are left out, blanks in the other columns are read as 0 (or no zone/AHU)
+ROOM_REQUIRED_COLUMNS = ['Room reference', 'Floor area (m²)']
+# Group of the rooms with no zone or AHU
+UNASSIGNED = 'Unassigned'
+
+# Columns summed for each zone or AHU
+TOTAL_COLUMNS = ['Floor area (m²)', 'Room volume (m³)', 'Occupancy (people)', 'Air change flow rate (m³/s)',
+                 'Occupancy flow rate (m³/s)', 'Volume flow rate (m³/s)']
+
+
+def read_room_schedule(source):
+    """
+    Read a room schedule from an Excel, CSV or Parquet file, with the ROOM_SCHEDULE_COLUMNS.
+    Only the ROOM_REQUIRED_COLUMNS have to be filled in, rooms without them are dropped. Blank (or missing)
+    demand inputs are 0, i.e. no flow for that requirement, and blank zones and AHUs are left empty.
+    Returns ({column: numpy array}, number of rows dropped). Raises ScheduleError if required columns are missing.
+    """
+    optional_columns = [col for col in ROOM_SCHEDULE_COLUMNS if col not in ROOM_REQUIRED_COLUMNS]
+    columns, dropped_rows = read_schedule(source, ROOM_REQUIRED_COLUMNS, ROOM_TEXT_COLUMNS, optional_columns,
+                                          return_dropped=True)
+    rooms = len(columns['Room reference'])
+    for col in optional_columns:
+        if col in ROOM_TEXT_COLUMNS:
+            columns[col] = columns[col] if col in columns else np.full(rooms, '')
+        else:
+            columns[col] = np.nan_to_num(columns[col].astype(float)) if col in columns else np.zeros(rooms)
+    return {col: columns[col] for col in ROOM_SCHEDULE_COLUMNS}, dropped_rows
+
+
+@timed()
+def calculate_room_flows(columns):
+    """
+    The governing ('most onerous') supply flow of every room at once, the larger of the air change and
+    occupancy flow rates.
+    columns: Dictionary of room schedule columns (see ROOM_SCHEDULE_COLUMNS), e.g. from read_room_schedule.
+    Returns a dictionary of result arrays, one value per room.
+    """
+    room_volume = calculate_room_volume(np.asarray(columns['Floor area (m²)'], dtype=float),
+                                        np.asarray(columns['Ceiling height (m)'], dtype=float))
+    ach_flow_rate = calculate_volume_flow_rate(room_volume, np.asarray(columns['Air changes (/hour)'], dtype=float))
+    occupancy_flow_rate = calculate_occupation_flow_rate(np.asarray(columns['Occupancy (people)'], dtype=float),
+                                                         np.asarray(columns['Air per person (l/s)'], dtype=float))
+    volume_flow_rate = np.maximum(ach_flow_rate, occupancy_flow_rate)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ach = calculate_ach_volume(room_volume, volume_flow_rate)
+    return {
+        'Room volume (m³)': room_volume,
+        'Air change flow rate (m³/s)': ach_flow_rate,
+        'Occupancy flow rate (m³/s)': occupancy_flow_rate,
+        'Volume flow rate (m³/s)': volume_flow_rate,
+        'Governing requirement': np.where(occupancy_flow_rate > ach_flow_rate, 'Occupancy', 'Air changes'),
+        'Air changes achieved (/hour)': ach,
+    }
+
+
+def aggregate_room_flows(columns, results, by):
+    """
+    Totals of the rooms in each zone or AHU.
+    columns: Room schedule columns, results: calculate_room_flows of the same rooms.
+    by: Column to group the rooms by, 'Zone' or 'AHU'.
+    Returns a dictionary of arrays, one value per group in sorted order: the group, number of rooms, the
+    TOTAL_COLUMNS summed, and the air changes of the group's total volume. Rooms without a group are UNASSIGNED.
+    """
+    names = np.char.strip(np.asarray(columns[by]).astype(str))
+    groups, group_index = np.unique(np.where(names == '', UNASSIGNED, names), return_inverse=True)
+    values = {**columns, **results}
+    totals = {by: groups, 'Rooms': np.bincount(group_index, minlength=len(groups))}
+    for name in TOTAL_COLUMNS:
+        totals[name] = np.bincount(group_index, weights=np.asarray(values[name], dtype=float), minlength=len(groups))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        totals['Air changes achieved (/hour)'] = calculate_ach_volume(totals['Room volume (m³)'],
+                                                                      totals['Volume flow rate (m³/s)'])
+    return totals
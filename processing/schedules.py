@@ -0,0 +1,135 @@
+import os
+from itertools import islice
+from operator import itemgetter
+import numpy as np
+import pandas as pd
+
+from processing.instrumentation import timed
+
+# File types an uploaded schedule can be read from
+SCHEDULE_FILE_TYPES = ['xlsx', 'csv', 'parquet']
+# Rows of a workbook held as Python tuples at once, each block is converted to column arrays before the next
+EXCEL_BLOCK_ROWS = 10000
+
+
+class ScheduleError(ValueError):
+    """Raised when a schedule can't be read, missing_columns lists any required columns that weren't found"""
+
+    def __init__(self, message, missing_columns=()):
+        super().__init__(message)
+        self.missing_columns = list(missing_columns)
+
+
+def _file_type(source):
+    """File type from the extension of a path or an uploaded file's name"""
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+    return os.path.splitext(os.fspath(name))[1].lower().lstrip('.')
+
+
+def _check_columns(columns, required_columns):
+    missing_columns = [col for col in required_columns if col not in columns]
+    if missing_columns:
+        raise ScheduleError(f"The uploaded file is missing the following required columns: "
+                            f"{', '.join(missing_columns)}", missing_columns)
+
+
+def _present(header, optional_columns):
+    return [col for col in optional_columns if col in header]
+
+
+def _read_excel_columns(source, required_columns, optional_columns=(), text_columns=()):
+    """
+    Stream the first sheet of a workbook in read-only mode, keeping only the required (and optional) columns.
+    Rows are read EXCEL_BLOCK_ROWS at a time and each block is converted to an array per column (numbers as
+    floats), so only one block of rows is ever held as Python objects.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(value) if value is not None else None for value in next(rows, ())]
+        _check_columns(header, required_columns)
+
+        columns = required_columns + _present(header, optional_columns)
+        positions = [header.index(col) for col in columns]
+        select = itemgetter(*positions)
+        width = max(positions) + 1
+        padding = (None,) * width
+        blocks = {col: [] for col in columns}
+        while True:
+            # Read-only rows stop at the last cell with a value, so short rows are padded out
+            block = [select(row) if len(row) >= width else select(row + padding)
+                     for row in islice(rows, EXCEL_BLOCK_ROWS)]
+            if not block:
+                break
+            if len(columns) == 1:
+                block = [(value,) for value in block]
+            for col, values in zip(columns, zip(*block)):
+                values = np.array(values, dtype=object)
+                blocks[col].append(values if col in text_columns else pd.to_numeric(values, errors='coerce'))
+    finally:
+        workbook.close()
+
+    return pd.DataFrame({col: np.concatenate(parts) if parts else np.array([], dtype=object)
+                         for col, parts in blocks.items()})
+
+
+def _read_csv_columns(source, required_columns, optional_columns=(), text_columns=()):
+    header = pd.read_csv(source, nrows=0).columns
+    _check_columns(header, required_columns)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    columns = required_columns + _present(header, optional_columns)
+    # Text is read as text, so a name like 101 isn't turned into 101.0 by a blank in the same column
+    return pd.read_csv(source, usecols=columns, dtype={col: str for col in text_columns if col in columns})
+
+
+def _read_parquet_columns(source, required_columns, optional_columns=(), text_columns=()):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(source)
+    header = parquet_file.schema_arrow.names
+    _check_columns(header, required_columns)
+    return parquet_file.read(columns=required_columns + _present(header, optional_columns)).to_pandas()
+
+
+SCHEDULE_READERS = {
+    'xlsx': _read_excel_columns,
+    'csv': _read_csv_columns,
+    'parquet': _read_parquet_columns,
+}
+
+
+@timed()
+def read_schedule(source, required_columns, text_columns=(), optional_columns=(), return_dropped=False):
+    """
+    Read a schedule (e.g. a pipe schedule) from an Excel, CSV or Parquet file.
+    source: File path or uploaded file object, the type is taken from the file extension.
+    required_columns: Columns to read, every one must be present.
+    text_columns: Columns holding text, all others are converted to numbers in one pass per column.
+    optional_columns: Columns read if the file has them, blanks are kept (NaN for numbers, '' for text).
+    Rows with a missing (or non-numeric) value in any required column are dropped.
+    Returns a dictionary of {column: numpy array}, the required columns in order then any optional columns found.
+    With return_dropped, returns (columns, number of rows dropped) so the caller can report them.
+    Raises ScheduleError if the file type isn't supported or columns are missing.
+    """
+    file_type = _file_type(source)
+    if file_type not in SCHEDULE_READERS:
+        raise ScheduleError(f"Unsupported file type '{file_type}', upload one of: {', '.join(SCHEDULE_FILE_TYPES)}")
+    df = SCHEDULE_READERS[file_type](source, list(required_columns), list(optional_columns), list(text_columns))
+
+    # Dtypes are converted a whole column at a time
+    for col in df.columns:
+        if col not in text_columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    rows = len(df)
+    df = df.dropna(subset=list(required_columns))
+
+    columns = list(required_columns) + [col for col in optional_columns if col in df.columns]
+    columns = {col: df[col].fillna('').astype(str).to_numpy() if col in text_columns else df[col].to_numpy()
+               for col in columns}
+    if return_dropped:
+        return columns, rows - len(df)
+    return columns
+
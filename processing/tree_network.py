@@ -0,0 +1,95 @@
+import numpy as np
+
+# Tree (branched) networks are held as arrays with one entry per section, linked by the index of each
+# section's parent (upstream) section. Sections fed directly from the plant have a parent of -1.
+# All of the passes below are a single sweep over the sections, so they scale linearly.
+
+
+def topological_order(parent):
+    """Returns the section indices ordered so every parent comes before its children"""
+    parent = np.asarray(parent, dtype=np.int64)
+    n = len(parent)
+    if np.any((parent < -1) | (parent >= n)) or np.any(parent == np.arange(n)):
+        raise ValueError('Parent indices must refer to another section in the network, or be -1 for a root')
+
+    # Most networks are numbered from the plant outwards, in which case there is nothing to do
+    if np.all(parent < np.arange(n)):
+        return np.arange(n)
+
+    # Children of each section in compressed (CSR) form, roots (parent -1) sort to the front
+    children = np.argsort(parent, kind='stable')
+    number_of_roots = int(np.count_nonzero(parent == -1))
+    starts = np.concatenate(([0], np.cumsum(np.bincount(parent[parent >= 0], minlength=n)))) + number_of_roots
+    children, starts = children.tolist(), starts.tolist()
+
+    # Breadth first search from the roots
+    order = children[:number_of_roots]
+    i = 0
+    while i < len(order):
+        section = order[i]
+        order.extend(children[starts[section]:starts[section + 1]])
+        i += 1
+
+    if len(order) != n:
+        raise ValueError('The network contains a loop, every section must lead back to a root')
+    return np.array(order, dtype=np.int64)
+
+
+def accumulate_to_root(parent, order, terminal_values):
+    """Sums terminal values (e.g. flows) from the leaves upwards, so each section carries everything downstream"""
+    totals = np.asarray(terminal_values, dtype=float).copy()
+    parent_list = parent.tolist()
+    totals_list = totals.tolist()
+    for section in order[::-1].tolist():
+        if parent_list[section] >= 0:
+            totals_list[parent_list[section]] += totals_list[section]
+    return np.array(totals_list)
+
+
+def cumulative_from_root(parent, order, section_values):
+    """Running total of section values (e.g. pressure drops) from the root to the end of each section"""
+    cumulative = np.asarray(section_values, dtype=float).tolist()
+    parent_list = parent.tolist()
+    for section in order.tolist():
+        if parent_list[section] >= 0:
+            cumulative[section] += cumulative[parent_list[section]]
+    return np.array(cumulative)
+
+
+def find_leaves(parent):
+    """Boolean mask of the sections that have no children (the terminals)"""
+    parent = np.asarray(parent, dtype=np.int64)
+    has_children = np.zeros(len(parent), dtype=bool)
+    has_children[parent[parent >= 0]] = True
+    return ~has_children
+
+
+def path_to_root(parent, section):
+    """Section indices from the root down to (and including) the given section"""
+    path = []
+    while section >= 0:
+        path.append(int(section))
+        section = parent[section]
+    return np.array(path[::-1], dtype=np.int64)
+
+
+def find_index_run(parent, order, section_values, terminal_values=0, terminals=None):
+    """
+    Finds the run from a root to a terminal with the greatest total (e.g. the index circuit).
+    section_values: Value for each section (e.g. pressure drop).
+    terminal_values: Additional value at the end of each section (e.g. a terminal unit's pressure drop).
+    terminals: Boolean mask of the sections with a terminal, which can be part way along a run (e.g. emitters
+    or diffusers in series). Runs can end at any terminal or leaf.
+    Returns the cumulative totals, the index run's section indices (root first) and its total.
+    An empty network has an empty run with a total of 0.
+    """
+    cumulative = cumulative_from_root(parent, order, section_values)
+    if not len(cumulative):
+        return cumulative, np.array([], dtype=np.int64), 0.0
+    run_totals = cumulative + np.broadcast_to(np.asarray(terminal_values, dtype=float), cumulative.shape)
+    ends = find_leaves(parent)
+    if terminals is not None:
+        ends |= np.asarray(terminals, dtype=bool)
+    ends = np.flatnonzero(ends)
+    index_terminal = ends[np.argmax(run_totals[ends])]
+    return cumulative, path_to_root(parent, index_terminal), float(run_totals[index_terminal])
@@ -1,9 +1,10 @@
 import math
-import matplotlib.pyplot as plt
-from pyfluids import Fluid, FluidsList, Input
+import functools
 import numpy as np
-from bokeh.plotting import figure
-import psychrolib
+from processing.property_tables import lookup_air_properties
+from processing.heating_processing import calculate_darcy_friction_factor_array
+from processing.psychrometrics import humidity_ratio_from_relative_humidity, humidity_ratio_from_wet_bulb
+from processing.instrumentation import timed
 
 
 def calculate_ach_volume(room_volume, volume_flow_rate):
@@ -93,23 +94,23 @@ def convert_airflow_rate(value, from_unit, to_unit):
 # Air calcs
 
 def calculate_aspect_ratio(width_mm, height_mm):
-    aspect_ratio = width_mm / height_mm
-    if aspect_ratio < 1:
-        aspect_ratio = 1 / aspect_ratio
+    # Longest side over shortest side, works on arrays of ducts too
+    aspect_ratio = np.maximum(width_mm / height_mm, height_mm / width_mm)
 
     return aspect_ratio
 
 
+@timed()
 def get_air_properties(air_temperature, pressure):
-    fluid = Fluid(FluidsList.Air)
-
-    # Update the fluid's state with the given temperature and pressure
-    fluid.update(Input.pressure(pressure), Input.temperature(air_temperature))
+    # Interpolated from the air table in property_tables, which falls back to CoolProp outside it.
+    # Temperatures (°C) and pressures (Pa) can be arrays, e.g. one per duct section
+    density, specific_heat, viscosity = lookup_air_properties(air_temperature, pressure)
 
     # Return key properties
     properties = {
-        'Specific Heat (kJ/kg·K)': fluid.specific_heat / 1000,
-        'Density (kg/m³)': fluid.density,
+        'Specific Heat (kJ/kg·K)': specific_heat / 1000,
+        'Density (kg/m³)': density,
+        'Dynamic viscosity (Pa·s)': viscosity,
     }
 
     return properties
@@ -130,8 +131,8 @@ def calculate_rect_duct_area(height_mm, width_mm):
     # Calculate the duct area
     duct_area_sqm = height_m * width_m
 
-    # Calculate the equivalent diameter (hydraulic diameter) convert to mm
-    eq_diameter_mm = math.sqrt(height_m * width_m / math.pi) * 2000
+    # Calculate the equivalent (equal area) diameter convert to mm, see calculate_hydraulic_diameter for friction
+    eq_diameter_mm = np.sqrt(height_m * width_m / math.pi) * 2000
     return duct_area_sqm, eq_diameter_mm
 
 
@@ -160,26 +161,72 @@ def find_min_rect_size(air_volume, max_duct_velocity, max_dim_mm):
         return size_mm, size_mm
 
 
-def calculate_pressure_loss(diameter_mm, air_density, air_velocity):
+# Equivalent roughness of duct materials (mm), CIBSE Guide C and ASHRAE Fundamentals
+DUCT_ROUGHNESS = {
+    'PVC': 0.03,
+    'Aluminium': 0.05,
+    'Galvanised steel (spiral seam)': 0.09,
+    'Galvanised steel': 0.15,
+    'Fibreglass duct board': 0.9,
+    'Flexible duct': 3.0,
+    'Concrete': 3.0,
+}
+DEFAULT_DUCT_ROUGHNESS = DUCT_ROUGHNESS['Galvanised steel']
+# Air at 20 °C and 101325 Pa, used when the viscosity isn't given
+STANDARD_AIR_VISCOSITY = 1.813e-5  # Pa.s
+
+
+def calculate_hydraulic_diameter(width_mm, height_mm):
+    # 4 x area / perimeter of a rectangular duct, in mm
+    return 2 * width_mm * height_mm / (width_mm + height_mm)
+
+
+def calculate_duct_friction(air_velocity, hydraulic_diameter_mm, air_density, air_viscosity=STANDARD_AIR_VISCOSITY,
+                            roughness_mm=DEFAULT_DUCT_ROUGHNESS, friction_model='Colebrook'):
     """
-    Calculate the pressure loss per meter in a duct.
-    
-    Parameters:
-    friction_factor (float): The Darcy-Weisbach friction factor (dimensionless).
-    duct_length (float): The length of the duct in meters (m).
-    hydraulic_diameter (float): The hydraulic diameter of the duct in meters (m).
-    air_density (float): The density of air in kilograms per cubic meter (kg/m³).
-    air_velocity (float): The velocity of air in meters per second (m/s).
-    
-    Returns:
-    float: The pressure loss in Pascals per meter (Pa/m).
+    Friction in ducts from the Reynolds number and the duct's roughness, for one duct or arrays of ducts.
+    air_velocity: Air velocity (m/s).
+    hydraulic_diameter_mm: Hydraulic diameter (mm), the diameter of a round duct or calculate_hydraulic_diameter.
+    air_density: Density (kg/m³), air_viscosity: Dynamic viscosity (Pa.s), e.g. from get_air_properties.
+    roughness_mm: Equivalent roughness (mm), see DUCT_ROUGHNESS.
+    friction_model: Any of heating_processing.FRICTION_MODELS, explicit approximations such as 'Haaland' are
+    faster than the exact 'Colebrook'.
+    Returns a dictionary with the Reynolds number, Darcy friction factor and pressure loss (Pa/m).
     """
-    diameter_m = diameter_mm / 1000  # convert to m
-    friction_factor = 0.02  # Typical Darcy-Weisbach friction factor for ductwork
-    pressure_loss = friction_factor * (air_density * air_velocity ** 2) / (2 * diameter_m)
-    return pressure_loss
+    air_velocity = np.asarray(air_velocity, dtype=float)
+    hydraulic_diameter_m = np.asarray(hydraulic_diameter_mm, dtype=float) / 1000
+
+    reynolds_number = air_density * air_velocity * hydraulic_diameter_m / air_viscosity
+    with np.errstate(divide='ignore', invalid='ignore'):
+        friction_factor = calculate_darcy_friction_factor_array(reynolds_number, roughness_mm / 1000,
+                                                                hydraulic_diameter_m, friction_model)
+        # Still air has no friction loss
+        pressure_loss = np.where(air_velocity == 0, 0.0,
+                                 friction_factor * (air_density * air_velocity ** 2) / (2 * hydraulic_diameter_m))
+
+    # Single ducts give scalars rather than 0-d arrays
+    return {
+        'Reynolds number': reynolds_number[()],
+        'Darcy friction factor': friction_factor[()],
+        'Pressure loss (Pa/m)': pressure_loss[()],
+    }
+
+
+def calculate_pressure_loss(diameter_mm, air_density, air_velocity, air_viscosity=STANDARD_AIR_VISCOSITY,
+                            roughness_mm=DEFAULT_DUCT_ROUGHNESS, friction_model='Colebrook'):
+    """
+    Calculate the pressure loss per meter in a duct (Pa/m), with the Darcy-Weisbach friction factor from the
+    Colebrook-White equation (see calculate_duct_friction).
+    diameter_mm: Hydraulic diameter of the duct (mm), use calculate_hydraulic_diameter for rectangular ducts.
+    air_density: The density of air (kg/m³).
+    air_velocity: The velocity of air (m/s).
+    air_viscosity, roughness_mm, friction_model: As for calculate_duct_friction.
+    """
+    return calculate_duct_friction(air_velocity, diameter_mm, air_density, air_viscosity, roughness_mm,
+                                   friction_model)['Pressure loss (Pa/m)']
 
 
+@timed()
 def plot_duct_cross_section(width_mm=None, height_mm=None, diameter_mm=None):
     """
     Function to plot the cross-sectional profile of a duct, either rectangular or round.
@@ -189,6 +236,7 @@ def plot_duct_cross_section(width_mm=None, height_mm=None, diameter_mm=None):
     height_mm (float, optional): Height of the rectangular duct in millimeters.
     diameter_mm (float, optional): Diameter of the round duct in millimeters.
     """
+    import matplotlib.pyplot as plt
 
     # Create a new figure and axis for the plot
     fig, ax = plt.subplots(figsize=(3, 3))
@@ -245,11 +293,48 @@ def plot_duct_cross_section(width_mm=None, height_mm=None, diameter_mm=None):
     return fig
 
 
-def plot_psychrometric(pressure, t_range, rh_range, twb_range, y_max):
+# Chart line geometry is kept for this many (pressure, t_range, rh_range, twb_range) combinations
+PSYCHROMETRIC_CACHE_SIZE = 32
+
+
+@functools.lru_cache(maxsize=PSYCHROMETRIC_CACHE_SIZE)
+def _psychrometric_lines(pressure, t_range, rh_range, twb_range):
     # Temperature and humidity ranges
     t_array = np.arange(t_range[0], t_range[1], 0.1)
     rh_array = np.arange(rh_range[0] / 100, (rh_range[1] + 0.1) / 100, 0.1)
     twb_array = np.arange(twb_range[0], twb_range[1] + 5, 5)
+    t_array.setflags(write=False)
+
+    # Constant relative humidity lines, every line is calculated at once as an RH x temperature array
+    hr_rh = humidity_ratio_from_relative_humidity(t_array[np.newaxis, :], rh_array[:, np.newaxis], pressure)
+
+    # Constant wet-bulb temperature lines, each only where the wet-bulb is below the dry-bulb temperature
+    hr_twb = humidity_ratio_from_wet_bulb(t_array[np.newaxis, :], twb_array[:, np.newaxis], pressure)
+    below_dry_bulb = twb_array[:, np.newaxis] <= t_array[np.newaxis, :]
+
+    lines = {
+        'Relative humidity': ([t_array] * len(rh_array), list(hr_rh)),
+        'Wet-bulb temperature': ([t_array[row] for row in below_dry_bulb],
+                                 [hr[row] for hr, row in zip(hr_twb, below_dry_bulb)]),
+    }
+    # The arrays are shared by every chart with the same parameters
+    for xs, ys in lines.values():
+        for array in xs + ys:
+            array.setflags(write=False)
+    return lines
+
+
+def psychrometric_chart_lines(pressure, t_range, rh_range, twb_range):
+    """
+    Returns {'Relative humidity': (xs, ys), 'Wet-bulb temperature': (xs, ys)}, the x and y arrays of each
+    line on the chart. The most recently used are cached (see PSYCHROMETRIC_CACHE_SIZE), and are read-only.
+    """
+    return _psychrometric_lines(float(pressure), tuple(t_range), tuple(rh_range), tuple(twb_range))
+
+
+@timed()
+def plot_psychrometric(pressure, t_range, rh_range, twb_range, y_max):
+    from bokeh.plotting import figure
 
     # Create Bokeh figure
     p = figure(width=800, height=600, x_range=(t_range[0], t_range[1]), y_range=(0, y_max),
@@ -257,28 +342,53 @@ def plot_psychrometric(pressure, t_range, rh_range, twb_range, y_max):
     p.xaxis.axis_label = "Dry-bulb Temperature [°C]"
     p.yaxis.axis_label = "Humidity Ratio [$kg_{water}/kg_{dry air}$]"
 
-    # Set unit system to SI
-    psychrolib.SetUnitSystem(psychrolib.SI)
-
-    # Plot constant relative humidity lines
-    for rh in rh_array:
-        hr_array = []
-        for t in t_array:
-            hr = psychrolib.GetHumRatioFromRelHum(t, rh, pressure)
-            hr_array.append(hr)
-        p.line(t_array, hr_array, line_color="black", legend_label='Relative humidity')
-
-    # Plot constant wet-bulb temperature lines
-    for twb in twb_array:
-        hr_array = []
-        t_plot_array = []
-        for t in t_array:
-            if twb <= t:
-                hr = psychrolib.GetHumRatioFromTWetBulb(t, twb, pressure)
-                hr_array.append(hr)
-                t_plot_array.append(t)
-        p.line(t_plot_array, hr_array, line_color="red", legend_label='Wet-bulb temperature')
+    # One glyph per family of lines, from the cached geometry
+    lines = psychrometric_chart_lines(pressure, t_range, rh_range, twb_range)
+    for (legend_label, (xs, ys)), line_color in zip(lines.items(), ['black', 'red']):
+        p.multi_line(xs, ys, line_color=line_color, legend_label=legend_label)
 
     return p
 
 
+def add_psychrometric_points(p, points):
+    """
+    Overlay points on a chart from plot_psychrometric as a single glyph with its own data source, so the cost
+    doesn't grow with the number of points and the background lines aren't recalculated.
+    points: List of (dry-bulb temperature °C, humidity ratio, label) tuples.
+    Returns the ColumnDataSource of the points.
+    """
+    from bokeh.models import ColumnDataSource, HoverTool
+
+    db_temps, hum_ratios, labels = zip(*points) if points else ((), (), ())
+    source = ColumnDataSource(data={'x': list(db_temps), 'y': list(hum_ratios), 'label': list(labels)})
+    renderer = p.scatter('x', 'y', source=source, size=10, color="red", legend_label="Added points")
+    p.add_tools(HoverTool(renderers=[renderer], tooltips=[('', '@label'), ('Dry-bulb', '@x{0.0} °C'),
+                                                          ('Humidity ratio', '@y{0.0000}')]))
+    return source
+
+
+def add_psychrometric_density(p, bins):
+    """
+    Shade the hours of a weather file on a chart from plot_psychrometric, one rectangle per dry-bulb x humidity
+    ratio bin, darker for more hours.
+    bins: WeatherBins from processing.weather.process_weather_files.
+    Returns the ColumnDataSource of the bins.
+    """
+    from bokeh.models import ColumnDataSource, HoverTool
+    from bokeh.palettes import Blues9
+    from bokeh.transform import linear_cmap
+
+    binned = bins.to_dataframe()
+    source = ColumnDataSource(data={'left': binned['Dry-bulb from (°C)'], 'right': binned['Dry-bulb to (°C)'],
+                                    'bottom': binned['Humidity ratio from (kg/kg)'],
+                                    'top': binned['Humidity ratio to (kg/kg)'], 'hours': binned['Hours']})
+    most_hours = int(binned['Hours'].max()) if len(binned) else 1
+    renderer = p.quad(left='left', right='right', bottom='bottom', top='top', source=source, line_color=None,
+                      fill_alpha=0.6, legend_label='Weather hours',
+                      fill_color=linear_cmap('hours', Blues9[::-1], 1, most_hours))
+    # Drawn under the chart lines and points
+    p.renderers.remove(renderer)
+    p.renderers.insert(0, renderer)
+    p.add_tools(HoverTool(renderers=[renderer], tooltips=[('Hours', '@hours'), ('Dry-bulb', '@left to @right °C')]))
+    return source
+
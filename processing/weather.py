@@ -0,0 +1,252 @@
+"""
+Psychrometric state points for annual (8760 hour) weather files, e.g. for sizing AHU coils.
+
+Weather files are read in chunks and every hour of a chunk is processed at once with the vectorised
+functions in processing/psychrometrics.py. Hours are counted into fixed bins as they go, so memory use
+doesn't depend on the length of the file or the number of years processed:
+    bins = process_weather_files(['london_2020.epw', 'london_2021.epw'], output='london_states.parquet')
+    bins.to_dataframe()  # Hours in each dry-bulb x humidity ratio bin, for the psychrometric chart
+    bins.design_value('Enthalpy (kJ/kg)', 0.4)  # Exceeded for 0.4 % of hours
+"""
+import os
+import numpy as np
+import pandas as pd
+
+from processing.export import CHUNK_SIZE, write_csv, write_parquet
+from processing.instrumentation import timed
+from processing.psychrometrics import (humidity_ratio_from_relative_humidity, humidity_ratio_from_wet_bulb,
+                                       relative_humidity_from_humidity_ratio, wet_bulb_from_humidity_ratio,
+                                       dew_point_from_humidity_ratio, enthalpy)
+from processing.schedules import ScheduleError, _file_type
+
+# File types a weather file can be read from
+WEATHER_FILE_TYPES = ['epw', 'csv']
+STANDARD_PRESSURE = 101325.0  # Pa, used for hours without a pressure
+
+DRY_BULB = 'Dry-bulb temperature (°C)'
+RELATIVE_HUMIDITY = 'Relative humidity (%)'
+WET_BULB = 'Wet-bulb temperature (°C)'
+PRESSURE = 'Atmospheric pressure (Pa)'
+HUMIDITY_RATIO = 'Humidity ratio (kg/kg)'
+ENTHALPY = 'Enthalpy (kJ/kg)'
+DEW_POINT = 'Dew point (°C)'
+
+###### Reading weather files ######
+
+# EPW files have 8 lines of location and design data before the hourly rows
+EPW_HEADER_LINES = 8
+# Fields of an EPW row that are read: {position: (column, value used for missing data)}
+EPW_FIELDS = {
+    0: ('Year', None),
+    1: ('Month', None),
+    2: ('Day', None),
+    3: ('Hour', None),
+    6: (DRY_BULB, 99.9),
+    8: (RELATIVE_HUMIDITY, 999),
+    9: (PRESSURE, 999999),
+}
+# A CSV needs the dry-bulb temperature and one of these, the pressure column is optional
+CSV_HUMIDITY_COLUMNS = [RELATIVE_HUMIDITY, WET_BULB]
+
+
+def _read_epw_chunks(source, chunk_size):
+    positions = sorted(EPW_FIELDS)
+    chunks = pd.read_csv(source, skiprows=EPW_HEADER_LINES, header=None, usecols=positions,
+                         chunksize=chunk_size)
+    for chunk in chunks:
+        chunk = chunk[positions]
+        chunk.columns = [EPW_FIELDS[position][0] for position in positions]
+        for column, missing in EPW_FIELDS.values():
+            if missing is not None:
+                chunk[column] = chunk[column].astype(float).mask(chunk[column] == missing)
+        yield chunk
+
+
+def _read_csv_chunks(source, chunk_size):
+    header = list(pd.read_csv(source, nrows=0).columns)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    if DRY_BULB not in header:
+        raise ScheduleError(f"The weather file is missing the column: {DRY_BULB}", [DRY_BULB])
+    humidity_columns = [column for column in CSV_HUMIDITY_COLUMNS if column in header]
+    if not humidity_columns:
+        raise ScheduleError(f"The weather file needs one of the columns: {', '.join(CSV_HUMIDITY_COLUMNS)}",
+                            CSV_HUMIDITY_COLUMNS)
+    columns = [DRY_BULB, humidity_columns[0]] + ([PRESSURE] if PRESSURE in header else [])
+    for chunk in pd.read_csv(source, usecols=columns, chunksize=chunk_size):
+        yield chunk[columns].apply(pd.to_numeric, errors='coerce')
+
+
+WEATHER_READERS = {
+    'epw': _read_epw_chunks,
+    'csv': _read_csv_chunks,
+}
+
+
+def _checked_chunks(chunks):
+    # Chunks are read lazily, so a file that can't be parsed only fails part way through the loop
+    try:
+        yield from chunks
+    except ScheduleError:
+        raise
+    except ValueError as error:
+        # e.g. text where a number should be, or an empty file (pandas' EmptyDataError and ParserError)
+        raise ScheduleError(f"The weather file couldn't be read: {error}") from error
+
+
+def iter_weather_chunks(source, chunk_size=CHUNK_SIZE):
+    """
+    Yields DataFrames of up to chunk_size hours from an EPW or CSV weather file, missing values are NaN.
+    source: File path or uploaded file object, the type is taken from the file extension.
+    EPW chunks have the date, dry-bulb, relative humidity and pressure columns. CSV chunks have the dry-bulb,
+    then relative humidity or wet-bulb, and the pressure if the file has it.
+    Raises ScheduleError if the file type isn't supported, columns are missing or the rows can't be read.
+    """
+    file_type = _file_type(source)
+    if file_type not in WEATHER_READERS:
+        raise ScheduleError(f"Unsupported file type '{file_type}', upload one of: {', '.join(WEATHER_FILE_TYPES)}")
+    return _checked_chunks(WEATHER_READERS[file_type](source, chunk_size))
+
+
+###### Psychrometric states ######
+
+def weather_psychrometrics(chunk, pressure=None):
+    """
+    Add the psychrometric state of every hour to a chunk from iter_weather_chunks.
+    pressure: Atmospheric pressure (Pa) for every hour, e.g. for the site altitude. By default the file's
+    pressure is used, or standard pressure where it has none.
+    Returns a DataFrame with the relative humidity, wet-bulb, humidity ratio, enthalpy and dew point columns.
+    """
+    chunk = chunk.copy()
+    if pressure is not None:
+        chunk[PRESSURE] = float(pressure)
+    elif PRESSURE in chunk:
+        chunk[PRESSURE] = chunk[PRESSURE].fillna(STANDARD_PRESSURE)
+    else:
+        chunk[PRESSURE] = STANDARD_PRESSURE
+    dry_bulb, atmospheric_pressure = chunk[DRY_BULB].to_numpy(), chunk[PRESSURE].to_numpy()
+
+    if RELATIVE_HUMIDITY in chunk:
+        humidity_ratio = humidity_ratio_from_relative_humidity(dry_bulb, chunk[RELATIVE_HUMIDITY].to_numpy() / 100,
+                                                               atmospheric_pressure)
+        chunk[WET_BULB] = wet_bulb_from_humidity_ratio(dry_bulb, humidity_ratio, atmospheric_pressure)
+    else:
+        humidity_ratio = humidity_ratio_from_wet_bulb(dry_bulb, chunk[WET_BULB].to_numpy(), atmospheric_pressure)
+        chunk[RELATIVE_HUMIDITY] = relative_humidity_from_humidity_ratio(dry_bulb, humidity_ratio,
+                                                                         atmospheric_pressure) * 100
+    chunk[HUMIDITY_RATIO] = humidity_ratio
+    chunk[ENTHALPY] = enthalpy(dry_bulb, humidity_ratio) / 1000
+    chunk[DEW_POINT] = dew_point_from_humidity_ratio(dry_bulb, humidity_ratio, atmospheric_pressure)
+    return chunk
+
+
+###### Binned frequencies ######
+
+# Default bins for the psychrometric chart density
+TEMPERATURE_EDGES = np.linspace(-20, 50, 71)
+HUMIDITY_RATIO_EDGES = np.linspace(0, 0.03, 31)
+# Fine distributions kept for design values: {column: bin edges}
+DISTRIBUTION_EDGES = {
+    DRY_BULB: np.linspace(-40, 60, 1001),
+    WET_BULB: np.linspace(-40, 40, 801),
+    ENTHALPY: np.linspace(-40, 150, 1901),
+    HUMIDITY_RATIO: np.linspace(0, 0.04, 801),
+}
+
+
+class WeatherBins:
+    """
+    Counts of hours in fixed bins, added one chunk at a time, so memory doesn't grow with the hours added.
+    counts: Hours in each dry-bulb x humidity ratio bin (hours outside the edges aren't counted here).
+    distributions: Hours in fine bins of each DISTRIBUTION_EDGES column, used for design values.
+    hours: Every hour added, invalid: hours without a valid state (e.g. missing data).
+    """
+
+    def __init__(self, temperature_edges=TEMPERATURE_EDGES, humidity_ratio_edges=HUMIDITY_RATIO_EDGES):
+        self.temperature_edges = np.asarray(temperature_edges, dtype=float)
+        self.humidity_ratio_edges = np.asarray(humidity_ratio_edges, dtype=float)
+        self.counts = np.zeros((len(self.temperature_edges) - 1, len(self.humidity_ratio_edges) - 1), dtype=np.int64)
+        self.distributions = {column: np.zeros(len(edges) - 1, dtype=np.int64)
+                              for column, edges in DISTRIBUTION_EDGES.items()}
+        self.hours = 0
+        self.invalid = 0
+
+    def add(self, states):
+        """Count the hours of a chunk from weather_psychrometrics"""
+        valid = states[HUMIDITY_RATIO].notna().to_numpy() & states[DRY_BULB].notna().to_numpy()
+        self.hours += len(states)
+        self.invalid += int(len(states) - valid.sum())
+
+        counts, _, _ = np.histogram2d(states[DRY_BULB].to_numpy()[valid], states[HUMIDITY_RATIO].to_numpy()[valid],
+                                      bins=(self.temperature_edges, self.humidity_ratio_edges))
+        self.counts += counts.astype(np.int64)
+        for column, edges in DISTRIBUTION_EDGES.items():
+            # Values beyond the edges are counted in the end bins
+            values = np.clip(states[column].to_numpy()[valid], edges[0], edges[-1])
+            positions = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+            self.distributions[column] += np.bincount(positions, minlength=len(edges) - 1)
+
+    def design_value(self, column, percentage):
+        """
+        Value of one of the DISTRIBUTION_EDGES columns exceeded for percentage % of the valid hours, e.g. 0.4 for
+        the 0.4 % annual cooling design condition. Accurate to the width of the distribution bins.
+        """
+        edges = DISTRIBUTION_EDGES[column]
+        counts = self.distributions[column]
+        if not counts.sum():
+            return np.nan
+        # Hours at or above each bin, from the top down
+        exceeded = np.cumsum(counts[::-1])[::-1]
+        position = np.flatnonzero(exceeded >= counts.sum() * percentage / 100)[-1]
+        return round(float(edges[position]), 6)
+
+    def to_dataframe(self):
+        """The dry-bulb x humidity ratio bins with at least one hour, their edges and hours"""
+        t_positions, w_positions = np.nonzero(self.counts)
+        return pd.DataFrame({
+            'Dry-bulb from (°C)': self.temperature_edges[t_positions],
+            'Dry-bulb to (°C)': self.temperature_edges[t_positions + 1],
+            'Humidity ratio from (kg/kg)': self.humidity_ratio_edges[w_positions],
+            'Humidity ratio to (kg/kg)': self.humidity_ratio_edges[w_positions + 1],
+            'Hours': self.counts[t_positions, w_positions],
+        })
+
+
+# Output writers by file extension
+WEATHER_WRITERS = {
+    '.csv': write_csv,
+    '.parquet': write_parquet,
+}
+
+
+@timed()
+def process_weather_files(sources, output=None, pressure=None, bins=None, chunk_size=CHUNK_SIZE):
+    """
+    Psychrometric states of every hour in one or more weather files (e.g. several years of the same site).
+    sources: File path or file object, or a list of them, read in turn.
+    output: Optional .csv or .parquet path, the hourly states are streamed to it chunk by chunk.
+    pressure: Atmospheric pressure (Pa) override, as for weather_psychrometrics.
+    bins: WeatherBins to add the hours to, a new one with the default edges if not given.
+    Returns the WeatherBins.
+    """
+    if isinstance(sources, (str, os.PathLike)) or hasattr(sources, 'read'):
+        sources = [sources]
+    bins = bins if bins is not None else WeatherBins()
+    if output is not None:
+        extension = os.path.splitext(os.fspath(output))[1].lower()
+        if extension not in WEATHER_WRITERS:
+            raise ValueError(f"Unsupported output type '{extension}', use one of: {', '.join(WEATHER_WRITERS)}")
+
+    def states():
+        for source in sources:
+            for chunk in iter_weather_chunks(source, chunk_size):
+                chunk_states = weather_psychrometrics(chunk, pressure)
+                bins.add(chunk_states)
+                yield chunk_states
+
+    if output is None:
+        for _ in states():
+            pass
+    else:
+        WEATHER_WRITERS[extension](states(), output)
+    return bins
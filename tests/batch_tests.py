@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+from processing.batch import run_batch, run_chunk, BATCH_JOBS
+from processing.heating_processing import calculate_EV_size, calculate_expansion_factor
+from processing.public_health_processing import select_stack_option
+from processing.schedules import ScheduleError
+from processing.ventilation_processing import find_min_diameter, find_min_rect_size
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, filename):
+        return os.path.join(self.directory.name, filename)
+
+    def write_input(self, df, filename='input.csv'):
+        df.to_csv(self.path(filename), index=False)
+        return self.path(filename)
+
+    def test_stacks(self):
+        source = self.write_input(pd.DataFrame({'Total DU (l/s)': [25.0, 400.0, 36.0],
+                                                'WC present': ['Yes', 'no', 'TRUE'],
+                                                'Venting method': ['Primary', 'secondary', 'Primary']}))
+        self.assertEqual(run_batch('stacks', source, self.path('out.csv'), {'frequency_factor': 0.7}, workers=1), 3)
+        result = pd.read_csv(self.path('out.csv'))
+        self.assertAlmostEqual(result['Waste water flow rate (l/s)'][1], 14.0)
+        self.assertEqual(result['Stack'].tolist(), [select_stack_option(3.5, True, 'Primary'),
+                                                    select_stack_option(14.0, False, 'Secondary'),
+                                                    select_stack_option(4.2, True, 'Primary')])
+
+    def test_expansion_matches_page_calculation(self):
+        source = self.write_input(pd.DataFrame({'System volume (l)': [5000.0], 'Maximum temperature (°C)': [80.0],
+                                                'Static head (m)': [10.0], 'Lowest working pressure (bar g)': [3.0]}))
+        run_batch('expansion', source, self.path('out.parquet'), workers=1)
+        result = pd.read_parquet(self.path('out.parquet'))
+        # Cold fill 2.35 bar abs, maximum 3.5 bar abs
+        expected = calculate_EV_size(5000, calculate_expansion_factor(80), (3.5 - 2.35) / 3.5)
+        self.assertAlmostEqual(result['Expansion vessel size (l)'][0], expected)
+
+    def test_ducts_match_scalar_functions(self):
+        source = self.write_input(pd.DataFrame({'Air volume (m³/s)': [0.3, 1.25]}))
+        run_batch('ducts', source, self.path('out.csv'), {'max_velocity': 4.0, 'max_dimension': 600}, workers=1)
+        result = pd.read_csv(self.path('out.csv'))
+        self.assertEqual(result['Diameter (mm)'].tolist(), [find_min_diameter(0.3, 4.0), find_min_diameter(1.25, 4.0)])
+        self.assertAlmostEqual(result['Height (mm)'][1], find_min_rect_size(1.25, 4.0, 600)[1])
+        # Standard sizes, up to 4 to 1 by default and no wider than the fixed width (800 x 400 otherwise)
+        self.assertEqual(result['Standard diameter (mm)'].tolist(), [315, 710])
+        self.assertEqual(result['Standard width (mm)'].tolist(), [300, 600])
+        self.assertEqual(result['Standard height (mm)'].tolist(), [250, 600])
+
+    def test_rooms(self):
+        source = self.write_input(pd.DataFrame({'Room reference': ['G01', 'G02'], 'Zone': ['Ground', 'Ground'],
+                                                'AHU': ['AHU-01', 'AHU-01'], 'Floor area (m²)': [50.0, 20.0],
+                                                'Ceiling height (m)': [3.0, 2.5], 'Occupancy (people)': [4, 10],
+                                                'Air changes (/hour)': [6.0, 2.0], 'Air per person (l/s)': [10, 12]}))
+        self.assertEqual(run_batch('rooms', source, self.path('out.csv'), workers=1), 2)
+        result = pd.read_csv(self.path('out.csv'))
+        self.assertEqual(result['Governing requirement'].tolist(), ['Air changes', 'Occupancy'])
+        self.assertAlmostEqual(result['Volume flow rate (m³/s)'][1], 0.12)
+
+    def test_pipes_in_parallel_chunks(self):
+        rng = np.random.default_rng(0)
+        source = self.write_input(pd.DataFrame({
+            'Material': rng.choice(['HEAVY GRADE STEEL', 'COPPER (OLD TABLE X)'], 200),
+            'Flow rate (l/s)': rng.uniform(0.05, 10, 200)}))
+        options = {'max_velocity': 1.5, 'max_pressure_drop': 250}
+        run_batch('pipes', source, self.path('serial.parquet'), options, workers=1)
+        run_batch('pipes', source, self.path('parallel.parquet'), options, workers=2, chunk_size=30)
+        serial = pd.read_parquet(self.path('serial.parquet'))
+        pd.testing.assert_frame_equal(pd.read_parquet(self.path('parallel.parquet')), serial)
+        self.assertTrue((serial['Pressure drop (Pa/m)'] <= 250).all())
+        self.assertTrue((serial['Velocity (m/s)'] <= 1.5).all())
+
+    def test_empty_schedule_writes_header(self):
+        source = self.write_input(pd.DataFrame({'Air volume (m³/s)': []}))
+        self.assertEqual(run_batch('ducts', source, self.path('out.csv'), workers=1), 0)
+        self.assertIn('Diameter (mm)', pd.read_csv(self.path('out.csv')).columns)
+
+    def test_errors(self):
+        source = self.write_input(pd.DataFrame({'Material': ['UNOBTAINIUM'], 'Flow rate (l/s)': [1.0]}))
+        with self.assertRaises(ScheduleError):
+            run_batch('pipes', source, self.path('out.csv'), {'max_velocity': 1.5}, workers=1)
+        with self.assertRaises(ScheduleError):
+            run_batch('ducts', source, self.path('out.csv'), workers=1)
+        with self.assertRaises(ValueError):
+            run_batch('pipes', source, self.path('out.csv'), workers=1)  # No limits
+        with self.assertRaises(ValueError):
+            run_batch('ducts', source, self.path('out.csv'), {'glycol_percentage': 30})
+        with self.assertRaises(ValueError):
+            run_batch('ducts', source, self.path('out.xlsx'))
+        with self.assertRaises(ValueError):
+            run_batch('boilers', source, self.path('out.csv'))
+
+    def test_run_chunk_keeps_input_columns(self):
+        columns = {'Air volume (m³/s)': np.array([0.5])}
+        arguments = {'air_density': 1.2, 'max_velocity': 5.0, 'max_dimension': None}
+        result = run_chunk('ducts', columns, arguments)
+        self.assertEqual(list(result.columns[:1]), list(BATCH_JOBS['ducts']['columns']))
+        self.assertEqual(result['Width (mm)'][0], result['Height (mm)'][0])
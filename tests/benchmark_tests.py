@@ -0,0 +1,36 @@
+import unittest
+
+from benchmarks.processing_benchmarks import BENCHMARKS, run_benchmarks, compare_results
+
+
+def make_run(best_times, hot=True):
+    return {'results': {key: {'best (s)': best, 'hot': hot} for key, best in best_times.items()}}
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_cases_registered(self):
+        for name in ['Glycol-water properties (table)', 'Darcy friction factor (Colebrook)', 'Excel export',
+                     'Psychrometric chart', 'Calorifier PDF']:
+            self.assertIn(name, BENCHMARKS)
+
+    def test_run_records_each_size(self):
+        results = run_benchmarks(cases=['Expansion factor'], sizes=['scalar', '1k'], repeat=1, log=lambda _: None)
+        self.assertEqual(list(results['results']), ['Expansion factor [scalar]', 'Expansion factor [1k]'])
+        result = results['results']['Expansion factor [1k]']
+        self.assertEqual(result['elements'], 1000)
+        self.assertGreater(result['best (s)'], 0)
+        self.assertIn('python', results['metadata'])
+
+    def test_regression_over_threshold(self):
+        baseline = make_run({'a [1k]': 1.0, 'b [1k]': 1.0})
+        current = make_run({'a [1k]': 1.3, 'b [1k]': 1.1, 'c [1k]': 5.0})
+        regressions = compare_results(current, baseline, threshold=20)
+        self.assertEqual([regression['benchmark'] for regression in regressions], ['a [1k]'])
+        self.assertAlmostEqual(regressions[0]['change (%)'], 30)
+
+    def test_only_hot_paths_checked_by_default(self):
+        baseline = make_run({'a [1k]': 1.0}, hot=False)
+        current = make_run({'a [1k]': 2.0}, hot=False)
+        self.assertEqual(compare_results(current, baseline, threshold=20), [])
+        self.assertEqual(len(compare_results(current, baseline, threshold=20, hot_only=False)), 1)
@@ -0,0 +1,111 @@
+import io
+import time
+import unittest
+import numpy as np
+import pandas as pd
+
+from processing.duct_network import DuctNetwork, read_duct_schedule, fittings_k_factor, DUCT_FITTINGS
+from processing.schedules import ScheduleError
+from processing.ventilation_processing import (calculate_duct_velocity, calculate_round_duct_area,
+                                               calculate_rect_duct_area, calculate_hydraulic_diameter,
+                                               calculate_pressure_loss)
+
+DENSITY = 1.2
+
+#      0 (600 x 400)
+#     / \
+#    1   2 (315 dia, 400 x 200)
+#    |
+#    3 (200 dia)
+SCHEDULE = pd.DataFrame({
+    'Section': ['Main', 'A', 'B', 'A1'],
+    'Upstream section': [None, 'Main', 'Main', 'A'],
+    'Length (m)': [10.0, 5.0, 8.0, 3.0],
+    'Diameter (mm)': [None, 315, None, 200],
+    'Width (mm)': [600, None, 400, None],
+    'Height (mm)': [400, None, 200, None],
+    'Bend 90° (round)': [None, 2, None, 1],
+    'Fire damper (open)': [1, None, None, None],
+    'K factor': [None, None, 0.5, None],
+    'Terminal flow (m³/s)': [None, 0.3, 0.4, 0.1],
+    'Terminal pressure loss (Pa)': [None, None, 30, 25],
+})
+
+
+def upload(df, name='ducts.csv'):
+    source = io.BytesIO(df.to_csv(index=False).encode('utf-8'))
+    source.name = name
+    return source
+
+
+class TestDuctNetwork(unittest.TestCase):
+
+    def test_section_pressure_losses(self):
+        columns = read_duct_schedule(upload(SCHEDULE))
+        self.assertEqual(columns['Parent'].tolist(), [-1, 0, 0, 1])
+        np.testing.assert_allclose(columns['K factor'], [0.2, 0.4, 0.5, 0.2])
+
+        results = DuctNetwork.from_schedule(columns).solve(DENSITY, margin=0.1, plant_pressure_loss=200)
+        np.testing.assert_allclose(results['Flow rate (m³/s)'], [0.8, 0.4, 0.4, 0.1])
+
+        # The same as the single duct calculations, rectangular sections on the hydraulic diameter
+        area, _ = calculate_rect_duct_area(200, 400)
+        velocity = calculate_duct_velocity(area, 0.4)
+        expected = (calculate_pressure_loss(calculate_hydraulic_diameter(400, 200), DENSITY, velocity) * 8
+                    + 0.5 * 0.5 * DENSITY * velocity ** 2)
+        self.assertAlmostEqual(results['Section pressure loss (Pa)'][2], expected, places=6)
+        velocity = calculate_duct_velocity(calculate_round_duct_area(315), 0.4)
+        self.assertAlmostEqual(results['Velocity (m/s)'][1], velocity)
+
+        # B's terminal makes it the index run, even though A1 is further from the fan
+        self.assertEqual(results['Index run'].tolist(), [0, 2])
+        index_loss = results['Cumulative pressure loss (Pa)'][2] + 30
+        self.assertAlmostEqual(results['Index run pressure loss (Pa)'], index_loss)
+        self.assertAlmostEqual(results['Fan static pressure (Pa)'], (index_loss + 200) * 1.1)
+
+    def test_section_without_flow(self):
+        network = DuctNetwork([-1, 0, 0], length=10, diameter=250, terminal_flow=[0, 0.2, 0])
+        results = network.solve(DENSITY)
+        self.assertEqual(results['Section pressure loss (Pa)'][2], 0)
+        self.assertEqual(results['Index run'].tolist(), [0, 1])
+
+    def test_diffusers_in_series(self):
+        # A diffuser part way along the duct, with a larger pressure loss than the one at the end
+        network = DuctNetwork([-1, 0], length=5, diameter=250, terminal_flow=[0.1, 0.1],
+                              terminal_pressure_loss=[80, 10])
+        results = network.solve(DENSITY)
+        self.assertEqual(results['Index run'].tolist(), [0])
+        self.assertAlmostEqual(results['Index run pressure loss (Pa)'],
+                               results['Cumulative pressure loss (Pa)'][0] + 80)
+        self.assertAlmostEqual(results['Fan static pressure (Pa)'], results['Index run pressure loss (Pa)'])
+
+    def test_fittings_k_factor(self):
+        k_factor = fittings_k_factor({'Tee (branch)': [1, 0], 'Bend 45° (round)': [2, np.nan]}, 2)
+        np.testing.assert_allclose(k_factor, [DUCT_FITTINGS['Tee (branch)'] + 2 * DUCT_FITTINGS['Bend 45° (round)'], 0])
+
+    def test_bad_schedules(self):
+        with self.assertRaises(ScheduleError):
+            read_duct_schedule(upload(SCHEDULE.assign(**{'Upstream section': [None, 'Main', 'Mian', 'A']})))
+        with self.assertRaises(ScheduleError):
+            read_duct_schedule(upload(SCHEDULE.assign(Section=['Main', 'A', 'A', 'A1'])))
+        with self.assertRaises(ScheduleError):
+            read_duct_schedule(upload(SCHEDULE.drop(columns=['Diameter (mm)', 'Width (mm)'])))
+        with self.assertRaises(ScheduleError) as context:
+            read_duct_schedule(upload(SCHEDULE.drop(columns='Upstream section')))
+        self.assertEqual(context.exception.missing_columns, ['Upstream section'])
+        # A section with no size, and sections that loop back on themselves
+        with self.assertRaises(ValueError):
+            DuctNetwork.from_schedule(read_duct_schedule(upload(SCHEDULE.assign(**{'Width (mm)': None}))))
+        with self.assertRaises(ValueError):
+            DuctNetwork([1, 0], length=5, diameter=200)
+
+    def test_large_network(self):
+        n = 50000
+        rng = np.random.default_rng(0)
+        parent = np.concatenate(([-1], (rng.random(n - 1) * np.arange(1, n)).astype(np.int64)))
+        network = DuctNetwork(parent, length=5, width=800, height=400, k_factor=0.3,
+                              terminal_flow=rng.random(n) * 0.001)
+        start = time.perf_counter()
+        results = network.solve(DENSITY, friction_model='Haaland')
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertAlmostEqual(results['Flow rate (m³/s)'][0], network.terminal_flow.sum(), places=6)
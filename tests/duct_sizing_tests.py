@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+import numpy as np
+
+from processing import duct_sizing
+from processing.duct_catalog import DuctCatalog, get_duct_catalog
+from processing.duct_sizing import size_round_ducts, size_rect_ducts
+from processing.ventilation_processing import (calculate_round_duct_area, calculate_rect_duct_area,
+                                               calculate_duct_velocity, calculate_pressure_loss,
+                                               calculate_aspect_ratio)
+
+CATALOG = DuctCatalog(round_diameters=[200, 100, 150, 250], rect_sides=[100, 200, 300, 400, 600])
+DENSITY = 1.2
+
+
+class TestDuctCatalog(unittest.TestCase):
+
+    def test_candidates_in_order(self):
+        np.testing.assert_array_equal(CATALOG.diameter, [100, 150, 200, 250])
+        self.assertTrue(np.all(CATALOG.width >= CATALOG.height))
+        area = CATALOG.width * CATALOG.height
+        self.assertTrue(np.all(np.diff(area) >= 0))
+        # 600 x 200 and 400 x 300 have the same area, the squarer one comes first
+        first = np.flatnonzero(area == 120000)[0]
+        self.assertEqual((CATALOG.width[first], CATALOG.height[first]), (400, 300))
+
+    def test_shared_catalog_uses_standard_sizes(self):
+        self.assertIs(get_duct_catalog(), get_duct_catalog())
+        self.assertIn(315, get_duct_catalog().diameter)
+
+
+class TestSizeDucts(unittest.TestCase):
+
+    def test_round_matches_brute_force(self):
+        air_volumes = np.array([0.02, 0.1, 0.15, 0.2, 0.3])
+        results = size_round_ducts(air_volumes, DENSITY, max_velocity=4.0, max_pressure_drop=1.0, catalog=CATALOG)
+        for air_volume, diameter in zip(air_volumes, results['Diameter (mm)']):
+            expected = np.nan
+            for candidate in [100, 150, 200, 250]:
+                velocity = calculate_duct_velocity(calculate_round_duct_area(candidate), air_volume)
+                if velocity <= 4.0 and calculate_pressure_loss(candidate, DENSITY, velocity) <= 1.0:
+                    expected = candidate
+                    break
+            np.testing.assert_equal(diameter, expected)
+
+    def test_rect_matches_brute_force(self):
+        air_volumes = np.array([0.05, 0.2, 0.4, 0.9, 5.0])
+        results = size_rect_ducts(air_volumes, DENSITY, max_velocity=5.0, max_aspect_ratio=2, max_depth=300,
+                                  catalog=CATALOG)
+        sides = [100, 200, 300, 400, 600]
+        for i, air_volume in enumerate(air_volumes):
+            acceptable = []
+            for width in sides:
+                for height in sides:
+                    area, _ = calculate_rect_duct_area(height, width)
+                    if (height <= width and height <= 300 and calculate_aspect_ratio(width, height) <= 2
+                            and calculate_duct_velocity(area, air_volume) <= 5.0):
+                        acceptable.append((area, calculate_aspect_ratio(width, height), width, height))
+            if acceptable:
+                _, _, width, height = min(acceptable)
+                self.assertEqual((results['Width (mm)'][i], results['Height (mm)'][i]), (width, height))
+            else:
+                self.assertTrue(np.isnan(results['Width (mm)'][i]))
+                self.assertTrue(np.isnan(results['Velocity (m/s)'][i]))
+
+    def test_fixed_width(self):
+        # 400 x 200 is the smallest size for 0.4 m³/s, fixing the width at 300 gives 300 x 300 instead
+        results = size_rect_ducts([0.4], DENSITY, max_velocity=5.0, catalog=CATALOG)
+        self.assertEqual((results['Width (mm)'][0], results['Height (mm)'][0]), (400, 200))
+        results = size_rect_ducts([0.4], DENSITY, max_velocity=5.0, max_width=300, catalog=CATALOG)
+        self.assertEqual((results['Width (mm)'][0], results['Height (mm)'][0]), (300, 300))
+
+    def test_density_per_flow_and_chunks(self):
+        air_volumes = np.linspace(0.01, 0.3, 25)
+        densities = np.linspace(1.0, 1.3, 25)
+        expected = size_rect_ducts(air_volumes, densities, max_pressure_drop=1.5, catalog=CATALOG)
+        with mock.patch.object(duct_sizing, 'SIZING_CHUNK', 4):
+            chunked = size_rect_ducts(air_volumes, densities, max_pressure_drop=1.5, catalog=CATALOG)
+        for name in expected:
+            np.testing.assert_array_equal(chunked[name], expected[name])
+
+    def test_nothing_fits(self):
+        results = size_rect_ducts([0.1], DENSITY, max_velocity=5.0, max_aspect_ratio=1, max_depth=50,
+                                  catalog=CATALOG)
+        self.assertTrue(np.isnan(results['Width (mm)'][0]))
+        results = size_round_ducts([], DENSITY, max_velocity=5.0, catalog=CATALOG)
+        self.assertEqual(len(results['Diameter (mm)']), 0)
@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+
+from processing.entry_store import EntryStore, get_entry_store
+
+COLUMNS = {'Material': object, 'Nominal diameter (mm)': float, 'Length (m)': float}
+
+
+class TestEntryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = EntryStore(COLUMNS, total_columns=['Length (m)'], capacity=2)
+
+    def test_append_grows_capacity(self):
+        for i in range(10):
+            self.store.append('Copper', 15 + i, 1.5)
+        self.assertEqual(len(self.store), 10)
+        np.testing.assert_array_equal(self.store.column('Nominal diameter (mm)'), np.arange(15, 25))
+        self.assertEqual(self.store.column('Nominal diameter (mm)').dtype, float)
+        self.assertEqual(self.store.totals, {'Length (m)': 15.0})
+
+    def test_append_wrong_number_of_values(self):
+        with self.assertRaises(ValueError):
+            self.store.append('Copper', 15)
+
+    def test_extend(self):
+        self.store.append('Steel', 50, 2.0)
+        self.store.extend({'Material': np.array(['Copper', 'Copper'], dtype=object),
+                           'Nominal diameter (mm)': np.array([15, 22]), 'Length (m)': np.array([1.0, 3.0])})
+        self.assertEqual(self.store.column('Material').tolist(), ['Steel', 'Copper', 'Copper'])
+        self.assertEqual(self.store.totals['Length (m)'], 6.0)
+
+    def test_extend_uneven_columns(self):
+        with self.assertRaises(ValueError):
+            self.store.extend({'Material': ['Copper'], 'Nominal diameter (mm)': [15, 22], 'Length (m)': [1.0]})
+
+    def test_dataframe_cached_until_changed(self):
+        self.store.append('Copper', 15, 1.0)
+        df = self.store.to_dataframe()
+        self.assertIs(self.store.to_dataframe(), df)
+        self.assertEqual(list(df.columns), list(COLUMNS))
+
+        self.store.append('Copper', 22, 2.0)
+        changed = self.store.to_dataframe()
+        self.assertIsNot(changed, df)
+        self.assertEqual(len(changed), 2)
+        # The earlier view isn't affected by later entries
+        self.assertEqual(len(df), 1)
+
+    def test_cached_values(self):
+        calls = []
+        build = lambda: calls.append(1) or len(calls)
+        self.assertEqual(self.store.cached('export', build), 1)
+        self.assertEqual(self.store.cached('export', build), 1)
+        self.store.append('Copper', 15, 1.0)
+        self.assertEqual(self.store.cached('export', build), 2)
+
+    def test_clear(self):
+        self.store.append('Copper', 15, 1.0)
+        self.store.clear()
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store.totals, {'Length (m)': 0.0})
+        self.assertTrue(self.store.to_dataframe().empty)
+
+    def test_column_is_read_only(self):
+        self.store.append('Copper', 15, 1.0)
+        with self.assertRaises(ValueError):
+            self.store.column('Length (m)')[0] = 5.0
+
+
+class TestGetEntryStore(unittest.TestCase):
+
+    def test_created_once(self):
+        state = {}
+        store = get_entry_store(state, 'pipe_entries', COLUMNS)
+        self.assertIs(get_entry_store(state, 'pipe_entries', COLUMNS), store)
+
+    def test_replaced_when_columns_differ(self):
+        # e.g. a list left over from an older session, or another page's entries under the same key
+        state = {'pipe_entries': [('Copper', 15, 13.6)]}
+        store = get_entry_store(state, 'pipe_entries', COLUMNS)
+        self.assertIsInstance(store, EntryStore)
+        other = get_entry_store(state, 'pipe_entries', {'Material': object, 'Velocity (m/s)': float})
+        self.assertIsNot(other, store)
+        self.assertIs(state['pipe_entries'], other)
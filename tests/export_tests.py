@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from io import BytesIO
+import numpy as np
+import pandas as pd
+
+from processing.export import (iter_chunks, write_excel, dataframe_to_excel, dataframe_to_csv,
+                               dataframe_to_parquet, export_dataframe)
+
+
+def make_schedule(n=25):
+    return pd.DataFrame({
+        'Material': ['Copper'] * n,
+        'Nominal diameter (mm)': np.arange(n) % 5 * 5 + 15,
+        'Velocity (m/s)': np.linspace(0.1, 1.5, n),
+    })
+
+
+class TestExcelExport(unittest.TestCase):
+
+    def test_round_trip(self):
+        df = make_schedule()
+        result = pd.read_excel(BytesIO(dataframe_to_excel({'Pipe Data': df}, chunk_size=7)))
+        pd.testing.assert_frame_equal(result, df)
+
+    def test_multiple_sheets(self):
+        df = make_schedule()
+        totals = pd.DataFrame({'Total length (m)': [12.5]})
+        inputs = pd.DataFrame({'Input': ['Fluid'], 'Value': ['Water']})
+        sheets = pd.read_excel(BytesIO(dataframe_to_excel({'Schedule': df, 'Totals': totals, 'Inputs': inputs})),
+                               sheet_name=None)
+        self.assertEqual(list(sheets), ['Schedule', 'Totals', 'Inputs'])
+        pd.testing.assert_frame_equal(sheets['Totals'], totals)
+        pd.testing.assert_frame_equal(sheets['Inputs'], inputs)
+
+    def test_chunk_iterator(self):
+        df = make_schedule(30)
+        # A generator is consumed once, so the whole schedule never needs to be held at the same time
+        chunks = (df.iloc[start:start + 10] for start in range(0, 30, 10))
+        result = pd.read_excel(BytesIO(dataframe_to_excel({'Pipe Data': chunks})))
+        pd.testing.assert_frame_equal(result, df)
+
+    def test_missing_values_left_blank(self):
+        df = pd.DataFrame({'Name': ['A', None, 'C'], 'Value': [1.0, np.nan, np.inf]})
+        result = pd.read_excel(BytesIO(dataframe_to_excel({'Data': df})))
+        self.assertTrue(result['Name'].isna()[1])
+        self.assertTrue(result['Value'].isna()[1:].all())
+
+    def test_empty_dataframe_writes_header(self):
+        df = make_schedule().iloc[:0]
+        result = pd.read_excel(BytesIO(dataframe_to_excel({'Data': df})))
+        self.assertEqual(list(result.columns), list(df.columns))
+        self.assertEqual(len(result), 0)
+
+    def test_write_to_file(self):
+        df = make_schedule()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'schedule.xlsx')
+            write_excel({'Pipe Data': df}, path)
+            pd.testing.assert_frame_equal(pd.read_excel(path), df)
+
+
+class TestOtherFormats(unittest.TestCase):
+
+    def test_iter_chunks(self):
+        df = make_schedule(25)
+        self.assertEqual([len(chunk) for chunk in iter_chunks(df, 10)], [10, 10, 5])
+
+    def test_csv_round_trip(self):
+        df = make_schedule()
+        pd.testing.assert_frame_equal(pd.read_csv(BytesIO(dataframe_to_csv(df, chunk_size=7))), df)
+
+    def test_parquet_round_trip(self):
+        df = make_schedule()
+        result = pd.read_parquet(BytesIO(dataframe_to_parquet(df, chunk_size=7)))
+        pd.testing.assert_frame_equal(result, df, check_dtype=False)
+
+    def test_parquet_mixed_types_written_as_text(self):
+        df = make_schedule(3)
+        df.loc['Total'] = ['', '', df['Velocity (m/s)'].sum()]
+        result = pd.read_parquet(BytesIO(dataframe_to_parquet(df)))
+        self.assertEqual(result['Nominal diameter (mm)'].tolist(), ['15', '20', '25', ''])
+
+    def test_export_dataframe(self):
+        df = make_schedule()
+        for export_format, expected_extension in [('Excel', '.xlsx'), ('CSV', '.csv'), ('Parquet', '.parquet')]:
+            data, extension, mime = export_dataframe(df, export_format)
+            self.assertEqual(extension, expected_extension)
+            self.assertIsInstance(data, bytes)
+            self.assertTrue(mime)
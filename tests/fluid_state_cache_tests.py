@@ -0,0 +1,43 @@
+import unittest
+from pyfluids import Fluid, FluidsList, Input
+
+from processing.fluid_state_cache import FluidStateCache
+
+
+class TestFluidStateCache(unittest.TestCase):
+
+    def test_matches_pyfluids(self):
+        cache = FluidStateCache()
+        fluid = Fluid(FluidsList.Water)
+        fluid.update(Input.temperature(50), Input.pressure(101325))
+        self.assertAlmostEqual(cache.get_state(FluidsList.Water, 50, 101325).density, fluid.density, places=6)
+
+    def test_hits_and_misses(self):
+        cache = FluidStateCache()
+        first = cache.get_state(FluidsList.Air, 20, 101325)
+        # Differences smaller than the quantisation step reuse the same state
+        second = cache.get_state(FluidsList.Air, 20.001, 101325.2)
+        self.assertIs(first, second)
+        cache.get_state(FluidsList.Water, 20, 101325)
+        self.assertEqual(cache.info()['hits'], 1)
+        self.assertEqual(cache.info()['misses'], 2)
+
+    def test_lru_eviction(self):
+        cache = FluidStateCache(maxsize=2)
+        cache.get_state(FluidsList.Air, 10, 101325)
+        cache.get_state(FluidsList.Air, 20, 101325)
+        # Touch the 10°C state so the 20°C one becomes least recently used
+        cache.get_state(FluidsList.Air, 10, 101325)
+        cache.get_state(FluidsList.Air, 30, 101325)
+        self.assertEqual(cache.info()['currsize'], 2)
+        cache.get_state(FluidsList.Air, 10, 101325)
+        self.assertEqual(cache.info()['hits'], 2)
+        cache.get_state(FluidsList.Air, 20, 101325)
+        self.assertEqual(cache.info()['misses'], 4)
+
+    def test_set_maxsize(self):
+        cache = FluidStateCache(maxsize=4)
+        for temperature in range(4):
+            cache.get_state(FluidsList.Air, temperature, 101325)
+        cache.set_maxsize(1)
+        self.assertEqual(cache.info()['currsize'], 1)
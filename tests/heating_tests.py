@@ -1,4 +1,8 @@
 import unittest
+import math
+import warnings
+import numpy as np
+import pandas as pd
 
 from processing.heating_processing import (calculate_reheat_time,
                                                   calculate_coil_size,
@@ -205,3 +209,141 @@ class TestThermalCalculations(unittest.TestCase):
         expected_flow_rate = expected_mass_flow_rate / density  # m³/s
         self.assertAlmostEqual(calculate_flow_rate(delta_t, heat_transfer, cp_metric, density),
                                expected_flow_rate, places=2)
+
+
+class TestPipeHydraulics(unittest.TestCase):
+
+    def test_friction_factor_array_matches_scalar(self):
+        from processing.heating_processing import (calculate_darcy_friction_factor,
+                                                   calculate_darcy_friction_factor_array)
+        reynolds_numbers = np.array([1e2, 1500, 5000, 5e4, 1e6])
+        eq_roughness = 0.046  # mm
+        int_diameter = 27.4  # mm
+        result = calculate_darcy_friction_factor_array(reynolds_numbers, eq_roughness, int_diameter)
+        for Re, f in zip(reynolds_numbers, result):
+            self.assertAlmostEqual(f, calculate_darcy_friction_factor(Re, eq_roughness, int_diameter), places=9)
+
+    def test_pipe_hydraulics_matches_scalar(self):
+        from processing.heating_processing import (calculate_pipe_hydraulics,
+                                                   calculate_reynolds_number,
+                                                   calculate_darcy_friction_factor,
+                                                   calculate_pressure_drop_per_meter)
+        flow_rates = np.array([0.0001, 0.0005, 0.002])  # m³/s
+        int_diameters = np.array([0.0162, 0.0274, 0.0531])  # m
+        eq_roughness = 0.046e-3  # m
+        density, viscosity = 988.0, 0.000547
+        results = calculate_pipe_hydraulics(flow_rates, int_diameters, eq_roughness, density, viscosity)
+
+        for i, (flow_rate, int_diameter) in enumerate(zip(flow_rates, int_diameters)):
+            velocity = flow_rate / (math.pi * (int_diameter / 2) ** 2)
+            reynolds_number = calculate_reynolds_number(velocity, int_diameter, density, viscosity)
+            f = calculate_darcy_friction_factor(reynolds_number, eq_roughness, int_diameter)
+            pressure_drop = calculate_pressure_drop_per_meter(f, density, velocity, int_diameter)
+            self.assertAlmostEqual(results['Velocity (m/s)'][i], velocity, places=9)
+            self.assertAlmostEqual(results['Reynolds number'][i], reynolds_number, delta=1e-6)
+            self.assertAlmostEqual(results['Pressure drop (Pa/m)'][i], pressure_drop, delta=1e-6)
+            self.assertAlmostEqual(results['Velocity pressure (Pa)'][i], 0.5 * density * velocity ** 2, places=6)
+
+    def test_pipe_schedule_dataframe(self):
+        from processing.heating_processing import calculate_pipe_schedule
+        df = pd.DataFrame({'Flow rate (L/s)': [0.5, 1.0],
+                           'Internal diameter (mm)': [27.4, 36.1],
+                           'Equivalent roughness (mm)': [0.046, 0.046],
+                           'Density (kg/m³)': [988.0, 988.0],
+                           'Viscosity (Pa.s)': [0.000547, 0.000547]})
+        result = calculate_pipe_schedule(df)
+        self.assertEqual(len(result), 2)
+        self.assertIn('Pressure drop (Pa/m)', result.columns)
+        self.assertTrue((result['Pressure drop (Pa/m)'] > 0).all())
+
+    def test_pipe_schedule_zero_flow(self):
+        from processing.heating_processing import calculate_pipe_schedule
+        df = pd.DataFrame({'Flow rate (L/s)': [0.0, 1.0],
+                           'Internal diameter (mm)': [27.4, 36.1],
+                           'Equivalent roughness (mm)': [0.046, 0.046],
+                           'Density (kg/m³)': [988.0, 988.0],
+                           'Viscosity (Pa.s)': [0.000547, 0.000547]})
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            result = calculate_pipe_schedule(df)
+        self.assertEqual(result['Pressure drop (Pa/m)'][0], 0)
+        self.assertEqual(result['Velocity (m/s)'][0], 0)
+        self.assertTrue(np.isnan(result['Darcy friction factor'][0]))
+        self.assertGreater(result['Pressure drop (Pa/m)'][1], 0)
+
+    def test_pipe_schedule_friction_model(self):
+        from processing.heating_processing import calculate_pipe_schedule, calculate_pipe_hydraulics
+        df = pd.DataFrame({'Flow rate (L/s)': [0.5, 1.0],
+                           'Internal diameter (mm)': [27.4, 36.1],
+                           'Equivalent roughness (mm)': [0.046, 0.046],
+                           'Density (kg/m³)': [988.0, 988.0],
+                           'Viscosity (Pa.s)': [0.000547, 0.000547]})
+        colebrook = calculate_pipe_schedule(df)['Pressure drop (Pa/m)'].to_numpy()
+        haaland = calculate_pipe_schedule(df, friction_model='Haaland')['Pressure drop (Pa/m)'].to_numpy()
+        self.assertFalse(np.allclose(colebrook, haaland, rtol=1e-6))
+        np.testing.assert_allclose(haaland, colebrook, rtol=0.05)
+        expected = calculate_pipe_hydraulics(df['Flow rate (L/s)'].to_numpy() / 1000,
+                                             df['Internal diameter (mm)'].to_numpy() / 1000,
+                                             df['Equivalent roughness (mm)'].to_numpy() / 1000,
+                                             988.0, 0.000547, 'Haaland')['Pressure drop (Pa/m)']
+        np.testing.assert_allclose(haaland, expected)
+
+
+class TestExpansionFactor(unittest.TestCase):
+
+    def test_tabulated_value(self):
+        from processing.heating_processing import calculate_expansion_factor
+        self.assertAlmostEqual(calculate_expansion_factor(80), 0.029, places=6)
+
+    def test_interpolated_value(self):
+        from processing.heating_processing import calculate_expansion_factor
+        self.assertAlmostEqual(calculate_expansion_factor(85), (0.029 + 0.0363) / 2, places=6)
+
+    def test_extrapolation_at_both_ends(self):
+        from processing.heating_processing import calculate_expansion_factor
+        # Below 40°C and above 200°C the first and last segments are extended
+        self.assertAlmostEqual(calculate_expansion_factor(30), 0.0079 - (0.0121 - 0.0079), places=6)
+        self.assertAlmostEqual(calculate_expansion_factor(210), 0.157 + (0.157 - 0.142), places=6)
+
+    def test_vectorised(self):
+        from processing.heating_processing import calculate_expansion_factor, expansion_factor
+        temps = np.array([30.0, 45.0, 80.0, 210.0])
+        np.testing.assert_allclose(expansion_factor(temps), [calculate_expansion_factor(t) for t in temps])
+
+
+class TestFrictionModels(unittest.TestCase):
+
+    def test_explicit_models_match_fluids(self):
+        from fluids.friction import Swamee_Jain_1976, Haaland, Serghides_1
+        from processing.heating_processing import (swamee_jain_friction_factor, haaland_friction_factor,
+                                                   serghides_friction_factor)
+        for Re, eD in [(5000, 1e-5), (1e5, 1e-3), (1e7, 0.01)]:
+            # Fluids rounds some of the constants differently
+            np.testing.assert_allclose(swamee_jain_friction_factor(Re, eD), Swamee_Jain_1976(Re, eD), rtol=1e-5)
+            np.testing.assert_allclose(haaland_friction_factor(Re, eD), Haaland(Re, eD), rtol=1e-5)
+            np.testing.assert_allclose(serghides_friction_factor(Re, eD), Serghides_1(Re, eD), rtol=1e-5)
+
+    def test_explicit_models_close_to_colebrook(self):
+        from processing.heating_processing import calculate_darcy_friction_factor_array
+        Re = np.array([1000.0, 1e4, 1e5, 1e6])
+        exact = calculate_darcy_friction_factor_array(Re, 0.046, 28.0)
+        for friction_model in ['Swamee-Jain', 'Haaland', 'Serghides']:
+            approximate = calculate_darcy_friction_factor_array(Re, 0.046, 28.0, friction_model)
+            # Laminar flow doesn't depend on the model
+            self.assertEqual(approximate[0], exact[0])
+            np.testing.assert_allclose(approximate, exact, rtol=0.04)
+
+    def test_unknown_model(self):
+        from processing.heating_processing import calculate_darcy_friction_factor_array
+        with self.assertRaises(ValueError):
+            calculate_darcy_friction_factor_array(1e5, 0.046, 28.0, 'Moody')
+
+    def test_accuracy_report(self):
+        from processing.heating_processing import friction_model_accuracy
+        report = friction_model_accuracy('Haaland')
+        self.assertEqual(report['Friction model'], 'Haaland')
+        self.assertLess(report['Max relative error (%)'], 2)
+        self.assertLessEqual(report['Mean relative error (%)'], report['Max relative error (%)'])
+        self.assertLess(friction_model_accuracy('Colebrook')['Max relative error (%)'], 1e-6)
+        self.assertLess(friction_model_accuracy('Serghides')['Max relative error (%)'],
+                        friction_model_accuracy('Swamee-Jain')['Max relative error (%)'])
@@ -0,0 +1,63 @@
+import os
+import ast
+import sys
+import warnings
+import subprocess
+import unittest
+
+from benchmarks.import_time import (parse_importtime, module_imports, package_times, check_results,
+                                    processing_modules, LAZY_PACKAGES, REPOSITORY_DIRECTORY)
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       500 |        500 | site
+import time:      1000 |       1000 |     numpy.core
+import time:      2000 |       3000 |   numpy
+import time:       100 |        100 |   CoolProp.CoolProp
+import time:       400 |       3500 | processing.property_tables
+"""
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_parse(self):
+        imports = module_imports(parse_importtime(SAMPLE))
+        self.assertEqual([name for name, _, _, _ in imports],
+                         ['numpy.core', 'numpy', 'CoolProp.CoolProp', 'processing.property_tables'])
+        self.assertEqual(imports[0][3], 2)
+        self.assertAlmostEqual(imports[-1][2], 0.0035)
+        self.assertEqual(package_times(imports), {'numpy': 0.003, 'CoolProp': 0.0001, 'processing': 0.0035})
+
+    def test_check_results(self):
+        results = {'processing.a': {'cumulative (s)': 0.1, 'lazy packages loaded': ['CoolProp']},
+                   'processing.b': {'cumulative (s)': 0.3, 'lazy packages loaded': []}}
+        problems = check_results(results, max_seconds=0.2)
+        self.assertEqual(len(problems), 2)
+        self.assertIn('CoolProp', problems[0])
+
+    def test_processing_modules_load_backends_lazily(self):
+        modules = processing_modules()
+        code = (f"import sys\nimport {', '.join(modules)}\n"
+                f"print(','.join(package for package in {LAZY_PACKAGES!r} if package in sys.modules))")
+        result = subprocess.run([sys.executable, '-c', code], cwd=REPOSITORY_DIRECTORY, capture_output=True,
+                                text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_pages_import_pyfluids_lazily(self):
+        # PyFluids and CoolProp take seconds to load, so pages only import them in the tools that use them
+        pages_directory = os.path.join(REPOSITORY_DIRECTORY, 'pages')
+        for page in os.listdir(pages_directory):
+            if not page.endswith('.py'):
+                continue
+            # Some pages have LaTeX strings with invalid escape sequences, which aren't what's being tested
+            with open(os.path.join(pages_directory, page), encoding='utf-8') as file, warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                tree = ast.parse(file.read())
+            for node in tree.body:
+                if isinstance(node, ast.Import):
+                    names = [alias.name for alias in node.names]
+                elif isinstance(node, ast.ImportFrom):
+                    names = [node.module or '']
+                else:
+                    continue
+                for name in names:
+                    self.assertNotIn(name.split('.')[0], ['pyfluids', 'CoolProp'], page)
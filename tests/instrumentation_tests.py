@@ -0,0 +1,113 @@
+import os
+import json
+import tempfile
+import threading
+import unittest
+
+from processing import instrumentation
+from processing.instrumentation import timed, section, page_run, on_page_finished
+
+
+@timed()
+def add_one(x):
+    return x + 1
+
+
+@timed('Custom name')
+def fails():
+    raise ValueError('failed')
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.was_enabled = instrumentation.is_enabled()
+        self.log_path = instrumentation._log_path
+        instrumentation.reset()
+
+    def tearDown(self):
+        if self.was_enabled:
+            instrumentation.enable()
+        else:
+            instrumentation.disable()
+        instrumentation._log_path = self.log_path
+        instrumentation.reset()
+
+    def test_disabled_records_nothing(self):
+        instrumentation.disable()
+        self.assertEqual(add_one(1), 2)
+        with section('Block'):
+            pass
+        with page_run('Page') as run:
+            self.assertIsNone(run)
+        self.assertEqual(instrumentation.get_timings().records, {})
+
+    def test_decorator_records_calls(self):
+        instrumentation.enable()
+        for i in range(3):
+            add_one(i)
+        rows = instrumentation.get_timings().rows()
+        self.assertEqual(rows[0]['Name'], 'instrumentation_tests.add_one')
+        self.assertEqual(rows[0]['Calls'], 3)
+        self.assertGreaterEqual(rows[0]['Total (ms)'], rows[0]['Max (ms)'])
+        self.assertEqual(add_one.__name__, 'add_one')
+
+    def test_failed_calls_still_recorded(self):
+        instrumentation.enable()
+        with self.assertRaises(ValueError):
+            fails()
+        self.assertEqual(instrumentation.get_timings().records['Custom name'][0], 1)
+
+    def test_page_run_collects_its_own_timings(self):
+        instrumentation.enable()
+        finished = []
+        with page_run('Heating') as run:
+            on_page_finished(finished.append)
+            add_one(1)
+            with section('Table'):
+                add_one(2)
+        self.assertEqual(finished, [run])
+        self.assertGreater(run.wall_time, 0)
+        self.assertEqual(set(run.timings.records), {'instrumentation_tests.add_one', 'Table'})
+        self.assertEqual(run.timings.records['instrumentation_tests.add_one'][0], 2)
+        # Nothing leaks into the timings outside the run
+        self.assertEqual(instrumentation.get_timings().records, {})
+
+    def test_page_runs_are_per_thread(self):
+        instrumentation.enable()
+        runs = {}
+
+        def run_page(name, calls):
+            with page_run(name) as run:
+                for i in range(calls):
+                    add_one(i)
+            runs[name] = run
+
+        threads = [threading.Thread(target=run_page, args=(name, calls)) for name, calls in [('A', 2), ('B', 5)]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(runs['A'].timings.records['instrumentation_tests.add_one'][0], 2)
+        self.assertEqual(runs['B'].timings.records['instrumentation_tests.add_one'][0], 5)
+
+    def test_log_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, 'timings.jsonl')
+            instrumentation.enable(log_path)
+            with page_run('Ventilation'):
+                add_one(1)
+            # Runs ended by an exception (e.g. st.rerun) are logged but don't call the finished callbacks
+            finished = []
+            with self.assertRaises(RuntimeError):
+                with page_run('Ventilation'):
+                    on_page_finished(finished.append)
+                    raise RuntimeError('rerun')
+            self.assertEqual(finished, [])
+
+            with open(log_path) as file:
+                lines = [json.loads(line) for line in file]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0]['page'], 'Ventilation')
+        self.assertEqual(lines[0]['timings']['instrumentation_tests.add_one']['calls'], 1)
+        self.assertIn('wall time (s)', lines[1])
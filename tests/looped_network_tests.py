@@ -0,0 +1,58 @@
+import unittest
+import numpy as np
+
+from processing.heating_processing import calculate_pipe_hydraulics
+from processing.looped_network import LoopedPipeNetwork
+
+DENSITY = 988.0
+VISCOSITY = 0.000547
+
+
+class TestLoopedPipeNetwork(unittest.TestCase):
+
+    def test_parallel_pipes_share_flow(self):
+        network = LoopedPipeNetwork([0, 0], [1, 1], length=10, internal_diameter=27.4, eq_roughness=0.046,
+                                    fixed_pressure={0: 100000}, node_demand=[0, 1.0])
+        results = network.solve(DENSITY, VISCOSITY)
+        self.assertTrue(results['Converged'])
+        np.testing.assert_allclose(results['Flow rate (L/s)'], [0.5, 0.5])
+
+        hydraulics = calculate_pipe_hydraulics(0.5 / 1000, 0.0274, 0.046e-3, DENSITY, VISCOSITY)
+        expected_pressure_drop = float(hydraulics['Pressure drop (Pa/m)']) * 10
+        self.assertAlmostEqual(results['Pressure drop (Pa)'][0], expected_pressure_drop, places=4)
+        self.assertAlmostEqual(results['Node pressure (Pa)'][1], 100000 - expected_pressure_drop, places=4)
+
+    def test_ring_main(self):
+        # Plant at node 0 feeding a ring 0-1-2-3-0 with draw-offs at nodes 1, 2 and 3
+        network = LoopedPipeNetwork([0, 1, 2, 3], [1, 2, 3, 0], length=[30, 20, 25, 40],
+                                    internal_diameter=[54.0, 36.1, 36.1, 54.0], eq_roughness=0.046,
+                                    k_factor=[2, 0, 0, 1], fixed_pressure={0: 200000},
+                                    node_demand=[0, 0.8, 0.5, 1.2])
+        results = network.solve(DENSITY, VISCOSITY)
+        self.assertTrue(results['Converged'])
+        self.assertEqual(results['Iterations'], len(results['Flow residual']))
+
+        # Continuity at every node and no net pressure change around the loop
+        flows = results['Flow rate (L/s)']
+        np.testing.assert_allclose([flows[0] - flows[1], flows[1] - flows[2], flows[2] - flows[3]],
+                                   [0.8, 0.5, 1.2], atol=1e-9)
+        self.assertAlmostEqual(results['Pressure drop (Pa)'].sum(), 0, delta=1e-3)
+        # Pipe 3 runs into the plant, so its flow is negative
+        self.assertLess(flows[3], 0)
+
+    def test_grid_of_loops(self):
+        n = 30
+        nodes = np.arange(n * n).reshape(n, n)
+        start = np.concatenate((nodes[:, :-1].ravel(), nodes[:-1, :].ravel()))
+        end = np.concatenate((nodes[:, 1:].ravel(), nodes[1:, :].ravel()))
+        demand = np.full(n * n, 0.02)
+        demand[0] = 0
+        network = LoopedPipeNetwork(start, end, length=20, internal_diameter=54.0, eq_roughness=0.046,
+                                    fixed_pressure={0: 300000}, node_demand=demand)
+        results = network.solve(DENSITY, VISCOSITY)
+        self.assertTrue(results['Converged'])
+        self.assertLess(results['Continuity residual (L/s)'][-1], 1e-9)
+
+    def test_fixed_pressure_required(self):
+        with self.assertRaises(ValueError):
+            LoopedPipeNetwork([0], [1], length=10, internal_diameter=27.4, eq_roughness=0.046, fixed_pressure={})
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from processing import pipe_catalog
+from processing.pipe_catalog import PIPE_DATA_PATH, PipeCatalog, load_pipe_catalog
+
+
+class TestPipeCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = PipeCatalog(['COPPER', 'COPPER', 'STEEL'], ['EN 1057', 'EN 1057', 'EN 10255'],
+                                   [0.0015, 0.0015, 0.046], [22, 15, 15], [20.22, 13.6, 16.2])
+
+    def test_lookup(self):
+        self.assertEqual(self.catalog.lookup('COPPER', 15), (13.6, 0.0015))
+        self.assertIsNone(self.catalog.lookup('COPPER', 28))
+
+    def test_sorted_diameters(self):
+        self.assertEqual(self.catalog.nominal_diameters('COPPER').tolist(), [15, 22])
+        self.assertEqual(self.catalog.internal_diameters('COPPER').tolist(), [13.6, 20.22])
+
+    def test_materials_in_order(self):
+        self.assertEqual(self.catalog.materials, ['COPPER', 'STEEL'])
+        self.assertEqual(self.catalog.material_roughness('STEEL'), 0.046)
+
+
+class TestPipeCatalogCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source_path = os.path.join(self.directory, 'pipes.xlsx')
+        self.cache_path = os.path.join(self.directory, 'pipes.npz')
+        shutil.copy(PIPE_DATA_PATH, self.source_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cache_matches_workbook(self):
+        from_excel = load_pipe_catalog(self.source_path, self.cache_path)
+        self.assertTrue(os.path.exists(self.cache_path))
+        from_cache = load_pipe_catalog(self.source_path, self.cache_path)
+        self.assertEqual(from_cache.materials, from_excel.materials)
+        self.assertEqual(from_cache.lookup('HEAVY GRADE STEEL', 15), from_excel.lookup('HEAVY GRADE STEEL', 15))
+        self.assertEqual(from_cache.lookup('HEAVY GRADE STEEL', 15), (15.0, from_excel.material_roughness(
+            'HEAVY GRADE STEEL')))
+
+    def test_touched_workbook_reuses_cache(self):
+        load_pipe_catalog(self.source_path, self.cache_path)
+        # New modification time but same content, the hash check should keep the cache
+        os.utime(self.source_path, (0, 0))
+        with mock.patch.object(pipe_catalog.PipeCatalog, 'from_excel') as from_excel:
+            load_pipe_catalog(self.source_path, self.cache_path)
+        from_excel.assert_not_called()
+
+        # The cache now has the new modification time, so the next load doesn't hash the workbook
+        with mock.patch.object(pipe_catalog, '_file_hash') as file_hash:
+            catalog = load_pipe_catalog(self.source_path, self.cache_path)
+        file_hash.assert_not_called()
+        self.assertIn('HEAVY GRADE STEEL', catalog.materials)
+
+    def test_corrupt_cache_falls_back_to_workbook(self):
+        expected = load_pipe_catalog(self.source_path, self.cache_path)
+        # e.g. a write that was cut off part way
+        with open(self.cache_path, 'r+b') as file:
+            file.truncate(os.path.getsize(self.cache_path) // 2)
+        catalog = load_pipe_catalog(self.source_path, self.cache_path)
+        self.assertEqual(catalog.materials, expected.materials)
+        # The cache is rewritten, so the next load doesn't parse the workbook
+        with mock.patch.object(pipe_catalog.PipeCatalog, 'from_excel') as from_excel:
+            load_pipe_catalog(self.source_path, self.cache_path)
+        from_excel.assert_not_called()
+        self.assertEqual(sorted(os.listdir(self.directory)), ['pipes.npz', 'pipes.xlsx'])
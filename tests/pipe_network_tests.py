@@ -0,0 +1,103 @@
+import time
+import unittest
+import numpy as np
+
+from processing.heating_processing import calculate_pipe_hydraulics
+from processing.pipe_network import PipeNetwork
+from processing.tree_network import topological_order, accumulate_to_root, find_index_run
+
+
+class TestTreeNetwork(unittest.TestCase):
+
+    def test_topological_order_unordered(self):
+        # 2 is the root, 0 hangs off 1 which hangs off 2
+        parent = np.array([1, 2, -1])
+        self.assertEqual(topological_order(parent).tolist(), [2, 1, 0])
+
+    def test_loop_is_rejected(self):
+        with self.assertRaises(ValueError):
+            topological_order(np.array([-1, 2, 1]))
+        with self.assertRaises(ValueError):
+            topological_order(np.array([-1, 5]))
+
+    def test_accumulate_and_index_run(self):
+        #      0
+        #     / \
+        #    1   2
+        #   / \
+        #  3   4
+        parent = np.array([-1, 0, 0, 1, 1])
+        order = topological_order(parent)
+        flows = accumulate_to_root(parent, order, [0, 0, 1.0, 2.0, 3.0])
+        self.assertEqual(flows.tolist(), [6.0, 5.0, 1.0, 2.0, 3.0])
+
+        cumulative, run, total = find_index_run(parent, order, [10, 5, 20, 1, 2], terminal_values=[0, 0, 0, 0, 30])
+        self.assertEqual(cumulative.tolist(), [10, 15, 30, 16, 17])
+        self.assertEqual(run.tolist(), [0, 1, 4])
+        self.assertEqual(total, 47)
+
+    def test_terminal_part_way_along_a_run(self):
+        # Section 0 feeds a terminal of its own as well as section 1
+        parent = np.array([-1, 0])
+        order = topological_order(parent)
+        _, run, total = find_index_run(parent, order, [10, 5], terminal_values=[100, 1], terminals=[True, True])
+        self.assertEqual(run.tolist(), [0])
+        self.assertEqual(total, 110)
+
+    def test_empty_network(self):
+        parent = np.array([], dtype=np.int64)
+        cumulative, run, total = find_index_run(parent, topological_order(parent), [])
+        self.assertEqual((len(cumulative), len(run), total), (0, 0, 0.0))
+
+
+class TestPipeNetwork(unittest.TestCase):
+    DENSITY = 988.0
+    VISCOSITY = 0.000547
+
+    def test_segment_pressure_drops(self):
+        network = PipeNetwork(parent=[-1, 0, 0], length=[10, 5, 20], internal_diameter=[36.1, 27.4, 21.7],
+                              eq_roughness=0.046, k_factor=[1.5, 0, 2], terminal_flow=[0, 0.6, 0.3])
+        results = network.solve(self.DENSITY, self.VISCOSITY)
+        np.testing.assert_allclose(results['Flow rate (L/s)'], [0.9, 0.6, 0.3])
+
+        hydraulics = calculate_pipe_hydraulics(0.9 / 1000, 0.0361, 0.046e-3, self.DENSITY, self.VISCOSITY)
+        expected = hydraulics['Pressure drop (Pa/m)'] * 10 + 1.5 * hydraulics['Velocity pressure (Pa)']
+        self.assertAlmostEqual(results['Segment pressure drop (Pa)'][0], float(expected), places=6)
+
+        # The long, small branch is the index circuit
+        self.assertEqual(results['Index circuit'].tolist(), [0, 2])
+        self.assertAlmostEqual(results['Index circuit pressure drop (Pa)'],
+                               results['Cumulative pressure drop (Pa)'][2], places=6)
+
+    def test_emitter_on_a_through_segment(self):
+        # The emitter on segment 0 has a much larger pressure drop than the one at the end of segment 1
+        network = PipeNetwork(parent=[-1, 0], length=[10, 10], internal_diameter=[30, 30], eq_roughness=0.045,
+                              terminal_flow=[0.2, 0.2], terminal_pressure_drop=[30000, 1000])
+        results = network.solve(self.DENSITY, self.VISCOSITY)
+        self.assertEqual(results['Index circuit'].tolist(), [0])
+        self.assertAlmostEqual(results['Index circuit pressure drop (Pa)'],
+                               results['Cumulative pressure drop (Pa)'][0] + 30000, places=6)
+
+    def test_empty_network(self):
+        results = PipeNetwork(parent=[], length=10, internal_diameter=27.4, eq_roughness=0.046).solve(
+            self.DENSITY, self.VISCOSITY)
+        self.assertEqual(len(results['Index circuit']), 0)
+        self.assertEqual(results['Index circuit pressure drop (Pa)'], 0)
+
+    def test_segment_without_flow(self):
+        network = PipeNetwork(parent=[-1, 0, 0], length=10, internal_diameter=27.4, eq_roughness=0.046,
+                              terminal_flow=[0, 0.5, 0])
+        results = network.solve(self.DENSITY, self.VISCOSITY)
+        self.assertEqual(results['Segment pressure drop (Pa)'][2], 0)
+        self.assertEqual(results['Index circuit'].tolist(), [0, 1])
+
+    def test_large_network(self):
+        n = 50000
+        rng = np.random.default_rng(0)
+        parent = np.concatenate(([-1], (rng.random(n - 1) * np.arange(1, n)).astype(np.int64)))
+        network = PipeNetwork(parent, length=5, internal_diameter=54.0, eq_roughness=0.046,
+                              terminal_flow=rng.random(n) * 0.01)
+        start = time.perf_counter()
+        results = network.solve(self.DENSITY, self.VISCOSITY)
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertAlmostEqual(results['Flow rate (L/s)'][0], network.terminal_flow.sum(), places=6)
@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+import numpy as np
+
+from processing.heating_processing import calculate_pipe_hydraulics
+from processing.pipe_catalog import PipeCatalog
+from processing import pipe_sizing
+from processing.pipe_sizing import size_pipes
+
+CATALOG = PipeCatalog(['STEEL'] * 4, ['EN 10255'] * 4, [0.046] * 4, [15, 20, 25, 32], [16.2, 21.7, 27.4, 36.1])
+DENSITY = 988.0
+VISCOSITY = 0.000547
+
+
+class TestSizePipes(unittest.TestCase):
+
+    def test_smallest_diameter_within_limits(self):
+        flow_rates = np.array([0.1, 0.3, 0.6, 1.0])  # L/s
+        results = size_pipes(flow_rates, 'STEEL', DENSITY, VISCOSITY, max_velocity=1.0, max_pressure_drop=400,
+                             catalog=CATALOG)
+
+        for flow_rate, nominal_diameter in zip(flow_rates, results['Nominal diameter (mm)']):
+            # Brute force check of every candidate, one at a time
+            expected = None
+            for candidate, int_diameter in zip([15, 20, 25, 32], [16.2, 21.7, 27.4, 36.1]):
+                hydraulics = calculate_pipe_hydraulics(flow_rate / 1000, int_diameter / 1000, 0.046 / 1000,
+                                                       DENSITY, VISCOSITY)
+                if hydraulics['Velocity (m/s)'] <= 1.0 and hydraulics['Pressure drop (Pa/m)'] <= 400:
+                    expected = candidate
+                    break
+            self.assertEqual(nominal_diameter, expected)
+
+    def test_flow_too_large_is_nan(self):
+        results = size_pipes([0.1, 50.0], 'STEEL', DENSITY, VISCOSITY, max_velocity=1.5, catalog=CATALOG)
+        self.assertEqual(results['Nominal diameter (mm)'][0], 15)
+        self.assertTrue(np.isnan(results['Nominal diameter (mm)'][1]))
+        self.assertTrue(np.isnan(results['Pressure drop (Pa/m)'][1]))
+
+    def test_no_limits_gives_smallest_pipe(self):
+        results = size_pipes([0.5, 2.0], 'STEEL', DENSITY, VISCOSITY, catalog=CATALOG)
+        np.testing.assert_array_equal(results['Nominal diameter (mm)'], [15, 15])
+
+    def test_fluid_properties_per_flow(self):
+        results = size_pipes([0.1, 0.1], 'STEEL', [DENSITY, DENSITY], [VISCOSITY, VISCOSITY * 10],
+                             max_pressure_drop=250, catalog=CATALOG)
+        # The more viscous fluid needs a bigger pipe for the same pressure drop limit
+        self.assertLess(results['Nominal diameter (mm)'][0], results['Nominal diameter (mm)'][1])
+
+    def test_explicit_friction_model_gives_exact_sizes(self):
+        flow_rates = np.linspace(0.05, 2.0, 200)
+        exact = size_pipes(flow_rates, 'STEEL', DENSITY, VISCOSITY, max_pressure_drop=300, catalog=CATALOG)
+        for friction_model in ['Swamee-Jain', 'Haaland', 'Serghides']:
+            fast = size_pipes(flow_rates, 'STEEL', DENSITY, VISCOSITY, max_pressure_drop=300, catalog=CATALOG,
+                              friction_model=friction_model)
+            np.testing.assert_array_equal(fast['Nominal diameter (mm)'], exact['Nominal diameter (mm)'])
+            np.testing.assert_allclose(fast['Pressure drop (Pa/m)'], exact['Pressure drop (Pa/m)'])
+
+    def test_explicit_friction_model_rechecks_unsized_flows(self):
+        # Swamee-Jain puts 1 L/s in the largest pipe at 317 Pa/m, just over the limit, Colebrook at 314 Pa/m
+        exact = size_pipes([1.0], 'STEEL', DENSITY, VISCOSITY, max_pressure_drop=315, catalog=CATALOG)
+        fast = size_pipes([1.0], 'STEEL', DENSITY, VISCOSITY, max_pressure_drop=315, catalog=CATALOG,
+                          friction_model='Swamee-Jain')
+        self.assertEqual(exact['Nominal diameter (mm)'][0], 32)
+        self.assertEqual(fast['Nominal diameter (mm)'][0], 32)
+        self.assertAlmostEqual(fast['Pressure drop (Pa/m)'][0], exact['Pressure drop (Pa/m)'][0])
+
+    def test_chunks_match_one_matrix(self):
+        flow_rates = np.linspace(0.05, 2.0, 25)
+        densities = np.linspace(960, 1000, 25)
+        expected = size_pipes(flow_rates, 'STEEL', densities, VISCOSITY, max_pressure_drop=300, catalog=CATALOG,
+                              friction_model='Haaland')
+        with mock.patch.object(pipe_sizing, 'SIZING_CHUNK', 4):
+            chunked = size_pipes(flow_rates, 'STEEL', densities, VISCOSITY, max_pressure_drop=300, catalog=CATALOG,
+                                 friction_model='Haaland')
+        for name in expected:
+            np.testing.assert_array_equal(chunked[name], expected[name])
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+
+from processing.property_tables import (PropertyTable, load_or_build_table,
+                                        coolprop_glycol_water_properties,
+                                        lookup_glycol_water_properties,
+                                        coolprop_air_properties,
+                                        lookup_air_properties)
+from processing.ventilation_processing import get_air_properties
+
+
+class TestPropertyTable(unittest.TestCase):
+
+    def test_bilinear_interpolation(self):
+        table = PropertyTable([0, 10], [0, 1], {'density': [[1000, 1100], [1010, 1110]]})
+        self.assertAlmostEqual(float(table.interpolate('density', 5, 0.5)), 1055)
+
+    def test_outside_grid_is_nan(self):
+        table = PropertyTable([0, 10], [0, 1], {'density': [[1000, 1100], [1010, 1110]]})
+        self.assertTrue(np.isnan(table.interpolate('density', 20, 0.5)))
+
+
+class TestTableCache(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, 'table.npz')
+
+    @staticmethod
+    def build(temperatures, second_axis):
+        return PropertyTable(temperatures, second_axis, {'density': [[1000, 1100], [1010, 1110]]})
+
+    def test_corrupt_file_is_rebuilt(self):
+        # e.g. a write that was cut off, or an empty file
+        for contents in [b'', b'PK\x03\x04 cut off', b'not a table']:
+            with open(self.path, 'wb') as file:
+                file.write(contents)
+            table = load_or_build_table(self.path, [0, 10], [0, 1], self.build)
+            self.assertAlmostEqual(float(table.interpolate('density', 5, 0.5)), 1055)
+            # The rebuilt table replaces the bad file
+            np.testing.assert_array_equal(PropertyTable.load(self.path).temperatures, [0, 10])
+
+    def test_save_is_atomic(self):
+        self.build([0, 10], [0, 1]).save(self.path)
+        with mock.patch('numpy.savez', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.build([0, 20], [0, 1]).save(self.path)
+        # The old table is untouched and no temporary file is left behind
+        np.testing.assert_array_equal(PropertyTable.load(self.path).temperatures, [0, 10])
+        self.assertEqual(os.listdir(self.directory), ['table.npz'])
+
+
+class TestGlycolWaterProperties(unittest.TestCase):
+
+    def test_within_error_bound(self):
+        # Off-grid points should match CoolProp within the documented bound
+        for glycol_fraction, temperature in [(0.0, 20.5), (0.25, 6.3), (0.33, 45.7), (0.59, 99.5)]:
+            density, viscosity = lookup_glycol_water_properties(glycol_fraction, temperature)
+            expected_density, expected_viscosity = coolprop_glycol_water_properties(glycol_fraction, temperature)
+            self.assertAlmostEqual(density / expected_density, 1, delta=1e-4)
+            self.assertAlmostEqual(viscosity / expected_viscosity, 1, delta=1e-3)
+
+    def test_array_lookup(self):
+        temperatures = np.array([10.0, 20.0, 30.0])
+        density, viscosity = lookup_glycol_water_properties(0.3, temperatures)
+        self.assertEqual(density.shape, (3,))
+        # Density and viscosity fall as the temperature rises
+        self.assertTrue(np.all(np.diff(density) < 0))
+        self.assertTrue(np.all(np.diff(viscosity) < 0))
+
+    def test_coolprop_fallback_outside_grid(self):
+        # Close to the freezing point the table cell is incomplete so the value comes straight from CoolProp
+        self.assertEqual(lookup_glycol_water_properties(0.3, -14.5),
+                         coolprop_glycol_water_properties(0.3, -14.5))
+
+
+class TestAirProperties(unittest.TestCase):
+
+    def test_within_error_bound(self):
+        # Off-grid points, from a cold sea level intake to a warm site at altitude
+        for temperature, pressure in [(-12.3, 102100), (20.5, 101325), (35.7, 84000), (79.5, 61300)]:
+            for value, expected in zip(lookup_air_properties(temperature, pressure),
+                                       coolprop_air_properties(temperature, pressure)):
+                self.assertAlmostEqual(value / expected, 1, delta=1e-5)
+
+    def test_array_lookup(self):
+        density, specific_heat, viscosity = lookup_air_properties(np.array([10.0, 20.0, 30.0]), 101325)
+        self.assertEqual(density.shape, (3,))
+        # Density falls and viscosity rises with the temperature
+        self.assertTrue(np.all(np.diff(density) < 0))
+        self.assertTrue(np.all(np.diff(viscosity) > 0))
+
+        properties = get_air_properties(np.array([20.0, 20.0]), np.array([101325, 89875]))
+        # About 1000 m above sea level the air is roughly 11 % less dense
+        self.assertAlmostEqual(properties['Density (kg/m³)'][1] / properties['Density (kg/m³)'][0], 0.887, places=3)
+
+    def test_coolprop_fallback_outside_grid(self):
+        self.assertEqual(lookup_air_properties(150, 101325), coolprop_air_properties(150, 101325))
+        self.assertIsInstance(get_air_properties(20, 101325)['Density (kg/m³)'], float)
@@ -0,0 +1,80 @@
+import unittest
+import numpy as np
+import psychrolib
+
+from processing.psychrometrics import (saturation_vapour_pressure, humidity_ratio_from_relative_humidity,
+                                       humidity_ratio_from_wet_bulb, relative_humidity_from_humidity_ratio,
+                                       enthalpy, dew_point_from_humidity_ratio, dew_point_from_relative_humidity,
+                                       wet_bulb_from_humidity_ratio)
+
+psychrolib.SetUnitSystem(psychrolib.SI)
+
+RNG = np.random.default_rng(0)
+TEMPERATURES = RNG.uniform(-30, 60, 500)  # Crosses the triple point, so both ice and water equations are used
+PRESSURES = RNG.uniform(80000, 105000, 500)
+RELATIVE_HUMIDITIES = RNG.uniform(0.01, 1, 500)
+WET_BULBS = TEMPERATURES - RNG.uniform(0, 15, 500)
+
+
+def reference(function, *arrays):
+    return np.array([function(*values) for values in zip(*arrays)])
+
+
+class TestPsychrometrics(unittest.TestCase):
+
+    def test_saturation_vapour_pressure(self):
+        np.testing.assert_allclose(saturation_vapour_pressure(TEMPERATURES),
+                                   reference(psychrolib.GetSatVapPres, TEMPERATURES), rtol=1e-9)
+
+    def test_humidity_ratio_from_relative_humidity(self):
+        np.testing.assert_allclose(
+            humidity_ratio_from_relative_humidity(TEMPERATURES, RELATIVE_HUMIDITIES, PRESSURES),
+            reference(psychrolib.GetHumRatioFromRelHum, TEMPERATURES, RELATIVE_HUMIDITIES, PRESSURES), rtol=1e-9)
+
+    def test_humidity_ratio_from_wet_bulb(self):
+        np.testing.assert_allclose(humidity_ratio_from_wet_bulb(TEMPERATURES, WET_BULBS, PRESSURES),
+                                   reference(psychrolib.GetHumRatioFromTWetBulb, TEMPERATURES, WET_BULBS, PRESSURES),
+                                   rtol=1e-9)
+
+    def test_enthalpy_and_relative_humidity(self):
+        humidity_ratio = humidity_ratio_from_relative_humidity(TEMPERATURES, RELATIVE_HUMIDITIES, PRESSURES)
+        np.testing.assert_allclose(enthalpy(TEMPERATURES, humidity_ratio),
+                                   reference(psychrolib.GetMoistAirEnthalpy, TEMPERATURES, humidity_ratio), rtol=1e-9)
+        np.testing.assert_allclose(relative_humidity_from_humidity_ratio(TEMPERATURES, humidity_ratio, PRESSURES),
+                                   RELATIVE_HUMIDITIES, rtol=1e-9)
+
+    def test_dew_point(self):
+        humidity_ratio = humidity_ratio_from_relative_humidity(TEMPERATURES, RELATIVE_HUMIDITIES, PRESSURES)
+        # psychrolib stops iterating at 0.001 °C
+        np.testing.assert_allclose(
+            dew_point_from_humidity_ratio(TEMPERATURES, humidity_ratio, PRESSURES),
+            reference(psychrolib.GetTDewPointFromHumRatio, TEMPERATURES, humidity_ratio, PRESSURES), atol=1e-3)
+        np.testing.assert_allclose(dew_point_from_relative_humidity(TEMPERATURES, 1.0), TEMPERATURES, atol=1e-6)
+
+    def test_wet_bulb(self):
+        humidity_ratio = humidity_ratio_from_relative_humidity(TEMPERATURES, RELATIVE_HUMIDITIES, PRESSURES)
+        # psychrolib also stops bisecting at 0.001 °C
+        np.testing.assert_allclose(
+            wet_bulb_from_humidity_ratio(TEMPERATURES, humidity_ratio, PRESSURES),
+            reference(psychrolib.GetTWetBulbFromHumRatio, TEMPERATURES, humidity_ratio, PRESSURES), atol=1e-3)
+        # Round trip from the wet-bulb, away from freezing where the equations switch from water to ice and jump
+        humidity_ratio = humidity_ratio_from_wet_bulb(TEMPERATURES, WET_BULBS, PRESSURES)
+        valid = (humidity_ratio > 1e-6) & (np.abs(WET_BULBS) > 1)
+        np.testing.assert_allclose(wet_bulb_from_humidity_ratio(TEMPERATURES, humidity_ratio, PRESSURES)[valid],
+                                   WET_BULBS[valid], atol=1e-3)
+        self.assertTrue(np.isnan(wet_bulb_from_humidity_ratio(20, np.nan, 101325)))
+
+    def test_broadcasting(self):
+        # e.g. every line of a chart at once
+        temperatures = np.arange(0, 40, 0.5)
+        lines = humidity_ratio_from_relative_humidity(temperatures[np.newaxis, :], np.array([[0.5], [1.0]]), 101325)
+        self.assertEqual(lines.shape, (2, len(temperatures)))
+        self.assertAlmostEqual(float(humidity_ratio_from_relative_humidity(20, 0.5, 101325)),
+                               psychrolib.GetHumRatioFromRelHum(20, 0.5, 101325))
+
+    def test_invalid_points_are_nan(self):
+        self.assertTrue(np.isnan(humidity_ratio_from_wet_bulb(20, 25, 101325)))
+        self.assertTrue(np.isnan(humidity_ratio_from_relative_humidity(20, 1.5, 101325)))
+        self.assertTrue(np.isnan(saturation_vapour_pressure(250)))
+        values = humidity_ratio_from_wet_bulb(np.array([20.0, 20.0]), np.array([15.0, 25.0]), 101325)
+        self.assertFalse(np.isnan(values[0]))
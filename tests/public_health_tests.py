@@ -1,5 +1,7 @@
 import unittest
-from processing.public_health_processing import select_stack_option
+from io import BytesIO
+from processing.public_health_processing import select_stack_option, load_excel_data
+from processing.schedules import ScheduleError
 
 
 # Unit test class
@@ -43,3 +45,23 @@ class TestSelectStackOption(unittest.TestCase):
         # Test a secondary option where WC is present and a suitable larger size is found
         result = select_stack_option(total_wastewater_flowrate=7.0, wc_present=True, vent_method='Secondary')
         self.assertEqual(result, "primary 100mm with 50mm secondary vent")
+
+
+
+class TestLoadExcelData(unittest.TestCase):
+    def test_missing_columns_raise(self):
+        # Errors are raised for the page (or a batch job) to report, nothing is shown from here
+        uploaded_file = BytesIO(b'Material,Length (m)\nCopper,2\n')
+        uploaded_file.name = 'pipes.csv'
+        with self.assertRaises(ScheduleError) as context:
+            load_excel_data(uploaded_file)
+        self.assertIn('Internal diameter (mm)', context.exception.missing_columns)
+
+    def test_dropped_rows_counted(self):
+        # A non-numeric length and a blank volume, both rows are skipped and counted for the page to report
+        uploaded_file = BytesIO('Material,Nominal diameter (mm),Internal diameter (mm),Length (m),Pipe volume (m³)\n'
+                                'Copper,15,13.6,2,0.0003\nCopper,22,20.2,n/a,0.0006\nSteel,25,27.4,3,\n'.encode())
+        uploaded_file.name = 'pipes.csv'
+        columns, dropped_rows = load_excel_data(uploaded_file)
+        self.assertEqual(dropped_rows, 2)
+        self.assertEqual(columns['Material'].tolist(), ['Copper'])
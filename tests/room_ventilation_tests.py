@@ -0,0 +1,96 @@
+import io
+import unittest
+import numpy as np
+import pandas as pd
+
+from processing.room_ventilation import (read_room_schedule, calculate_room_flows, aggregate_room_flows,
+                                         ROOM_SCHEDULE_COLUMNS, UNASSIGNED)
+from processing.schedules import ScheduleError
+from processing.ventilation_processing import (calculate_room_volume, calculate_volume_flow_rate,
+                                               calculate_occupation_flow_rate)
+
+ROOMS = {
+    'Room reference': np.array(['G01', 'G02', 'G03', '101']),
+    'Zone': np.array(['Ground', 'Ground', 'Ground', 'First']),
+    'AHU': np.array(['AHU-01', 'AHU-01', 'AHU-02', 'AHU-02']),
+    'Floor area (m²)': np.array([50.0, 20.0, 100.0, 30.0]),
+    'Ceiling height (m)': np.array([3.0, 2.5, 3.0, 2.7]),
+    'Occupancy (people)': np.array([4.0, 10.0, 0.0, 6.0]),
+    'Air changes (/hour)': np.array([6.0, 2.0, 4.0, 6.0]),
+    'Air per person (l/s)': np.array([10.0, 12.0, 10.0, 10.0]),
+}
+
+
+def upload(df):
+    source = io.BytesIO(df.to_csv(index=False).encode('utf-8'))
+    source.name = 'rooms.csv'
+    return source
+
+
+class TestRoomFlows(unittest.TestCase):
+
+    def test_most_onerous_matches_single_room_calculations(self):
+        results = calculate_room_flows(ROOMS)
+        for i in range(4):
+            volume = calculate_room_volume(ROOMS['Floor area (m²)'][i], ROOMS['Ceiling height (m)'][i])
+            ach_flow = calculate_volume_flow_rate(volume, ROOMS['Air changes (/hour)'][i])
+            occupancy_flow = calculate_occupation_flow_rate(ROOMS['Occupancy (people)'][i],
+                                                            ROOMS['Air per person (l/s)'][i])
+            self.assertAlmostEqual(results['Volume flow rate (m³/s)'][i], max(ach_flow, occupancy_flow))
+            self.assertEqual(results['Governing requirement'][i],
+                             'Occupancy' if occupancy_flow > ach_flow else 'Air changes')
+        # G02: 50 m³ at 2 ac/hr is 0.028 m³/s, 10 people at 12 l/s is 0.12 m³/s
+        self.assertAlmostEqual(results['Air changes achieved (/hour)'][1], 0.12 * 3600 / 50)
+
+    def test_aggregates(self):
+        results = calculate_room_flows(ROOMS)
+        zones = aggregate_room_flows(ROOMS, results, 'Zone')
+        self.assertEqual(list(zones['Zone']), ['First', 'Ground'])
+        self.assertEqual(list(zones['Rooms']), [1, 3])
+        self.assertAlmostEqual(zones['Floor area (m²)'][1], 170)
+        self.assertAlmostEqual(zones['Volume flow rate (m³/s)'][1], results['Volume flow rate (m³/s)'][:3].sum())
+
+        ahus = aggregate_room_flows(ROOMS, results, 'AHU')
+        self.assertAlmostEqual(ahus['Volume flow rate (m³/s)'].sum(), results['Volume flow rate (m³/s)'].sum())
+        self.assertAlmostEqual(ahus['Air changes achieved (/hour)'][0],
+                               ahus['Volume flow rate (m³/s)'][0] * 3600 / ahus['Room volume (m³)'][0])
+
+    def test_zero_volume_room(self):
+        rooms = {**ROOMS, 'Floor area (m²)': np.array([0.0, 20.0, 100.0, 30.0])}
+        results = calculate_room_flows(rooms)
+        self.assertAlmostEqual(results['Volume flow rate (m³/s)'][0], 0.04)
+        self.assertTrue(np.isinf(results['Air changes achieved (/hour)'][0]))
+
+
+class TestReadRoomSchedule(unittest.TestCase):
+
+    def test_read_and_missing_columns(self):
+        columns, dropped_rows = read_room_schedule(upload(pd.DataFrame(ROOMS)))
+        self.assertEqual(list(columns), list(ROOM_SCHEDULE_COLUMNS))
+        self.assertEqual(dropped_rows, 0)
+        # Text columns stay text, even when they look like numbers
+        self.assertEqual(columns['Room reference'][3], '101')
+
+        with self.assertRaises(ScheduleError) as context:
+            read_room_schedule(upload(pd.DataFrame(ROOMS).drop(columns='Floor area (m²)')))
+        self.assertEqual(context.exception.missing_columns, ['Floor area (m²)'])
+
+    def test_blank_cells(self):
+        df = pd.DataFrame(ROOMS).astype({'Zone': object})
+        df.loc[0, ['Occupancy (people)', 'Air per person (l/s)']] = np.nan
+        df.loc[1, ['Air changes (/hour)', 'AHU']] = [np.nan, None]
+        df.loc[3, 'Floor area (m²)'] = np.nan
+        columns, dropped_rows = read_room_schedule(upload(df.drop(columns='Zone')))
+        # Only the room without a floor area is dropped, and it's reported
+        self.assertEqual(dropped_rows, 1)
+        self.assertEqual(columns['Room reference'].tolist(), ['G01', 'G02', 'G03'])
+        self.assertEqual(columns['Occupancy (people)'][0], 0)
+        self.assertEqual(columns['Air changes (/hour)'][1], 0)
+
+        results = calculate_room_flows(columns)
+        self.assertEqual(results['Governing requirement'][0], 'Air changes')
+        self.assertAlmostEqual(results['Volume flow rate (m³/s)'][1], 0.12)
+        self.assertEqual(list(aggregate_room_flows(columns, results, 'Zone')['Zone']), [UNASSIGNED])
+        ahus = aggregate_room_flows(columns, results, 'AHU')
+        self.assertEqual(list(ahus['AHU']), ['AHU-01', 'AHU-02', UNASSIGNED])
+        self.assertAlmostEqual(ahus['Volume flow rate (m³/s)'].sum(), results['Volume flow rate (m³/s)'].sum())
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from io import BytesIO
+from unittest import mock
+import numpy as np
+import pandas as pd
+
+from processing import schedules
+from processing.schedules import read_schedule, ScheduleError
+
+REQUIRED_COLUMNS = ['Material', 'Nominal diameter (mm)', 'Internal diameter (mm)', 'Length (m)']
+
+
+def make_schedule():
+    return pd.DataFrame({
+        'Notes': ['a', 'b', 'c', 'd'],
+        'Material': ['Copper', 'Copper', 'Steel', 'Steel'],
+        'Nominal diameter (mm)': [15, 22, 25, 32],
+        'Internal diameter (mm)': [13.6, 20.2, 27.4, 36.1],
+        'Length (m)': [2.0, np.nan, 'n/a', 4.5],
+    })
+
+
+class TestReadSchedule(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.df = make_schedule()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, file_type, df=None):
+        df = self.df if df is None else df
+        path = os.path.join(self.directory.name, f'schedule.{file_type}')
+        if file_type == 'xlsx':
+            df.to_excel(path, index=False)
+        elif file_type == 'csv':
+            df.to_csv(path, index=False)
+        else:
+            df.astype({'Length (m)': str}).to_parquet(path)
+        return path
+
+    def test_every_file_type(self):
+        for file_type in ['xlsx', 'csv', 'parquet']:
+            columns = read_schedule(self.write(file_type), REQUIRED_COLUMNS, text_columns=['Material'])
+            self.assertEqual(list(columns), REQUIRED_COLUMNS)
+            # The rows with a blank and a non-numeric length are dropped
+            np.testing.assert_array_equal(columns['Material'], ['Copper', 'Steel'])
+            np.testing.assert_array_equal(columns['Nominal diameter (mm)'], [15, 32])
+            np.testing.assert_allclose(columns['Length (m)'], [2.0, 4.5])
+
+    def test_uploaded_file_object(self):
+        with open(self.write('xlsx'), 'rb') as file:
+            uploaded_file = BytesIO(file.read())
+        uploaded_file.name = 'schedule.xlsx'
+        columns = read_schedule(uploaded_file, REQUIRED_COLUMNS, text_columns=['Material'])
+        self.assertEqual(len(columns['Material']), 2)
+
+    def test_excel_blocks(self):
+        path = self.write('xlsx')
+        expected = read_schedule(path, REQUIRED_COLUMNS, text_columns=['Material'])
+        # Blocks of rows that don't divide the schedule evenly
+        with mock.patch.object(schedules, 'EXCEL_BLOCK_ROWS', 3):
+            columns = read_schedule(path, REQUIRED_COLUMNS, text_columns=['Material'])
+        for col in REQUIRED_COLUMNS:
+            np.testing.assert_array_equal(columns[col], expected[col])
+        columns = read_schedule(self.write('xlsx', self.df.iloc[:0]), REQUIRED_COLUMNS, text_columns=['Material'])
+        self.assertEqual(len(columns['Material']), 0)
+
+    def test_missing_columns(self):
+        path = self.write('xlsx', self.df.drop(columns=['Length (m)']))
+        with self.assertRaises(ScheduleError) as context:
+            read_schedule(path, REQUIRED_COLUMNS + ['Pipe volume (m³)'])
+        self.assertEqual(context.exception.missing_columns, ['Length (m)', 'Pipe volume (m³)'])
+
+    def test_unsupported_file_type(self):
+        with self.assertRaises(ScheduleError):
+            read_schedule(os.path.join(self.directory.name, 'schedule.xls'), REQUIRED_COLUMNS)
+
+
+    def test_optional_columns(self):
+        for file_type in ['xlsx', 'csv', 'parquet']:
+            columns = read_schedule(self.write(file_type), ['Material', 'Nominal diameter (mm)'],
+                                    text_columns=['Material', 'Notes'], optional_columns=['Notes', 'K factor'])
+            # Only the optional columns in the file are returned, and their blanks don't drop rows
+            self.assertEqual(list(columns), ['Material', 'Nominal diameter (mm)', 'Notes'])
+            self.assertEqual(len(columns['Material']), 4)
+        columns = read_schedule(self.write('csv'), ['Material'], ['Material'], optional_columns=['Length (m)'])
+        np.testing.assert_allclose(columns['Length (m)'], [2.0, np.nan, np.nan, 4.5])
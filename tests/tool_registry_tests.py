@@ -0,0 +1,90 @@
+import os
+import json
+import tempfile
+import unittest
+
+from tool_registry import ToolRegistry, read_tool_metadata
+
+
+def write_tool(directory, category, filename, source):
+    os.makedirs(os.path.join(directory, category), exist_ok=True)
+    path = os.path.join(directory, category, filename)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(source)
+    return path
+
+
+class TestReadToolMetadata(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_setup_page_arguments(self):
+        path = write_tool(self.directory.name, 'Heating', 'pipes.py',
+                          "import streamlit as st\nfrom common import setup_page\n"
+                          "setup_page('Pipe sizing', 'someone@wsp.com')\n")
+        self.assertEqual(read_tool_metadata(path), {'title': 'Pipe sizing', 'maintainer': 'someone@wsp.com'})
+
+    def test_declared_metadata(self):
+        # Declared metadata takes priority, and the script is never run
+        path = write_tool(self.directory.name, 'Heating', 'pipes.py',
+                          "raise RuntimeError('imported')\n"
+                          "TOOL_METADATA = {'title': 'Pipes', 'maintainer': 'a@wsp.com'}\n"
+                          "setup_page('Other', 'b@wsp.com')\n")
+        self.assertEqual(read_tool_metadata(path), {'title': 'Pipes', 'maintainer': 'a@wsp.com'})
+
+    def test_defaults(self):
+        path = write_tool(self.directory.name, 'Heating', 'pipe_sizing.py', "setup_page(title, maintainer)\n")
+        self.assertEqual(read_tool_metadata(path), {'title': 'pipe sizing', 'maintainer': None})
+        broken = write_tool(self.directory.name, 'Heating', 'broken.py', "def (\n")
+        self.assertEqual(read_tool_metadata(broken)['title'], 'broken')
+
+
+class TestToolRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.tools_directory = os.path.join(self.directory.name, 'tools')
+        self.manifest_path = os.path.join(self.directory.name, 'manifest.json')
+        write_tool(self.tools_directory, 'Ventilation', 'ducts.py', "setup_page('Ducts', 'a@wsp.com')\n")
+        write_tool(self.tools_directory, 'Heating', 'pipes.py', "setup_page('Pipes', 'b@wsp.com')\n")
+        write_tool(self.tools_directory, 'Heating', '__init__.py', "")
+
+    def make_registry(self):
+        return ToolRegistry(self.tools_directory, self.manifest_path)
+
+    def test_manifest(self):
+        tools = self.make_registry().tools()
+        self.assertEqual([(tool['category'], tool['title']) for tool in tools],
+                         [('Heating', 'Pipes'), ('Ventilation', 'Ducts')])
+        self.assertEqual(tools[0]['path'], os.path.join(self.tools_directory, 'Heating', 'pipes.py'))
+        self.assertEqual(tools[1]['maintainer'], 'a@wsp.com')
+
+    def test_scanned_once(self):
+        registry = self.make_registry()
+        self.assertIs(registry.tools(), registry.tools())
+        self.assertEqual(registry.scans, 1)
+
+    def test_manifest_file_reused(self):
+        self.make_registry().tools()
+        registry = self.make_registry()
+        self.assertEqual(len(registry.tools()), 2)
+        self.assertEqual(registry.scans, 0)
+        with open(self.manifest_path) as file:
+            self.assertEqual(json.load(file)['tools'][0]['path'], os.path.join('Heating', 'pipes.py'))
+
+    def test_rescanned_when_tools_added(self):
+        registry = self.make_registry()
+        registry.tools()
+        path = write_tool(self.tools_directory, 'Heating', 'calorifier.py', "setup_page('Calorifier', 'c@wsp.com')\n")
+        # Make sure the directory's modification time changes, whatever the file system's resolution
+        stat = os.stat(os.path.dirname(path))
+        os.utime(os.path.dirname(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual([tool['title'] for tool in registry.categories()['Heating']], ['Calorifier', 'Pipes'])
+        self.assertEqual(registry.scans, 2)
+
+    def test_missing_tools_directory(self):
+        registry = ToolRegistry(os.path.join(self.directory.name, 'missing'), self.manifest_path)
+        self.assertEqual(registry.tools(), [])
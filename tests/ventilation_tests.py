@@ -1,5 +1,6 @@
 import unittest
 import math
+import numpy as np
 
 from processing.ventilation_processing import (calculate_ach_volume,
                                                       calculate_occupation_flow_rate,
@@ -10,7 +11,17 @@ from processing.ventilation_processing import (calculate_ach_volume,
                                                       calculate_round_duct_area,
                                                       find_min_diameter,
                                                       find_min_rect_size,
-                                                      calculate_pressure_loss)
+                                                      calculate_pressure_loss,
+                                                      calculate_aspect_ratio,
+                                                      calculate_hydraulic_diameter,
+                                                      calculate_duct_friction,
+                                                      DUCT_ROUGHNESS,
+                                                      STANDARD_AIR_VISCOSITY,
+                                                      plot_psychrometric,
+                                                      add_psychrometric_points,
+                                                      psychrometric_chart_lines,
+                                                      _psychrometric_lines,
+                                                      PSYCHROMETRIC_CACHE_SIZE)
 
 
 class TestAirChangeCalculations(unittest.TestCase):
@@ -101,12 +112,67 @@ class TestDuctCalculations(unittest.TestCase):
         self.assertEqual(find_min_rect_size(air_volume, max_duct_velocity, None),
                          (expected_size_mm, expected_size_mm))
 
+    def test_calculate_aspect_ratio(self):
+        self.assertEqual(calculate_aspect_ratio(200, 800), 4.0)
+        self.assertEqual(calculate_aspect_ratio(800, 200), 4.0)
+        # Whole arrays of ducts at once
+        self.assertEqual(list(calculate_aspect_ratio(np.array([200, 600]), np.array([800, 300]))), [4.0, 2.0])
+        duct_area_sqm, eq_diameter_mm = calculate_rect_duct_area(np.array([500, 400]), 400)
+        self.assertAlmostEqual(eq_diameter_mm[0], calculate_rect_duct_area(500, 400)[1])
+
     def test_calculate_pressure_loss(self):
+        from fluids.friction import friction_factor
+
         diameter_mm = 300  # duct diameter in mm
         air_density = 1.2  # density in kg/m³
         air_velocity = 5.0  # velocity in m/s
         diameter_m = diameter_mm / 1000
-        friction_factor = 0.02
-        expected_pressure_loss = friction_factor * (air_density * air_velocity ** 2) / (2 * diameter_m)
+        # Colebrook-White for galvanised steel, rather than a fixed friction factor
+        reynolds_number = air_density * air_velocity * diameter_m / STANDARD_AIR_VISCOSITY
+        darcy_friction_factor = friction_factor(Re=reynolds_number, eD=DUCT_ROUGHNESS['Galvanised steel'] / diameter_mm)
+        expected_pressure_loss = darcy_friction_factor * (air_density * air_velocity ** 2) / (2 * diameter_m)
         self.assertAlmostEqual(calculate_pressure_loss(diameter_mm, air_density, air_velocity),
-                               expected_pressure_loss, places=4)
+                               expected_pressure_loss, places=6)
+        # Smoother ducts lose less
+        self.assertLess(calculate_pressure_loss(diameter_mm, air_density, air_velocity,
+                                                roughness_mm=DUCT_ROUGHNESS['PVC']), expected_pressure_loss)
+
+    def test_duct_friction_arrays(self):
+        self.assertAlmostEqual(calculate_hydraulic_diameter(400, 200), 266.6666667)
+        velocities = np.array([0.0, 2.0, 5.0, 10.0])
+        diameters = np.array([200, 300, calculate_hydraulic_diameter(600, 300), 800])
+        exact = calculate_duct_friction(velocities, diameters, 1.2, 1.8e-5, 0.15)
+        fast = calculate_duct_friction(velocities, diameters, 1.2, 1.8e-5, 0.15, friction_model='Haaland')
+        self.assertEqual(exact['Pressure loss (Pa/m)'][0], 0)
+        for i in range(1, 4):
+            single = calculate_duct_friction(velocities[i], diameters[i], 1.2, 1.8e-5, 0.15)
+            self.assertAlmostEqual(exact['Pressure loss (Pa/m)'][i], single['Pressure loss (Pa/m)'])
+        # The explicit approximation is within a couple of percent
+        np.testing.assert_allclose(fast['Pressure loss (Pa/m)'][1:], exact['Pressure loss (Pa/m)'][1:], rtol=0.02)
+
+
+class TestPsychrometricChart(unittest.TestCase):
+
+    def test_lines_cached_per_parameters(self):
+        lines = psychrometric_chart_lines(101325, (5, 45), (0, 100), (-10, 45))
+        self.assertIs(psychrometric_chart_lines(101325.0, [5, 45], (0, 100), (-10, 45)), lines)
+        self.assertIsNot(psychrometric_chart_lines(95000, (5, 45), (0, 100), (-10, 45)), lines)
+        # 0 to 100 % in steps of 10
+        self.assertEqual(len(lines['Relative humidity'][0]), 11)
+        # The cached arrays are shared, so they can't be changed
+        with self.assertRaises(ValueError):
+            lines['Wet-bulb temperature'][1][0][0] = 1.0
+
+    def test_cache_is_bounded(self):
+        for pressure in range(PSYCHROMETRIC_CACHE_SIZE + 5):
+            psychrometric_chart_lines(90000 + pressure, (5, 45), (0, 100), (-10, 45))
+        self.assertLessEqual(_psychrometric_lines.cache_info().currsize, PSYCHROMETRIC_CACHE_SIZE)
+
+    def test_points_overlay(self):
+        p = plot_psychrometric(101325, (5, 45), (0, 100), (-10, 45), 0.025)
+        glyphs = len(p.renderers)
+        source = add_psychrometric_points(p, [(25.0, 0.0127, 'Point 1'), (30.0, 0.015, 'Point 2')])
+        self.assertEqual(source.data['label'], ['Point 1', 'Point 2'])
+        # Every point is in one glyph
+        self.assertEqual(len(p.renderers), glyphs + 1)
+
@@ -0,0 +1,133 @@
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import psychrolib
+
+from processing.schedules import ScheduleError
+from processing.weather import (iter_weather_chunks, weather_psychrometrics, process_weather_files, WeatherBins,
+                                DRY_BULB, RELATIVE_HUMIDITY, WET_BULB, PRESSURE, HUMIDITY_RATIO, ENTHALPY,
+                                DEW_POINT)
+
+psychrolib.SetUnitSystem(psychrolib.SI)
+
+
+def epw_text(dry_bulbs, relative_humidities, pressure=101325):
+    """An EPW file with 8 header lines and one row per hour (35 fields)"""
+    lines = ['LOCATION,Test,,,,,51.5,-0.1,0,20'] + [f'HEADER {i}' for i in range(7)]
+    for hour, (dry_bulb, relative_humidity) in enumerate(zip(dry_bulbs, relative_humidities)):
+        lines.append(f'2020,1,{hour // 24 + 1},{hour % 24 + 1},60,?9?9,{dry_bulb},5.0,{relative_humidity},'
+                     f'{pressure},' + ','.join(['0'] * 25))
+    return '\n'.join(lines) + '\n'
+
+
+def uploaded(text, name):
+    file = io.BytesIO(text.encode('utf-8'))
+    file.name = name
+    return file
+
+
+class TestReadWeatherFiles(unittest.TestCase):
+
+    def test_epw_chunks_and_missing_values(self):
+        source = uploaded(epw_text([20.0, 99.9, 25.0, 10.0, 5.0], [50, 60, 999, 70, 80]), 'site.epw')
+        chunks = list(iter_weather_chunks(source, chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        weather = pd.concat(chunks)
+        self.assertEqual(list(weather['Hour']), [1, 2, 3, 4, 5])
+        self.assertTrue(np.isnan(weather[DRY_BULB].iloc[1]))
+        self.assertTrue(np.isnan(weather[RELATIVE_HUMIDITY].iloc[2]))
+        self.assertEqual(weather[PRESSURE].iloc[0], 101325)
+
+    def test_csv_needs_dry_bulb_and_humidity(self):
+        with self.assertRaises(ScheduleError) as context:
+            list(iter_weather_chunks(uploaded(f'{DRY_BULB},Other\n20,1\n', 'site.csv')))
+        self.assertEqual(context.exception.missing_columns, [RELATIVE_HUMIDITY, WET_BULB])
+        with self.assertRaises(ScheduleError):
+            iter_weather_chunks(uploaded('', 'site.xlsx'))
+
+    def test_files_that_cant_be_read(self):
+        # Text in a number field, and an empty file, are reported like a missing column
+        source = uploaded(epw_text([20.0, 'abc'], [50, 60]), 'site.epw')
+        with self.assertRaises(ScheduleError):
+            process_weather_files(source)
+        for name in ['site.epw', 'site.csv']:
+            with self.assertRaises(ScheduleError):
+                process_weather_files(uploaded('', name))
+
+    def test_csv_with_wet_bulb(self):
+        source = uploaded(f'{DRY_BULB},{WET_BULB},Notes\n25,18,a\n30,x,b\n', 'site.csv')
+        states = weather_psychrometrics(next(iter_weather_chunks(source)))
+        self.assertAlmostEqual(states[HUMIDITY_RATIO].iloc[0], psychrolib.GetHumRatioFromTWetBulb(25, 18, 101325))
+        self.assertAlmostEqual(states[RELATIVE_HUMIDITY].iloc[0],
+                               psychrolib.GetRelHumFromTWetBulb(25, 18, 101325) * 100)
+        self.assertTrue(np.isnan(states[HUMIDITY_RATIO].iloc[1]))
+        self.assertNotIn('Notes', states)
+
+
+class TestWeatherPsychrometrics(unittest.TestCase):
+
+    def test_states_match_psychrolib(self):
+        chunk = pd.DataFrame({DRY_BULB: [28.0, -5.0], RELATIVE_HUMIDITY: [40.0, 90.0], PRESSURE: [101325, np.nan]})
+        states = weather_psychrometrics(chunk)
+        for i, (dry_bulb, relative_humidity) in enumerate([(28.0, 0.4), (-5.0, 0.9)]):
+            humidity_ratio = psychrolib.GetHumRatioFromRelHum(dry_bulb, relative_humidity, 101325)
+            self.assertAlmostEqual(states[HUMIDITY_RATIO].iloc[i], humidity_ratio)
+            self.assertAlmostEqual(states[ENTHALPY].iloc[i],
+                                   psychrolib.GetMoistAirEnthalpy(dry_bulb, humidity_ratio) / 1000)
+            self.assertAlmostEqual(states[DEW_POINT].iloc[i],
+                                   psychrolib.GetTDewPointFromRelHum(dry_bulb, relative_humidity), delta=1e-3)
+            self.assertAlmostEqual(states[WET_BULB].iloc[i],
+                                   psychrolib.GetTWetBulbFromRelHum(dry_bulb, relative_humidity, 101325), delta=1e-3)
+        # The missing pressure is taken as standard
+        self.assertEqual(states[PRESSURE].iloc[1], 101325)
+
+    def test_pressure_override(self):
+        chunk = pd.DataFrame({DRY_BULB: [28.0], RELATIVE_HUMIDITY: [40.0], PRESSURE: [101325]})
+        states = weather_psychrometrics(chunk, pressure=85000)
+        self.assertAlmostEqual(states[HUMIDITY_RATIO].iloc[0], psychrolib.GetHumRatioFromRelHum(28, 0.4, 85000))
+
+
+class TestWeatherBins(unittest.TestCase):
+
+    def test_bins_and_design_values(self):
+        bins = WeatherBins(temperature_edges=[0, 10, 20, 30], humidity_ratio_edges=[0, 0.01, 0.02])
+        states = weather_psychrometrics(pd.DataFrame({DRY_BULB: [5.0, 15.0, 15.0, 25.0, 40.0, np.nan],
+                                                      RELATIVE_HUMIDITY: [50.0] * 6}))
+        bins.add(states)
+        self.assertEqual(bins.hours, 6)
+        self.assertEqual(bins.invalid, 1)
+        # 40 °C is outside the edges
+        self.assertEqual(bins.counts.sum(), 4)
+        binned = bins.to_dataframe()
+        self.assertEqual(list(binned['Hours']), [1, 2, 1])
+        self.assertEqual(list(binned['Dry-bulb from (°C)']), [0, 10, 20])
+        # 1 of the 5 valid hours is at 40 °C
+        self.assertEqual(bins.design_value(DRY_BULB, 20), 40)
+        self.assertEqual(bins.design_value(DRY_BULB, 40), 25)
+        self.assertTrue(np.isnan(WeatherBins().design_value(DRY_BULB, 1)))
+
+
+class TestProcessWeatherFiles(unittest.TestCase):
+
+    def test_several_years_streamed_to_output(self):
+        rng = np.random.default_rng(0)
+        years = [epw_text(rng.uniform(-5, 30, 100).round(1), rng.uniform(20, 100, 100).round()) for _ in range(3)]
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'states.csv')
+            bins = process_weather_files([uploaded(year, f'{i}.epw') for i, year in enumerate(years)], output,
+                                         chunk_size=30)
+            states = pd.read_csv(output)
+        self.assertEqual(bins.hours, 300)
+        self.assertEqual(len(states), 300)
+        self.assertEqual(bins.counts.sum(), 300)
+        # Binning chunk by chunk counts the same as binning every hour at once
+        counts, _, _ = np.histogram2d(states[DRY_BULB], states[HUMIDITY_RATIO],
+                                      bins=(bins.temperature_edges, bins.humidity_ratio_edges))
+        np.testing.assert_array_equal(bins.counts, counts)
+
+    def test_unsupported_output(self):
+        with self.assertRaises(ValueError):
+            process_weather_files(uploaded(epw_text([20], [50]), 'site.epw'), 'states.xlsx')
@@ -0,0 +1,170 @@
+import os
+import ast
+import json
+import threading
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+TOOLS_DIRECTORY = os.path.join(REPOSITORY_DIRECTORY, 'tools')
+MANIFEST_PATH = os.path.join(REPOSITORY_DIRECTORY, 'data', 'tool_manifest.json')
+
+# A tool can declare its metadata as a dictionary literal under this name, e.g.
+# TOOL_METADATA = {'title': 'Pipe sizing', 'maintainer': 'someone@wsp.com'}
+METADATA_VARIABLE = 'TOOL_METADATA'
+MANIFEST_VERSION = 1
+
+_registry = None
+
+
+def _literal(node):
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return None
+
+
+def read_tool_metadata(path):
+    """
+    Title and maintainer of a tool script, read from its source without importing it.
+    Uses a module level TOOL_METADATA dictionary if there is one, otherwise the literal arguments of the
+    script's setup_page(title, maintainer) call. The title defaults to the file name.
+    """
+    metadata = {'title': os.path.splitext(os.path.basename(path))[0].replace('_', ' '), 'maintainer': None}
+    try:
+        with open(path, encoding='utf-8') as file:
+            tree = ast.parse(file.read(), filename=path)
+    except (OSError, SyntaxError, ValueError):
+        # A broken tool still gets a navigation entry, it'll show its error when opened
+        return metadata
+
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(target, ast.Name) and target.id == METADATA_VARIABLE
+                                                for target in node.targets):
+            declared = _literal(node.value)
+            if isinstance(declared, dict):
+                metadata.update({key: declared[key] for key in ('title', 'maintainer') if key in declared})
+                return metadata
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            name = node.func.id if isinstance(node.func, ast.Name) else getattr(node.func, 'attr', None)
+            if name == 'setup_page':
+                arguments = dict(zip(('title', 'maintainer'), node.args))
+                arguments.update({keyword.arg: keyword.value for keyword in node.keywords})
+                for key in ('title', 'maintainer'):
+                    value = _literal(arguments[key]) if key in arguments else None
+                    if isinstance(value, str):
+                        metadata[key] = value
+                break
+    return metadata
+
+
+def directory_mtimes(tools_directory):
+    """Modification times (ns) of the tools directory and each category directory in it"""
+    try:
+        mtimes = {'.': os.stat(tools_directory).st_mtime_ns}
+        with os.scandir(tools_directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    mtimes[entry.name] = entry.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    return mtimes
+
+
+def scan_tools(tools_directory):
+    """
+    Manifest entries for every tool script in tools_directory/<category>/, sorted by category then file name.
+    Paths are relative to tools_directory.
+    """
+    tools = []
+    for category in sorted(os.listdir(tools_directory)):
+        category_directory = os.path.join(tools_directory, category)
+        if not os.path.isdir(category_directory):
+            continue
+        for filename in sorted(os.listdir(category_directory)):
+            # Ignore the __init__ files
+            if filename.endswith('.py') and not filename.endswith('__.py'):
+                path = os.path.join(category, filename)
+                tools.append({'path': path, 'category': category,
+                              **read_tool_metadata(os.path.join(tools_directory, path))})
+    return tools
+
+
+class ToolRegistry:
+    """
+    Manifest of the tool scripts (path, category, title, maintainer), found by scanning tools/<category>/*.py.
+    The manifest is cached in memory and on disk, and is only rebuilt when the modification time of the tools
+    directory or a category directory changes (i.e. a tool or category is added, removed or renamed).
+    Use refresh() after changing the metadata of an existing tool.
+    """
+
+    def __init__(self, tools_directory=TOOLS_DIRECTORY, manifest_path=MANIFEST_PATH):
+        self.tools_directory = tools_directory
+        self.manifest_path = manifest_path
+        self.scans = 0
+        self._mtimes = None
+        self._tools = []
+        # Streamlit runs each session in its own thread
+        self._lock = threading.Lock()
+
+    def tools(self):
+        """List of manifest entries, with absolute paths"""
+        mtimes = directory_mtimes(self.tools_directory)
+        with self._lock:
+            if mtimes != self._mtimes:
+                self._tools = self._load_manifest(mtimes)
+                self._mtimes = mtimes
+            return self._tools
+
+    def refresh(self):
+        """Rescan the tools, ignoring the cached manifest"""
+        with self._lock:
+            self._mtimes = directory_mtimes(self.tools_directory)
+            self._tools = self._scan(self._mtimes)
+        return self._tools
+
+    def _load_manifest(self, mtimes):
+        if not mtimes:
+            return []
+        try:
+            with open(self.manifest_path, encoding='utf-8') as file:
+                manifest = json.load(file)
+            if (manifest.get('version') == MANIFEST_VERSION and manifest.get('directory mtimes') == mtimes
+                    and manifest.get('tools directory') == self.tools_directory):
+                return self._with_absolute_paths(manifest['tools'])
+        except (OSError, ValueError, KeyError):
+            pass
+        return self._scan(mtimes)
+
+    def _scan(self, mtimes):
+        if not mtimes:
+            return []
+        self.scans += 1
+        tools = scan_tools(self.tools_directory)
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            with open(self.manifest_path, 'w', encoding='utf-8') as file:
+                json.dump({'version': MANIFEST_VERSION, 'tools directory': self.tools_directory,
+                           'directory mtimes': mtimes, 'tools': tools}, file, indent=2)
+        except OSError:
+            # A read-only deployment keeps the manifest in memory only
+            pass
+        return self._with_absolute_paths(tools)
+
+    def _with_absolute_paths(self, tools):
+        return [{**tool, 'path': os.path.join(self.tools_directory, tool['path'])} for tool in tools]
+
+    def categories(self):
+        """Dictionary of {category: [manifest entries]}, in manifest order"""
+        categories = {}
+        for tool in self.tools():
+            categories.setdefault(tool['category'], []).append(tool)
+        return categories
+
+
+def get_tool_registry():
+    """Returns the shared tool registry, it lives as long as the Streamlit server process"""
+    global _registry
+    if _registry is None:
+        _registry = ToolRegistry()
+    return _registry